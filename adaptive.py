@@ -0,0 +1,103 @@
+# begin adaptive.py
+"""Adaptive concurrency per provider from rate limit headers.
+
+A fixed concurrency limit is either too low for a paid key or high enough to
+trip 429s on a free one. ``AIMDLimiter`` moves the limit instead, from what
+every response says (``observe`` is an ``LLMAPIClient`` observer):
+
+- A success whose rate limit headers leave more than ``slow_below`` of the
+  quota grows the limit additively, by about one per limit's worth of
+  successes (one step per round trip at full concurrency)
+- A 429, or headers showing less than ``back_off_below`` of the quota left,
+  shrink it multiplicatively by ``decrease``, at most once per round trip so a
+  burst of responses from the same window counts once
+- In between, or for errors, the limit holds
+
+Providers without rate limit headers (Gemini) still back off on 429s and
+grow on successes. The batch runner and the service use one limiter per
+provider; ``tutor_adaptive_concurrency_limit`` exports the current limits.
+"""
+
+import logging
+import threading
+import time
+
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+from llm_utils import parse_rate_limit_headers, quota_fraction
+
+
+DEFAULT_DECREASE = 0.5
+DEFAULT_BACK_OFF_BELOW = 0.1
+DEFAULT_SLOW_BELOW = 0.25
+MIN_COOLDOWN_SEC = 0.1
+
+concurrency_limit = metrics.REGISTRY.gauge(
+    'tutor_adaptive_concurrency_limit', 'Concurrent LLM calls allowed by the adaptive limiter', ('provider',))
+
+
+class AIMDLimiter:
+    """Additive-increase, multiplicative-decrease concurrency limit for one provider.
+
+    Attributes:
+        provider (str): Provider whose responses are observed
+        limit (float): Current limit; ``int(limit)`` calls may run at once
+        min_limit (int): Floor of the limit
+        max_limit (int): Ceiling of the limit
+        listeners (List[Callable[[int], None]]): Called with the new whole limit when it changes
+    """
+
+    def __init__(self, provider: str, initial: int, min_limit: int = 1, max_limit: Optional[int] = None,
+                 decrease: float = DEFAULT_DECREASE, back_off_below: float = DEFAULT_BACK_OFF_BELOW,
+                 slow_below: float = DEFAULT_SLOW_BELOW, clock: Callable[[], float] = time.monotonic):
+        if not 0 < decrease < 1:
+            raise ValueError("decrease must be between 0 and 1")
+        self.provider = provider
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit if max_limit is not None else initial)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.decrease = decrease
+        self.back_off_below = back_off_below
+        self.slow_below = slow_below
+        self.clock = clock
+        self.listeners: List[Callable[[int], None]] = []
+        self._last_decrease = float('-inf')
+        self._rtt_sec = MIN_COOLDOWN_SEC
+        self._lock = threading.Lock()
+        concurrency_limit.set(self.current(), provider=provider)
+
+    def current(self) -> int:
+        return int(self.limit)
+
+    def observe(self, event: Dict[str, Any]) -> None:
+        """Adjust the limit from one ``LLMAPIClient`` attempt event of this provider."""
+        if event.get('provider') != self.provider:
+            return
+        status_code = event.get('status_code')
+        fraction = quota_fraction(parse_rate_limit_headers(event.get('headers') or {}))
+        now = self.clock()
+
+        with self._lock:
+            before = self.current()
+            if event.get('latency_sec'):
+                self._rtt_sec = max(MIN_COOLDOWN_SEC, event['latency_sec'])
+
+            if status_code == 429 or (fraction is not None and fraction < self.back_off_below):
+                # Responses already in flight report the same overload; count it once per round trip
+                if now - self._last_decrease >= self._rtt_sec:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._last_decrease = now
+            elif status_code == 200 and (fraction is None or fraction >= self.slow_below):
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            after = self.current()
+
+        if after != before:
+            logging.info(f"Adaptive {self.provider} concurrency {before} -> {after}"
+                         + (f" ({fraction:.0%} of quota left)" if fraction is not None else ''))
+            concurrency_limit.set(after, provider=self.provider)
+            for listener in self.listeners:
+                listener(after)
+
+# end adaptive.py
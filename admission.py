@@ -0,0 +1,240 @@
+# begin admission.py
+"""Admission control for the tutor service.
+
+On a deadline night every student pushes at once. Without a bound, requests
+pile up behind the LLM and all of them time out together. ``AdmissionController``
+keeps the work a service accepts finite:
+
+- At most ``max_concurrent`` requests run; up to ``max_queue`` more wait, and
+  no repository may hold more than ``max_queue_per_repo`` of the waiting slots
+- Waiting requests are served round-robin by repository, so one busy
+  repository (or a script re-triggering one) cannot starve the others
+- A request with a deadline is rejected up front when the expected wait plus
+  the expected service time (an EWMA of recent requests) exceeds it, and
+  leaves the queue once it can no longer start in time
+- While the queue is at least ``degrade_at`` deep, admitted requests are
+  marked degraded, so the caller can serve cached or shortened feedback that
+  drains the queue faster
+
+``set_max_concurrent`` lets an ``adaptive.AIMDLimiter`` move the slot count
+with the provider's rate limits. Rejections raise ``Overloaded`` with a
+reason and a suggested Retry-After.
+Queue depth, requests in flight, shed and degraded counts, and queue waits
+are exported through metrics.py.
+"""
+
+import collections
+import contextlib
+import logging
+import math
+import os
+import threading
+import time
+
+from typing import Callable, Deque, Dict, Iterator, NamedTuple, Optional
+
+import metrics
+
+
+DEFAULT_MAX_CONCURRENT = 8
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_MAX_QUEUE_PER_REPO = 8
+DEFAULT_SERVICE_SEC = 20.0
+SERVICE_SEC_ALPHA = 0.2
+
+SHED_REASONS = ('queue_full', 'repo_limit', 'deadline')
+
+WAIT_BUCKETS = (0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+queue_depth = metrics.REGISTRY.gauge(
+    'tutor_admission_queue_depth', 'Requests waiting for a slot')
+in_flight = metrics.REGISTRY.gauge(
+    'tutor_admission_in_flight', 'Requests holding a slot')
+shed = metrics.REGISTRY.counter(
+    'tutor_admission_shed_total', 'Requests rejected by admission control by reason', ('reason',))
+degraded = metrics.REGISTRY.counter(
+    'tutor_admission_degraded_total', 'Requests served in degraded mode by mode (cached, shortened)', ('mode',))
+queue_wait = metrics.REGISTRY.histogram(
+    'tutor_admission_wait_seconds', 'Time admitted requests waited for a slot', buckets=WAIT_BUCKETS)
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed.
+
+    Attributes:
+        reason (str): One of SHED_REASONS
+        retry_after_sec (int): Suggested wait before retrying
+    """
+
+    def __init__(self, reason: str, retry_after_sec: float):
+        self.reason = reason
+        self.retry_after_sec = max(1, math.ceil(retry_after_sec))
+        super().__init__(f"Service overloaded ({reason}); retry after {self.retry_after_sec}s")
+
+
+class Ticket(NamedTuple):
+    repo: str
+    degraded: bool
+    wait_sec: float
+
+
+class _Waiter:
+    __slots__ = ('granted',)
+
+    def __init__(self):
+        self.granted = False
+
+
+class AdmissionController:
+    """Bounded, per-repository fair admission of requests.
+
+    Attributes:
+        max_concurrent (int): Requests allowed to run at once
+        max_queue (int): Requests allowed to wait in total
+        max_queue_per_repo (int): Requests allowed to wait per repository
+        degrade_at (int): Queue depth from which admitted requests are degraded
+        service_sec (float): EWMA of the time requests held a slot
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        max_queue_per_repo: int = DEFAULT_MAX_QUEUE_PER_REPO,
+        degrade_at: Optional[int] = None,
+        service_sec: float = DEFAULT_SERVICE_SEC,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_per_repo = max_queue_per_repo
+        self.degrade_at = degrade_at if degrade_at is not None else max(1, max_queue // 2)
+        self.service_sec = service_sec
+        self.clock = clock
+        self.running = 0
+        self.queued = 0
+        # Insertion order is the round-robin order; a served repository moves to the end
+        self._queues: Dict[str, Deque[_Waiter]] = collections.OrderedDict()
+        self._cond = threading.Condition()
+
+    def set_max_concurrent(self, max_concurrent: int) -> None:
+        """Change the slot count, e.g. from an adaptive.AIMDLimiter; running requests keep their slots."""
+        with self._cond:
+            self.max_concurrent = max(1, max_concurrent)
+            self._grant()
+            self._update_gauges()
+
+    def expected_wait(self) -> float:
+        """Seconds until a request arriving now would get a slot; call with the lock held."""
+        if self.running < self.max_concurrent and not self.queued:
+            return 0.0
+        return (self.queued // self.max_concurrent + 1) * self.service_sec
+
+    @contextlib.contextmanager
+    def admit(self, repo: str, deadline_sec: Optional[float] = None) -> Iterator[Ticket]:
+        """Hold a slot for the enclosed block, waiting in *repo*'s queue if needed.
+
+        Args:
+            repo (str): Fairness key, e.g. the ``owner/name`` of the submission
+            deadline_sec (Optional[float]): Seconds from now by which the work must finish
+
+        Raises:
+            Overloaded: If the request is shed
+        """
+        ticket = self._acquire(repo, deadline_sec)
+        start = self.clock()
+        try:
+            yield ticket
+        finally:
+            self._release(self.clock() - start)
+
+    def _acquire(self, repo: str, deadline_sec: Optional[float]) -> Ticket:
+        with self._cond:
+            arrived = self.clock()
+            is_degraded = self.queued >= self.degrade_at
+            if self.running < self.max_concurrent and not self.queued:
+                self.running += 1
+                self._update_gauges()
+                queue_wait.observe(0.0)
+                return Ticket(repo, is_degraded, 0.0)
+
+            expected_wait = self.expected_wait()
+            if self.queued >= self.max_queue:
+                self._shed('queue_full', expected_wait)
+            if len(self._queues.get(repo, ())) >= self.max_queue_per_repo:
+                self._shed('repo_limit', expected_wait)
+            if deadline_sec is not None and expected_wait + self.service_sec > deadline_sec:
+                self._shed('deadline', expected_wait)
+
+            waiter = _Waiter()
+            self._queues.setdefault(repo, collections.deque()).append(waiter)
+            self.queued += 1
+            self._update_gauges()
+
+            # Latest start that can still finish by the deadline
+            start_by = None if deadline_sec is None else arrived + deadline_sec - self.service_sec
+            while not waiter.granted:
+                timeout = None if start_by is None else start_by - self.clock()
+                if timeout is not None and timeout <= 0:
+                    self._remove(repo, waiter)
+                    self._shed('deadline', self.expected_wait())
+                self._cond.wait(timeout)
+
+            wait_sec = self.clock() - arrived
+            queue_wait.observe(wait_sec)
+            return Ticket(repo, is_degraded, wait_sec)
+
+    def _release(self, held_sec: float) -> None:
+        with self._cond:
+            self.running -= 1
+            self.service_sec += SERVICE_SEC_ALPHA * (held_sec - self.service_sec)
+            self._grant()
+            self._update_gauges()
+
+    def _grant(self) -> None:
+        """Hand free slots to the heads of the repository queues in turn."""
+        granted = False
+        while self.running < self.max_concurrent and self._queues:
+            repo, waiters = next(iter(self._queues.items()))
+            waiters.popleft().granted = True
+            if waiters:
+                self._queues.move_to_end(repo)
+            else:
+                del self._queues[repo]
+            self.queued -= 1
+            self.running += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _remove(self, repo: str, waiter: _Waiter) -> None:
+        waiters = self._queues[repo]
+        waiters.remove(waiter)
+        if not waiters:
+            del self._queues[repo]
+        self.queued -= 1
+        self._update_gauges()
+
+    def _shed(self, reason: str, retry_after_sec: float) -> None:
+        shed.inc(reason=reason)
+        logging.warning(f"Shedding request: {reason} ({self.queued} queued, {self.running} running)")
+        raise Overloaded(reason, retry_after_sec)
+
+    def _update_gauges(self) -> None:
+        queue_depth.set(self.queued)
+        in_flight.set(self.running)
+
+
+def controller_from_env() -> AdmissionController:
+    max_queue = int(os.getenv('INPUT_SERVICE-MAX-QUEUE', str(DEFAULT_MAX_QUEUE)))
+    degrade_at = os.getenv('INPUT_SERVICE-DEGRADE-AT', '')
+    return AdmissionController(
+        max_concurrent=int(os.getenv('INPUT_SERVICE-MAX-CONCURRENT', str(DEFAULT_MAX_CONCURRENT))),
+        max_queue=max_queue,
+        max_queue_per_repo=int(os.getenv('INPUT_SERVICE-MAX-QUEUE-PER-REPO', str(DEFAULT_MAX_QUEUE_PER_REPO))),
+        degrade_at=int(degrade_at) if degrade_at else None,
+    )
+
+# end admission.py
@@ -0,0 +1 @@
+# benchmarks: performance measurements for prompt assembly and the LLM client
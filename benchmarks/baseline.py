@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# begin benchmarks/baseline.py
+"""Record performance metrics into a baseline file and fail when a later run regresses.
+
+Metrics, lower is better for all of them:
+
+- ``engineering[...]``: wall time and tracemalloc peak of ``prompt.engineering``
+  on synthetic inputs, and the prompt size in characters and approximate tokens
+- ``call_api[...]``: wall time per ``LLMAPIClient.call_api`` against a local mock
+  server, with a pooled session and with a fresh connection per call
+
+    python3 benchmarks/baseline.py record --output benchmarks/baseline.json
+    python3 benchmarks/baseline.py check --baseline benchmarks/baseline.json
+
+A metric regresses when its median exceeds the baseline median by more than
+``max(k * baseline stdev, tolerance * baseline median, MIN_DELTA[unit])``.
+Timings are only comparable on the same runner class, so record the baseline
+where the check runs; CI records one from the base branch of each pull request.
+"""
+
+import argparse
+import contextlib
+import http.server
+import json
+import logging
+import math
+import pathlib
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.resolve()))
+
+
+from benchmarks import bench_prompt, synthetic  # noqa: E402
+from llm_client import LLMAPIClient  # noqa: E402
+from llm_configs import GeminiConfig  # noqa: E402
+import prompt  # noqa: E402
+
+
+BASELINE_VERSION = 1
+DEFAULT_BASELINE = pathlib.Path(__file__).parent / 'baseline.json'
+
+# (label, n_tests, stderr_bytes)
+ENGINEERING_CASES = (
+    ('small', 10, 1_000),
+    ('large', 1_000, 100_000),
+)
+CALLS_PER_SAMPLE = 20
+
+# Relative slack per unit; counts are deterministic, timings are not
+TOLERANCE = {'sec': 0.25, 'bytes': 0.10, 'chars': 0.01, 'tokens': 0.01}
+# Differences below these are noise whatever the relative change
+MIN_DELTA = {'sec': 0.0005, 'bytes': 4096, 'chars': 0, 'tokens': 0}
+DEFAULT_K = 3.0
+
+CHARS_PER_TOKEN = 4
+
+_MOCK_RESPONSE = {
+    'candidates': [{'content': {'parts': [{'text': 'Looks good.'}], 'role': 'model'}}],
+    'usageMetadata': {'promptTokenCount': 100, 'candidatesTokenCount': 3, 'totalTokenCount': 103},
+}
+
+
+def approx_tokens(text: str) -> int:
+    """Rough token count: about four characters per token for English and code."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class MockLLMHandler(http.server.BaseHTTPRequestHandler):
+    """Answers every POST with a fixed Gemini-shaped response."""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, so a pooled session reuses its connection
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        data = json.dumps(_MOCK_RESPONSE).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+@contextlib.contextmanager
+def mock_llm_server() -> Iterator[str]:
+    """Serve MockLLMHandler on an ephemeral local port; yields the URL."""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), MockLLMHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}/'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def summarize(samples: Sequence[float], unit: str) -> Dict[str, Any]:
+    return {
+        'unit': unit,
+        'median': statistics.median(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'n': len(samples),
+        'samples': list(samples),
+    }
+
+
+def engineering_metrics(work_dir: pathlib.Path, repeat: int) -> Dict[str, Dict[str, Any]]:
+    metrics = {}
+    for label, n_tests, stderr_bytes in ENGINEERING_CASES:
+        paths = synthetic.write_inputs(work_dir / label, n_tests, stderr_bytes)
+        measurement = bench_prompt.measure(
+            lambda: prompt.engineering((paths['report'],), (paths['source'],), paths['readme'], 'English'),
+            repeat,
+            setup=bench_prompt.clear_prompt_caches,
+        )
+        bench_prompt.clear_prompt_caches()
+        _, question = prompt.engineering((paths['report'],), (paths['source'],), paths['readme'], 'English')
+
+        name = f'engineering[{label}]'
+        metrics[f'{name}.wall_sec'] = summarize(measurement['samples'], 'sec')
+        metrics[f'{name}.peak_bytes'] = summarize([measurement['peak_bytes']], 'bytes')
+        metrics[f'{name}.prompt_chars'] = summarize([len(question)], 'chars')
+        metrics[f'{name}.prompt_tokens'] = summarize([approx_tokens(question)], 'tokens')
+    return metrics
+
+
+def time_calls(call: Callable[[], Any], repeat: int, calls: int = CALLS_PER_SAMPLE) -> List[float]:
+    """Mean seconds per call, one sample per batch of *calls* calls."""
+    call()  # connect and import outside the measurement
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            call()
+        samples.append((time.perf_counter() - start) / calls)
+    return samples
+
+
+def client_metrics(repeat: int) -> Dict[str, Dict[str, Any]]:
+    import requests
+
+    question = synthetic.make_text(10_000, random.Random(0))
+    metrics = {}
+    with mock_llm_server() as url, requests.Session() as session:
+        config = GeminiConfig(api_key='benchmark', api_url=url)
+        for label, client in (
+            ('pooled', LLMAPIClient(config, max_retry_attempt=0, timeout_sec=10, session=session)),
+            ('fresh', LLMAPIClient(config, max_retry_attempt=0, timeout_sec=10)),
+        ):
+            samples = time_calls(lambda: client.call_api(question), repeat)
+            metrics[f'call_api[{label}].wall_sec'] = summarize(samples, 'sec')
+    return metrics
+
+
+def collect(repeat: int) -> Dict[str, Any]:
+    """Run every benchmark; returns the baseline document."""
+    with tempfile.TemporaryDirectory(prefix='bench_baseline_') as work_dir:
+        metrics = engineering_metrics(pathlib.Path(work_dir), repeat)
+    metrics.update(client_metrics(repeat))
+    return {
+        'version': BASELINE_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+        },
+        'repeat': repeat,
+        'metrics': metrics,
+    }
+
+
+def allowed_increase(baseline: Dict[str, Any], k: float = DEFAULT_K, tolerance: Optional[float] = None) -> float:
+    unit = baseline['unit']
+    relative = TOLERANCE.get(unit, 0.10) if tolerance is None else tolerance
+    return max(k * baseline['stdev'], relative * abs(baseline['median']), MIN_DELTA.get(unit, 0))
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    k: float = DEFAULT_K,
+    tolerance: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """One row per baseline metric with its verdict: 'ok', 'improved', 'regressed' or 'missing'.
+
+    *tolerance* overrides the per-unit relative tolerance for every metric.
+    Metrics only present in *current* are new and not judged.
+    """
+    rows = []
+    for name, base in sorted(baseline['metrics'].items()):
+        row = {'metric': name, 'unit': base['unit'], 'baseline': base['median'], 'current': None}
+        now = current['metrics'].get(name)
+        if now is None:
+            row['status'] = 'missing'
+            rows.append(row)
+            continue
+
+        row['current'] = now['median']
+        row['limit'] = base['median'] + allowed_increase(base, k, tolerance)
+        if now['median'] > row['limit']:
+            row['status'] = 'regressed'
+        elif now['median'] < base['median'] - allowed_increase(base, k, tolerance):
+            row['status'] = 'improved'
+        else:
+            row['status'] = 'ok'
+        rows.append(row)
+    return rows
+
+
+def load_baseline(path: pathlib.Path) -> Dict[str, Any]:
+    baseline = json.loads(path.read_text(encoding='utf-8'))
+    if baseline.get('version') != BASELINE_VERSION:
+        raise ValueError(
+            f"{path} has baseline version {baseline.get('version')}, expected {BASELINE_VERSION}; record it again"
+        )
+    return baseline
+
+
+def format_rows(rows: Sequence[Dict[str, Any]]) -> str:
+    lines = []
+    for row in rows:
+        current = '-' if row['current'] is None else f"{row['current']:.6g}"
+        lines.append(f"{row['status']:>9}  {row['metric']}: {current} {row['unit']} (baseline {row['baseline']:.6g})")
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='measure and write a new baseline')
+    record_parser.add_argument('--output', type=pathlib.Path, default=DEFAULT_BASELINE)
+
+    check_parser = subparsers.add_parser('check', help='measure and compare with the baseline')
+    check_parser.add_argument('--baseline', type=pathlib.Path, default=DEFAULT_BASELINE)
+    check_parser.add_argument('--k', type=float, default=DEFAULT_K, help='baseline standard deviations allowed')
+    check_parser.add_argument('--tolerance', type=float, help='relative increase allowed for every metric')
+    check_parser.add_argument('--output', type=pathlib.Path, help='also write the current measurements here')
+
+    for sub in (record_parser, check_parser):
+        sub.add_argument('--repeat', type=int, default=7, help='samples per timing metric (default 7)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'check':
+        if not args.baseline.exists():
+            parser.error(f"no baseline at {args.baseline}; record one first with: record --output {args.baseline}")
+        try:
+            baseline = load_baseline(args.baseline)
+        except ValueError as e:
+            parser.error(str(e))
+
+    current = collect(args.repeat)
+    if args.output:
+        args.output.write_text(json.dumps(current, indent=2))
+        print(f"Measurements written to {args.output}", file=sys.stderr)
+    if args.command == 'record':
+        return 0
+
+    rows = compare(current, baseline, k=args.k, tolerance=args.tolerance)
+    print(format_rows(rows))
+    regressed = [row['metric'] for row in rows if row['status'] in ('regressed', 'missing')]
+    if regressed:
+        print(f"Regressed: {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
+
+# end benchmarks/baseline.py
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# begin benchmarks/bench_prompt.py
+"""Time and memory benchmarks for prompt assembly on synthetic inputs.
+
+Measures ``prompt.collect_longrepr``, ``prompt.sanitize_input``,
+``prompt.exclude_common_contents`` and the full ``prompt.engineering`` call
+across report sizes (1 to 10k tests), captured stderr (1 KB to 10 MB) and
+README sizes, and prints JSON results (or writes them with ``--output``).
+
+    python3 benchmarks/bench_prompt.py --quick
+    python3 benchmarks/bench_prompt.py --repeat 5 --output bench_prompt.json
+
+Wall times come from separate runs without tracemalloc; peak memory is the
+tracemalloc peak of one extra run.
+"""
+
+import argparse
+import json
+import logging
+import pathlib
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.resolve()))
+
+
+from benchmarks import synthetic  # noqa: E402
+import prompt  # noqa: E402
+
+
+RESULTS_VERSION = 1
+
+TEST_COUNTS = (1, 100, 1_000, 10_000)
+STDERR_SIZES = (1_000, 100_000, 10_000_000)
+TEXT_SIZES = (1_000, 100_000, 1_000_000, 10_000_000)
+
+QUICK_TEST_COUNTS = (1, 100)
+QUICK_STDERR_SIZES = (1_000,)
+QUICK_TEXT_SIZES = (1_000, 100_000)
+
+
+def summarize(times: Sequence[float]) -> Dict[str, float]:
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'n': len(times),
+    }
+
+
+def output_chars(result: Any) -> int:
+    if isinstance(result, str):
+        return len(result)
+    if isinstance(result, tuple):
+        return output_chars(result[-1])
+    if isinstance(result, list):
+        return sum(output_chars(item) for item in result)
+    return 0
+
+
+def measure(func: Callable[[], Any], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """Wall time over *repeat* runs plus the tracemalloc peak of one more run."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_sec': summarize(times),
+        'samples': times,
+        'peak_bytes': peak,
+        'output_chars': output_chars(result),
+    }
+
+
+def clear_prompt_caches() -> None:
+    prompt.assignment_code.cache_clear()
+    prompt.assignment_instruction.cache_clear()
+
+
+def bench_collect_longrepr(n_tests: int, stderr_bytes: int, repeat: int) -> Dict[str, Any]:
+    data = synthetic.make_report(n_tests, stderr_bytes)
+    return measure(lambda: prompt.collect_longrepr(data), repeat)
+
+
+def bench_sanitize_input(n_bytes: int, repeat: int) -> Dict[str, Any]:
+    text = synthetic.make_readme(n_bytes)
+    return measure(lambda: prompt.sanitize_input(text), repeat)
+
+
+def bench_exclude_common_contents(n_bytes: int, repeat: int) -> Dict[str, Any]:
+    text = synthetic.make_readme(n_bytes)
+    return measure(lambda: prompt.exclude_common_contents(text), repeat)
+
+
+def bench_engineering(work_dir: pathlib.Path, n_tests: int, stderr_bytes: int, repeat: int) -> Dict[str, Any]:
+    paths = synthetic.write_inputs(work_dir / f'engineering_{n_tests}_{stderr_bytes}', n_tests, stderr_bytes)
+    return measure(
+        lambda: prompt.engineering((paths['report'],), (paths['source'],), paths['readme'], 'English'),
+        repeat,
+        setup=clear_prompt_caches,
+    )
+
+
+def run_suite(
+    work_dir: pathlib.Path,
+    test_counts: Sequence[int] = TEST_COUNTS,
+    stderr_sizes: Sequence[int] = STDERR_SIZES,
+    text_sizes: Sequence[int] = TEXT_SIZES,
+    repeat: int = 3,
+) -> Dict[str, Any]:
+    """Run every benchmark over the size grid; returns the JSON-ready results document."""
+    results: List[Dict[str, Any]] = []
+
+    def record(benchmark: str, params: Dict[str, int], measurement: Dict[str, Any]) -> None:
+        results.append({'benchmark': benchmark, 'params': params, **measurement})
+        print(f"{benchmark} {params}: median {measurement['wall_sec']['median'] * 1000:.2f} ms, "
+              f"peak {measurement['peak_bytes'] / 1e6:.2f} MB", file=sys.stderr)
+
+    for n_tests in test_counts:
+        for stderr_bytes in stderr_sizes:
+            params = {'n_tests': n_tests, 'stderr_bytes': stderr_bytes}
+            record('collect_longrepr', params, bench_collect_longrepr(n_tests, stderr_bytes, repeat))
+            record('engineering', params, bench_engineering(work_dir, n_tests, stderr_bytes, repeat))
+
+    for n_bytes in text_sizes:
+        params = {'text_bytes': n_bytes}
+        record('sanitize_input', params, bench_sanitize_input(n_bytes, repeat))
+        record('exclude_common_contents', params, bench_exclude_common_contents(n_bytes, repeat))
+
+    return {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+        },
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='small sizes only, for smoke runs')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case (default 3)')
+    parser.add_argument('--output', type=pathlib.Path, help='write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    sizes = {}
+    if args.quick:
+        sizes = {'test_counts': QUICK_TEST_COUNTS, 'stderr_sizes': QUICK_STDERR_SIZES, 'text_sizes': QUICK_TEXT_SIZES}
+
+    with tempfile.TemporaryDirectory(prefix='bench_prompt_') as work_dir:
+        document = run_suite(pathlib.Path(work_dir), repeat=args.repeat, **sizes)
+
+    text = json.dumps(document, indent=2)
+    if args.output:
+        args.output.write_text(text)
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    # prompt logs every report file it reads; progress goes to stderr instead
+    logging.basicConfig(level=logging.WARNING)
+    main()
+
+# end benchmarks/bench_prompt.py
@@ -0,0 +1,153 @@
+# begin benchmarks/synthetic.py
+"""Deterministic synthetic inputs for benchmarks: pytest-json-report files,
+student sources and READMEs of a requested size.
+
+The shapes follow what the tutor reads: reports carry ``tests`` with
+``setup``/``call``/``teardown`` phases holding ``longrepr`` and ``stderr``,
+and READMEs carry the common-content markers removed by
+``prompt.exclude_common_contents``.
+"""
+
+import json
+import pathlib
+import random
+
+from typing import Any, Dict, List
+
+
+COMMON_START = '``From here is common to all assignments.``'
+COMMON_END = '``Until here is common to all assignments.``'
+
+_WORDS = (
+    'value', 'result', 'index', 'count', 'total', 'name', 'list', 'item',
+    'number', 'string', 'return', 'expected', 'assert', 'function', 'loop',
+)
+
+
+def make_text(n_bytes: int, rng: random.Random, line_words: int = 12) -> str:
+    """ASCII prose of exactly *n_bytes* characters, in lines of *line_words* words."""
+    if n_bytes <= 0:
+        return ''
+    lines = []
+    size = 0
+    while size < n_bytes:
+        line = ' '.join(rng.choice(_WORDS) for _ in range(line_words))
+        lines.append(line)
+        size += len(line) + 1
+    return '\n'.join(lines)[:n_bytes]
+
+
+def make_longrepr(test_name: str, rng: random.Random) -> str:
+    expected = rng.randint(0, 1000)
+    actual = expected + rng.randint(1, 9)
+    return (
+        f"def {test_name}():\n"
+        f">       assert compute({expected}) == {expected}\n"
+        f"E       assert {actual} == {expected}\n"
+        f"E        +  where {actual} = compute({expected})\n\n"
+        f"tests/test_exercise.py:{rng.randint(10, 500)}: AssertionError"
+    )
+
+
+def make_report(
+    n_tests: int,
+    stderr_bytes: int = 0,
+    failure_ratio: float = 0.5,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """A pytest-json-report dict with *n_tests* tests.
+
+    ``failure_ratio`` of them fail with a traceback in ``call``; the failing
+    tests share *stderr_bytes* of captured stderr.
+    """
+    rng = random.Random(seed)
+    n_failed = min(n_tests, max(1, round(n_tests * failure_ratio))) if n_tests else 0
+    stderr_per_test = stderr_bytes // n_failed if n_failed else 0
+
+    tests: List[Dict[str, Any]] = []
+    for i in range(n_tests):
+        name = f'test_case_{i:05d}'
+        failed = i < n_failed
+        test = {
+            'nodeid': f'tests/test_exercise.py::{name}',
+            'lineno': 10 + i,
+            'outcome': 'failed' if failed else 'passed',
+            'keywords': [name, 'test_exercise.py', 'tests'],
+            'setup': {'duration': 0.0001, 'outcome': 'passed'},
+            'call': {'duration': 0.001, 'outcome': 'failed' if failed else 'passed'},
+            'teardown': {'duration': 0.0001, 'outcome': 'passed'},
+        }
+        if failed:
+            test['call']['longrepr'] = make_longrepr(name, rng)
+            if stderr_per_test:
+                test['call']['stderr'] = make_text(stderr_per_test, rng)
+        tests.append(test)
+
+    return {
+        'created': 0.0,
+        'duration': 0.001 * n_tests,
+        'exitcode': 1 if n_failed else 0,
+        'root': '/github/workspace',
+        'environment': {},
+        'summary': {'failed': n_failed, 'passed': n_tests - n_failed, 'total': n_tests, 'collected': n_tests},
+        'tests': tests,
+    }
+
+
+def make_student_source(n_bytes: int, seed: int = 0) -> str:
+    """Python source of roughly *n_bytes* made of small commented functions."""
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    i = 0
+    while size < n_bytes:
+        part = (
+            f"def compute_{i}(x):\n"
+            f"    # {make_text(40, rng, line_words=6)}\n"
+            f"    total = 0\n"
+            f"    for k in range(x):\n"
+            f"        total += k * {rng.randint(1, 9)}\n"
+            f"    return total\n"
+        )
+        parts.append(part)
+        size += len(part) + 1
+        i += 1
+    return '\n'.join(parts)
+
+
+def make_readme(n_bytes: int, common_fraction: float = 0.5, seed: int = 0) -> str:
+    """README of roughly *n_bytes* with a common-content block between the standard markers."""
+    rng = random.Random(seed)
+    common_bytes = int(n_bytes * common_fraction)
+    specific_bytes = max(0, n_bytes - common_bytes)
+    return (
+        '# Assignment\n\n'
+        f'{make_text(specific_bytes // 2, rng)}\n\n'
+        f'{COMMON_START}\n\n'
+        f'{make_text(common_bytes, rng)}\n\n'
+        f'{COMMON_END}\n\n'
+        f'{make_text(specific_bytes - specific_bytes // 2, rng)}\n'
+    )
+
+
+def write_inputs(
+    directory: pathlib.Path,
+    n_tests: int,
+    stderr_bytes: int,
+    source_bytes: int = 10_000,
+    readme_bytes: int = 10_000,
+    seed: int = 0,
+) -> Dict[str, pathlib.Path]:
+    """Write a report, a student source and a README into *directory*; returns their paths."""
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = {
+        'report': directory / 'report.json',
+        'source': directory / 'exercise.py',
+        'readme': directory / 'README.md',
+    }
+    paths['report'].write_text(json.dumps(make_report(n_tests, stderr_bytes, seed=seed)))
+    paths['source'].write_text(make_student_source(source_bytes, seed=seed))
+    paths['readme'].write_text(make_readme(readme_bytes, seed=seed))
+    return paths
+
+# end benchmarks/synthetic.py
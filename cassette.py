@@ -0,0 +1,301 @@
+# begin cassette.py
+"""Record LLM traffic once and replay it for offline, deterministic benchmarks.
+
+A ``Cassette`` stands in for the ``requests.Session`` of ``LLMAPIClient``:
+
+- In ``record`` mode every ``post`` goes to the provider through a real
+  session, and one JSON line per interaction is appended to the cassette
+  file: the request URL, headers and payload, then the status code,
+  headers and body of the response (or the timeout/network error), and
+  the time the response took. Streamed responses keep each line with its
+  offset from the request, so time to first token replays too.
+- In ``replay`` mode nothing leaves the process. A request is matched by
+  URL and payload, identical requests get their recorded responses in
+  order (a 429 followed by a 200 replays as a retry) and start over when
+  they run out, and each response waits for its recorded latency times
+  ``latency_scale`` (0 answers at once). A request without a recording is
+  a network error to the client.
+
+API keys never reach the file: authentication headers and key query
+parameters are replaced with ``SCRUBBED``, and so is any occurrence of
+their values elsewhere in the interaction (e.g. echoed in an error body).
+Set ``INPUT_CASSETTE`` (and ``INPUT_CASSETTE-MODE``) and
+``llm_utils.create_client`` installs the cassette in every client, so
+``entrypoint.main`` and the codegen pipeline run end to end against it.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+import urllib.parse
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+MODES = ('record', 'replay')
+SCRUBBED = '<scrubbed>'
+SECRET_HEADERS = frozenset((
+    'authorization', 'proxy-authorization', 'x-api-key', 'x-goog-api-key', 'api-key', 'cookie', 'set-cookie',
+))
+SECRET_PARAMS = frozenset(('key', 'api_key', 'apikey', 'access_token'))
+
+
+def scrub_url(url: str) -> Tuple[str, List[str]]:
+    """*url* with secret query parameters scrubbed, and the secrets removed."""
+    parts = urllib.parse.urlsplit(url)
+    query = urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+    secrets = [value for name, value in query if name.lower() in SECRET_PARAMS and value]
+    if not secrets:
+        return url, []
+    query = [(name, SCRUBBED if name.lower() in SECRET_PARAMS else value) for name, value in query]
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query, safe='<>:'))), secrets
+
+
+def scrub_headers(headers: Dict[str, Any]) -> Tuple[Dict[str, str], List[str]]:
+    """*headers* as strings with secret ones scrubbed, and the secrets removed."""
+    scrubbed, secrets = {}, []
+    for name, value in (headers or {}).items():
+        if str(name).lower() in SECRET_HEADERS and value:
+            # Keep the scheme of "Bearer <key>" so the file still shows how the call authenticated
+            scheme, _, token = str(value).rpartition(' ')
+            secrets.append(token)
+            scrubbed[str(name)] = f"{scheme} {SCRUBBED}" if scheme else SCRUBBED
+        else:
+            scrubbed[str(name)] = str(value)
+    return scrubbed, secrets
+
+
+def request_key(url: str, payload: Any) -> str:
+    """Match key of a request: its scrubbed URL and canonical payload, so any key replays it."""
+    canonical = json.dumps([scrub_url(url)[0], payload], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def request_payload(kwargs: Dict[str, Any], headers: Dict[str, Any]) -> Any:
+    """The JSON payload of a post, whether sent as ``json=`` or as a (gzip) ``data=`` body."""
+    if 'json' in kwargs:
+        return kwargs['json']
+    body = kwargs.get('data')
+    if body is None:
+        return None
+    if {str(k).lower(): v for k, v in headers.items()}.get('content-encoding') == 'gzip':
+        import gzip
+
+        body = gzip.decompress(body)
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body.decode('utf-8', 'replace') if isinstance(body, bytes) else str(body)
+
+
+class ReplayResponse:
+    """The parts of ``requests.Response`` that ``LLMAPIClient`` uses, served from a recording."""
+
+    def __init__(self, recorded: Dict[str, Any], latency_scale: float = 1.0, start: Optional[float] = None):
+        from requests.structures import CaseInsensitiveDict
+
+        self.status_code = recorded['status_code']
+        self.headers = CaseInsensitiveDict(recorded.get('headers') or {})
+        self.text = recorded.get('body', '')
+        self.lines = recorded.get('lines')
+        self.latency_scale = latency_scale
+        self.start = time.perf_counter() if start is None else start
+
+    @property
+    def content(self) -> bytes:
+        return self.text.encode('utf-8')
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+    def iter_lines(self) -> Iterator[bytes]:
+        for offset_sec, line in self.lines or ():
+            wait_until(self.start + offset_sec * self.latency_scale)
+            yield line.encode('utf-8')
+
+    def close(self) -> None:
+        pass
+
+
+class RecordingResponse:
+    """Wraps a streamed ``requests.Response`` and records its lines as they are read."""
+
+    def __init__(self, response: Any, interaction: Dict[str, Any], start: float, cassette: 'Cassette'):
+        self._response = response
+        self._interaction = interaction
+        self._start = start
+        self._cassette = cassette
+        self._saved = False
+        interaction['response']['lines'] = []
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._response, name)
+
+    def iter_lines(self, *args, **kwargs) -> Iterator[bytes]:
+        lines = self._interaction['response']['lines']
+        for line in self._response.iter_lines(*args, **kwargs):
+            text = line.decode('utf-8') if isinstance(line, bytes) else line
+            lines.append([round(time.perf_counter() - self._start, 6), text])
+            yield line
+
+    def close(self) -> None:
+        self._response.close()
+        if not self._saved:
+            self._saved = True
+            self._cassette.save(self._interaction)
+
+
+def wait_until(deadline: float) -> None:
+    delay = deadline - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+
+class Cassette:
+    """Session stand-in that records provider traffic to a file or replays it from there.
+
+    Attributes:
+        path (pathlib.Path): JSONL file with one interaction per line
+        mode (str): 'record' or 'replay'
+        latency_scale (float): Factor applied to recorded latencies in replay; 0 answers at once
+        session (requests.Session, optional): Session that sends recorded requests
+    """
+
+    def __init__(self, path: pathlib.Path, mode: str = 'replay', latency_scale: float = 1.0,
+                 session: Optional[Any] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}; use one of {', '.join(MODES)}")
+        if latency_scale < 0:
+            raise ValueError("latency_scale must not be negative")
+        self.path = pathlib.Path(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.session = session
+        self._lock = threading.Lock()
+        self._interactions: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursors: Dict[str, int] = {}
+        if mode == 'replay':
+            self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            raise FileNotFoundError(f"Cassette {self.path} not found; record it first")
+        with self.path.open(encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    interaction = json.loads(line)
+                    self._interactions.setdefault(interaction['key'], []).append(interaction)
+        logging.info(f"Replaying {sum(map(len, self._interactions.values()))} interactions from {self.path}")
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._interactions.values())
+
+    def rewind(self) -> None:
+        """Serve every request's recordings from the first one again."""
+        with self._lock:
+            self._cursors.clear()
+
+    def post(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None,
+             stream: bool = False, **kwargs) -> Any:
+        headers = headers or {}
+        payload = request_payload(kwargs, headers)
+        if self.mode == 'replay':
+            return self._replay(url, payload)
+        return self._record(url, headers, timeout, stream, payload, kwargs)
+
+    def _replay(self, url: str, payload: Any) -> ReplayResponse:
+        import requests
+
+        start = time.perf_counter()
+        key = request_key(url, payload)
+        with self._lock:
+            recordings = self._interactions.get(key)
+            if not recordings:
+                raise requests.ConnectionError(f"No recorded interaction in {self.path} for request {key}")
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = (cursor + 1) % len(recordings)
+        interaction = recordings[cursor]
+
+        wait_until(start + interaction['latency_sec'] * self.latency_scale)
+        if interaction.get('error') == 'timeout':
+            raise requests.Timeout(f"Recorded timeout for request {key}")
+        if interaction.get('error'):
+            raise requests.ConnectionError(f"Recorded network error for request {key}")
+        return ReplayResponse(interaction['response'], self.latency_scale, start)
+
+    def _record(self, url: str, headers: Dict[str, Any], timeout: Optional[float], stream: bool,
+                payload: Any, kwargs: Dict[str, Any]) -> Any:
+        import requests
+
+        if self.session is None:
+            self.session = requests.Session()
+        interaction = {
+            'key': request_key(url, payload),
+            'request': {'url': url, 'headers': dict(headers), 'payload': payload, 'stream': stream},
+            'response': None,
+            'error': None,
+            'latency_sec': None,
+        }
+        start = time.perf_counter()
+        try:
+            response = self.session.post(url, headers=headers, timeout=timeout, stream=stream, **kwargs)
+        except requests.RequestException as e:
+            interaction['error'] = 'timeout' if isinstance(e, requests.Timeout) else 'network'
+            interaction['latency_sec'] = round(time.perf_counter() - start, 6)
+            self.save(interaction)
+            raise
+
+        interaction['latency_sec'] = round(time.perf_counter() - start, 6)
+        interaction['response'] = {'status_code': response.status_code, 'headers': dict(response.headers)}
+        if stream and response.status_code == 200:
+            # Saved on close, once the client has read the lines it wanted
+            return RecordingResponse(response, interaction, start, self)
+        interaction['response']['body'] = response.text
+        self.save(interaction)
+        return response
+
+    def save(self, interaction: Dict[str, Any]) -> None:
+        """Append *interaction* to the file with its secrets scrubbed."""
+        request = interaction['request']
+        request['url'], url_secrets = scrub_url(request['url'])
+        request['headers'], header_secrets = scrub_headers(request['headers'])
+        if interaction['response']:
+            interaction['response']['headers'], _ = scrub_headers(interaction['response']['headers'])
+        line = json.dumps(interaction, ensure_ascii=False)
+        for secret in set(url_secrets + header_secrets):
+            line = line.replace(secret, SCRUBBED)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open('a', encoding='utf-8') as f:
+                f.write(line + '\n')
+            self._interactions.setdefault(interaction['key'], []).append(interaction)
+
+
+_cassettes: Dict[Tuple[str, str, float], Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def cassette_from_env() -> Optional[Cassette]:
+    """The process-wide cassette named by INPUT_CASSETTE, or None.
+
+    INPUT_CASSETTE-MODE is 'replay' (default) or 'record';
+    INPUT_CASSETTE-LATENCY-SCALE scales replayed latencies (default 1).
+    """
+    path = os.getenv('INPUT_CASSETTE', '').strip()
+    if not path:
+        return None
+    mode = os.getenv('INPUT_CASSETTE-MODE', 'replay').strip().lower() or 'replay'
+    latency_scale = float(os.getenv('INPUT_CASSETTE-LATENCY-SCALE', '1') or '1')
+    key = (path, mode, latency_scale)
+    with _cassettes_lock:
+        cassette = _cassettes.get(key)
+        if cassette is None:
+            cassette = _cassettes[key] = Cassette(pathlib.Path(path), mode, latency_scale)
+            logging.info(f"LLM calls {'recorded to' if mode == 'record' else 'replayed from'} cassette {path}")
+        return cassette
+
+# end cassette.py
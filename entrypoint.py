@@ -7,7 +7,7 @@ import os
 import pathlib
 import sys
 
-from typing import Any, Dict, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Tuple
 
 
 sys.path.insert(
@@ -16,45 +16,80 @@ sys.path.insert(
 )
 
 
-from llm_client import LLMAPIClient
-from llm_utils import get_config_class, get_model_key_from_env
+from llm_utils import create_client, extract_token_usage, get_model_key_from_env, is_warmup_enabled_from_env
 
+import feedback_cache
+import metrics
+import profiling
 import prompt
+import tracing
+import usage_ledger
 
 
-logging.basicConfig(level=logging.INFO)
+if TYPE_CHECKING:
+    from llm_client import LLMAPIClient
 
 
 def main(b_ask:bool=True) -> None:
-    # Input parsing from environment variables
-    report_files = get_path_tuple(os.environ['INPUT_REPORT-FILES'])
-    student_files = get_path_tuple(os.environ['INPUT_STUDENT-FILES'])
-    readme_file = pathlib.Path(os.environ['INPUT_README-PATH'])
-    assert readme_file.exists(), 'No README file found'
-
-    explanation_in = os.environ.get('INPUT_EXPLANATION-IN', 'English')
-    logging.info(f"Using explanation language: {explanation_in}")
-
-    github_repo = os.environ.get('GITHUB_REPOSITORY', 'unknown/repository')
-    b_fail_expected = ('true' == os.getenv('INPUT_FAIL-EXPECTED', 'false').lower())
+    output_dir = os.getenv('INPUT_OUTPUT-DIR', '')
+    with metrics.recording('tutor', output_dir), \
+            profiling.profiling(output_dir, profiling.mode_from_env(), profiling.top_n_from_env()), \
+            tracing.recording('entrypoint.main', output_dir, tracing.is_enabled_from_env()):
+        run(b_ask, output_dir)
 
-    model, api_key = get_model_key_from_env()
-    config_class = get_config_class(model)
 
-    config_args = {'api_key': api_key}
-    if model:
-        config_args['model'] = model
-    config = config_class(**config_args)
-    client = LLMAPIClient(config)
+def run(b_ask:bool, output_dir:str) -> None:
+    # Input parsing from environment variables
+    with tracing.span('parse_inputs'):
+        report_files = get_path_tuple(os.environ['INPUT_REPORT-FILES'])
+        student_files = get_path_tuple(os.environ['INPUT_STUDENT-FILES'])
+        readme_file = pathlib.Path(os.environ['INPUT_README-PATH'])
+        assert readme_file.exists(), 'No README file found'
+
+        explanation_in = os.environ.get('INPUT_EXPLANATION-IN', 'English')
+        languages = prompt.get_language_list(explanation_in)
+        logging.info(f"Using explanation language: {', '.join(languages)}")
+
+        github_repo = os.environ.get('GITHUB_REPOSITORY', 'unknown/repository')
+        b_fail_expected = ('true' == os.getenv('INPUT_FAIL-EXPECTED', 'false').lower())
+
+    with tracing.span('create_client'):
+        model, api_key = get_model_key_from_env()
+        client = create_client(model, api_key)
+        ledger = usage_ledger.ledger_from_env(output_dir)
+        if ledger:
+            client.observers.append(ledger.observe)
 
     logging.info("Starting feedback generation process...")
     logging.info(f"Report paths: {report_files}")
     logging.info(f"Student files: {student_files}")
     logging.info(f"Readme file: {readme_file}")
 
-    n_failed, question = prompt.engineering(report_files, student_files, readme_file, explanation_in)
+    # The fingerprint does not depend on the prompt, so a cache hit is known before building it
+    cache_dir = os.getenv('INPUT_CACHE-DIR', '') or output_dir
+    fingerprint = None
+    cached = None
+    if b_ask and cache_dir:
+        with tracing.span('fingerprint'):
+            fingerprint = feedback_cache.compute_fingerprint(report_files, student_files, readme_file, languages, model)
+            cached = feedback_cache.load_cached_feedback(pathlib.Path(cache_dir), fingerprint)
+
+    if b_ask and not cached and is_warmup_enabled_from_env():
+        # DNS, TCP and TLS setup overlap with building the prompt
+        client.warmup()
+
+    with tracing.span('prompt.engineering', languages=','.join(languages)) as span:
+        if len(languages) > 1:
+            n_failed, question = prompt.engineering_multilingual(
+                report_files, student_files, readme_file, languages, model=model)
+        else:
+            n_failed, question = prompt.engineering(report_files, student_files, readme_file, languages[0], model=model)
+        span.set_attribute('prompt_chars', len(question))
 
-    if b_ask:
+    if cached:
+        logging.info(f"Failures and code unchanged (fingerprint {fingerprint[:12]}); reusing previous feedback")
+        feedback = cached['feedback']
+    elif b_ask:
         logging.info(f"Calling {model} API for feedback...")
         feedback = client.call_api(question)
         if not feedback:
@@ -62,17 +97,30 @@ def main(b_ask:bool=True) -> None:
             sys.exit(1)
         else:
             logging.info("Feedback received successfully")
+        if fingerprint:
+            feedback_cache.save_feedback(pathlib.Path(cache_dir), fingerprint, feedback, model)
     else:
         feedback = "Feedback not requested"
 
+    sections = {}
+    if len(languages) > 1:
+        sections = prompt.split_feedback_by_language(feedback, languages)
+        feedback = "\n\n".join(
+            f"## {language}\n\n{text}" for language, text in sections.items()
+        )
+
+    if cached:
+        feedback = feedback_cache.get_reuse_notice(cached) + feedback
+
     feedback_with_context = f"Feedback for {github_repo}:\n\n{feedback}"
     print(feedback_with_context)
 
     # Write to GITHUB_STEP_SUMMARY with error handling for permissions
     if os.getenv('GITHUB_STEP_SUMMARY'):
         try:
-            with open(os.environ['GITHUB_STEP_SUMMARY'], 'a', encoding='utf-8') as f:
-                f.write(feedback_with_context)
+            with tracing.span('write_step_summary'):
+                with open(os.environ['GITHUB_STEP_SUMMARY'], 'a', encoding='utf-8') as f:
+                    f.write(feedback_with_context)
         except PermissionError as e:
             logging.error(f"Failed to write to GITHUB_STEP_SUMMARY: {e}")
             sys.exit(1)
@@ -81,58 +129,26 @@ def main(b_ask:bool=True) -> None:
         assert n_failed > 0, 'No failed tests detected when failure was expected'
 
     # Write token usage to artifact directory if available
-    output_dir = os.getenv('INPUT_OUTPUT-DIR', '')
-    if output_dir and b_ask:
-        write_token_usage(client, model, pathlib.Path(output_dir))
-
-
-def extract_token_usage(raw_response: Optional[dict]) -> Dict[str, Any]:
-    """Extract token usage from LLM API response (best-effort, multi-provider).
-
-    Different providers return usage in different structures:
-      Gemini:     usageMetadata.promptTokenCount / candidatesTokenCount
-      Claude:     usage.input_tokens / output_tokens
-      OpenAI-like: usage.prompt_tokens / completion_tokens (Grok, NVIDIA, Perplexity)
-
-    Returns dict with input_tokens, output_tokens, total_tokens (None if unavailable).
-    """
-    if not raw_response or not isinstance(raw_response, dict):
-        return {"input_tokens": None, "output_tokens": None, "total_tokens": None}
-
-    # Gemini format
-    usage = raw_response.get("usageMetadata", {})
-    if usage:
-        return {
-            "input_tokens": usage.get("promptTokenCount"),
-            "output_tokens": usage.get("candidatesTokenCount"),
-            "total_tokens": usage.get("totalTokenCount"),
-        }
-
-    # Claude / OpenAI-compatible format
-    usage = raw_response.get("usage", {})
-    if usage:
-        input_t = usage.get("input_tokens") or usage.get("prompt_tokens")
-        output_t = usage.get("output_tokens") or usage.get("completion_tokens")
-        total_t = usage.get("total_tokens")
-        if total_t is None and input_t is not None and output_t is not None:
-            total_t = input_t + output_t
-        return {
-            "input_tokens": input_t,
-            "output_tokens": output_t,
-            "total_tokens": total_t,
-        }
-
-    return {"input_tokens": None, "output_tokens": None, "total_tokens": None}
+    with tracing.span('write_artifacts'):
+        if output_dir and sections:
+            write_feedback_sections(sections, pathlib.Path(output_dir))
+        if output_dir and b_ask:
+            write_token_usage(client, model, pathlib.Path(output_dir), reused=bool(cached))
 
 
 def write_token_usage(
     client: 'LLMAPIClient',
     model: str,
     output_dir: pathlib.Path,
+    reused: bool = False,
 ) -> None:
-    """Write token_usage.json to output directory."""
+    """Write token_usage.json to output directory.
+
+    ``reused`` marks runs that served cached feedback without an API call.
+    """
     usage = extract_token_usage(client.last_raw_response)
     usage["model"] = model
+    usage["reused"] = reused
 
     output_dir.mkdir(parents=True, exist_ok=True)
     usage_path = output_dir / "token_usage.json"
@@ -144,6 +160,21 @@ def write_token_usage(
         logging.warning(f"Could not write token usage: {e}")
 
 
+def write_feedback_sections(
+    sections: Dict[str, str],
+    output_dir: pathlib.Path,
+) -> None:
+    """Write one feedback_<language>.md per language section to output directory."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for language, text in sections.items():
+        feedback_path = output_dir / f"feedback_{language.replace(' ', '_')}.md"
+        try:
+            feedback_path.write_text(text, encoding="utf-8")
+            logging.info(f"Feedback in {language} written to {feedback_path}")
+        except OSError as e:
+            logging.warning(f"Could not write feedback in {language}: {e}")
+
+
 def get_path_tuple(paths_str: str) -> Tuple[pathlib.Path]:
     """
     Converts a comma-separated string of file paths to a tuple of pathlib.Path objects.
@@ -160,6 +191,7 @@ def get_path_tuple(paths_str: str) -> Tuple[pathlib.Path]:
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     main()
 
 # end entrypoint.py
@@ -0,0 +1,171 @@
+# begin feedback_cache.py
+"""Reuse feedback when the test failures and student code are unchanged.
+
+Students often push commits that only touch comments or unrelated files. The
+fingerprint covers the failing tests (node id, outcome, phase, and the
+traceback with line numbers and addresses normalized away), the student
+code with comments stripped, and the assignment README without blank lines,
+plus the model and feedback languages. When it
+matches the one stored by the previous run, that run's feedback is reused and
+no LLM call is made.
+
+Keep the cache directory between runs (e.g. with actions/cache) for this to
+take effect.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import pathlib
+import re
+import time
+import tokenize
+
+from typing import Any, Dict, Iterable, List, Optional
+
+import report_merge
+
+
+CACHE_FILENAME = 'feedback_cache.json'
+FINGERPRINT_VERSION = 2
+
+C_LIKE_SUFFIXES = ('.c', '.cc', '.cpp', '.cxx', '.h', '.hpp')
+
+# String and character literals are matched first so comment markers inside
+# them survive; only the comment alternatives are dropped.
+_C_COMMENT_PATTERN = re.compile(
+    r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')|//[^\n]*|/\*.*?\*/',
+    re.DOTALL,
+)
+
+_VOLATILE_FAILURE_PATTERNS = (
+    (re.compile(r':\d+:'), ':N:'),                 # file.py:23:
+    (re.compile(r'\bline \d+'), 'line N'),          # File "x.py", line 23
+    (re.compile(r'0x[0-9a-fA-F]+'), '0xADDR'),      # object addresses
+    (re.compile(r'\b\d+(\.\d+)?s\b'), 'Ns'),        # durations
+)
+
+
+def normalize_python_source(text: str) -> str:
+    """Token stream of *text* without comments or blank lines."""
+    try:
+        tokens = [
+            tok.string if tok.string.strip() else tokenize.tok_name[tok.type]
+            for tok in tokenize.generate_tokens(io.StringIO(text).readline)
+            if tok.type not in (tokenize.COMMENT, tokenize.NL)
+        ]
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return normalize_plain_source(text)
+    return ' '.join(tokens)
+
+
+def normalize_c_source(text: str) -> str:
+    """*text* without // and /* */ comments or blank lines."""
+    return normalize_plain_source(
+        _C_COMMENT_PATTERN.sub(lambda m: m.group(1) or '', text)
+    )
+
+
+def normalize_plain_source(text: str) -> str:
+    return '\n'.join(line.rstrip() for line in text.splitlines() if line.strip())
+
+
+def normalize_source(path: pathlib.Path) -> str:
+    text = path.read_text(encoding='utf-8', errors='replace')
+    suffix = path.suffix.lower()
+    if suffix == '.py':
+        return normalize_python_source(text)
+    if suffix in C_LIKE_SUFFIXES:
+        return normalize_c_source(text)
+    return normalize_plain_source(text)
+
+
+def normalize_failure_text(text: str) -> str:
+    for pattern, replacement in _VOLATILE_FAILURE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def collect_failures(report_paths: Iterable[pathlib.Path]) -> List[List[str]]:
+    """Sorted [nodeid, outcome, phase, longrepr, stderr] for every failing test phase."""
+    failures = []
+    for test in report_merge.load_merged_report(report_paths)['tests']:
+        if test.get('outcome') in ('passed', 'skipped'):
+            continue
+        for phase in report_merge.TEST_PHASES:
+            detail = test.get(phase)
+            if not isinstance(detail, dict):
+                continue
+            failures.append([
+                test.get('nodeid', ''),
+                test.get('outcome', ''),
+                phase,
+                normalize_failure_text(str(detail.get('longrepr') or '')),
+                normalize_failure_text(str(detail.get('stderr') or '')),
+            ])
+    return sorted(failures)
+
+
+def compute_fingerprint(
+    report_paths: Iterable[pathlib.Path],
+    student_files: Iterable[pathlib.Path],
+    readme_file: pathlib.Path,
+    languages: Iterable[str],
+    model: str,
+) -> str:
+    """Stable SHA-256 of the failure set, the normalized student code and README, model and languages."""
+    payload = {
+        'version': FINGERPRINT_VERSION,
+        'model': model,
+        'languages': list(languages),
+        'failures': collect_failures(report_paths),
+        'code': [[f.name, normalize_source(f)] for f in student_files],
+        'readme': normalize_plain_source(readme_file.read_text(encoding='utf-8', errors='replace')),
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def load_cached_feedback(cache_dir: pathlib.Path, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Return the stored entry if it was saved under *fingerprint*, else None."""
+    cache_path = cache_dir / CACHE_FILENAME
+    try:
+        entry = json.loads(cache_path.read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable feedback cache {cache_path}: {e}")
+        return None
+
+    if not isinstance(entry, dict) or entry.get('fingerprint') != fingerprint or not entry.get('feedback'):
+        return None
+    return entry
+
+
+def save_feedback(cache_dir: pathlib.Path, fingerprint: str, feedback: str, model: str) -> None:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cache_path = cache_dir / CACHE_FILENAME
+    entry = {
+        'fingerprint': fingerprint,
+        'model': model,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'feedback': feedback,
+    }
+    tmp_path = cache_path.with_suffix('.tmp')
+    try:
+        tmp_path.write_text(json.dumps(entry, ensure_ascii=False, indent=2), encoding='utf-8')
+        tmp_path.replace(cache_path)
+        logging.info(f"Feedback cached in {cache_path} (fingerprint {fingerprint[:12]})")
+    except OSError as e:
+        logging.warning(f"Could not write feedback cache: {e}")
+
+
+def get_reuse_notice(entry: Dict[str, Any]) -> str:
+    return (
+        f"> **Reused feedback** from the run at {entry.get('created', 'an earlier time')}: "
+        f"test failures and code are unchanged (fingerprint `{entry['fingerprint'][:12]}`), "
+        "so no LLM call was made.\n\n"
+    )
+
+# end feedback_cache.py
@@ -0,0 +1,176 @@
+# begin key_pool.py
+"""Spread LLM calls over several API keys of one provider.
+
+A provider key variable (e.g. INPUT_GEMINI-API-KEY) may hold several keys
+separated by commas; ``llm_utils.create_client`` then gives the client a
+``KeyPool`` shared by every client of that provider and key set, and the
+client asks the pool for a key on each HTTP attempt.
+
+- Keys are chosen by smooth weighted round-robin. A key's weight is the
+  fraction of its quota left, from the rate limit headers of its last
+  response (``llm_utils.parse_rate_limit_headers``); keys without headers
+  count as full.
+- A key answered with 429, or whose quota is used up, sits in a penalty box
+  until Retry-After or the quota reset, else for ``penalty_sec`` doubling on
+  each consecutive 429 up to ``max_penalty_sec``.
+- Requests, 429s, errors and tokens are counted per key (``KeyPool.usage``
+  and ``tutor_llm_key_requests_total``); the usage ledger records the key of
+  each attempt too. Keys are reported by ``key_id``, a short hash, never in
+  clear.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from llm_utils import extract_token_usage, parse_rate_limit_headers, quota_fraction
+
+import metrics
+
+
+DEFAULT_PENALTY_SEC = 30.0
+MAX_PENALTY_SEC = 300.0
+
+key_requests = metrics.REGISTRY.counter(
+    'tutor_llm_key_requests_total', 'HTTP attempts per pooled API key by response status or error',
+    ('provider', 'key', 'status'))
+
+
+def key_id(api_key: str) -> str:
+    """Short, stable identifier of *api_key* that is safe to log."""
+    return hashlib.sha256(api_key.strip().encode('utf-8')).hexdigest()[:8]
+
+
+class KeyState:
+    """Rotation state and usage of one key."""
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self.key_id = key_id(api_key)
+        self.weight = 1.0
+        self.current = 0.0
+        self.penalty_until = 0.0
+        self.strikes = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def usage(self, now: float) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'rate_limited': self.rate_limited,
+            'errors': self.errors,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'weight': round(self.weight, 4),
+            'penalty_sec': round(max(0.0, self.penalty_until - now), 3),
+        }
+
+
+class KeyPool:
+    """Weighted rotation over the keys of one provider.
+
+    Attributes:
+        keys (List[KeyState]): One entry per distinct key, in the given order
+        penalty_sec (float): Penalty after a first 429 without Retry-After
+        max_penalty_sec (float): Cap of the doubling penalty
+    """
+
+    def __init__(self, api_keys: Sequence[str], penalty_sec: float = DEFAULT_PENALTY_SEC,
+                 max_penalty_sec: float = MAX_PENALTY_SEC, clock: Callable[[], float] = time.monotonic):
+        unique = list(dict.fromkeys(k.strip() for k in api_keys if k.strip()))
+        if not unique:
+            raise ValueError("A key pool needs at least one API key")
+        self.keys = [KeyState(k) for k in unique]
+        self.penalty_sec = penalty_sec
+        self.max_penalty_sec = max_penalty_sec
+        self.clock = clock
+        self._by_key = {state.api_key: state for state in self.keys}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def available(self) -> int:
+        """Keys not in the penalty box."""
+        now = self.clock()
+        with self._lock:
+            return sum(1 for state in self.keys if state.penalty_until <= now)
+
+    def acquire(self) -> str:
+        """The next key to use; if every key is penalized, the one released soonest."""
+        now = self.clock()
+        with self._lock:
+            ready = [state for state in self.keys if state.penalty_until <= now]
+            if not ready:
+                return min(self.keys, key=lambda state: state.penalty_until).api_key
+            # Keys without quota left still get a share if nothing else is ready
+            weights = [max(state.weight, 1e-3) for state in ready]
+            total = sum(weights)
+            for state, weight in zip(ready, weights):
+                state.current += weight
+            chosen = max(ready, key=lambda state: state.current)
+            chosen.current -= total
+            return chosen.api_key
+
+    def observe(self, api_key: str, event: Dict[str, Any]) -> None:
+        """Update *api_key*'s weight, penalty and usage from an ``LLMAPIClient`` attempt event."""
+        state = self._by_key.get(api_key.strip())
+        if state is None:
+            return
+        limits = parse_rate_limit_headers(event.get('headers') or {})
+        usage = extract_token_usage(event.get('raw_response'))
+        now = self.clock()
+        status = event['status_code'] if event.get('status_code') is not None else event.get('error') or 'error'
+        key_requests.inc(provider=event.get('provider', 'unknown'), key=state.key_id, status=status)
+        with self._lock:
+            state.requests += 1
+            state.input_tokens += usage['input_tokens'] or 0
+            state.output_tokens += usage['output_tokens'] or 0
+            fraction = quota_fraction(limits)
+            if fraction is not None:
+                state.weight = fraction
+
+            if event.get('status_code') == 429:
+                state.rate_limited += 1
+                state.strikes += 1
+                penalty = limits['retry_after_sec'] or limits['reset_sec'] or min(
+                    self.penalty_sec * 2 ** (state.strikes - 1), self.max_penalty_sec)
+                state.penalty_until = now + penalty
+                logging.warning(f"API key {state.key_id} rate limited; resting it for {penalty:.0f}s")
+                return
+
+            if event.get('status_code') == 200:
+                state.strikes = 0
+            else:
+                state.errors += 1
+            if fraction == 0.0 and limits['reset_sec']:
+                state.penalty_until = now + limits['reset_sec']
+
+    def usage(self) -> Dict[str, Dict[str, Any]]:
+        """Per ``key_id``: requests, 429s, errors, tokens, current weight and remaining penalty."""
+        now = self.clock()
+        with self._lock:
+            return {state.key_id: state.usage(now) for state in self.keys}
+
+
+_pools: Dict[Tuple[str, Tuple[str, ...]], KeyPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(provider: str, api_keys: Sequence[str]) -> KeyPool:
+    """The process-wide pool for *provider* and this key set, so all its clients share one rotation."""
+    key = (provider, tuple(api_keys))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = KeyPool(api_keys)
+            logging.info(f"Rotating {len(pool)} {provider} API keys")
+        return pool
+
+# end key_pool.py
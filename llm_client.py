@@ -1,11 +1,39 @@
 # begin llm_client.py
+import json
 import logging
+import threading
 import time
-from typing import Optional
+import urllib.parse
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-import requests
+import metrics
+import tracing
 
-from llm_configs import LLMConfig
+from key_pool import key_id
+
+if TYPE_CHECKING:
+    import requests
+
+    from key_pool import KeyPool
+    from llm_configs import LLMConfig
+
+
+# Smaller bodies gain too little to pay for the compression
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+# A warmup only opens a connection; the provider need not answer quickly
+WARMUP_TIMEOUT_SEC = 10
+
+
+def __getattr__(name: str):
+    # requests costs more to import than the rest of the tutor together, so it
+    # is loaded on the first API call; llm_client.requests still resolves.
+    if name == 'requests':
+        import requests
+        return requests
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class LLMAPIClient:
@@ -20,11 +48,18 @@ class LLMAPIClient:
         retry_delay_sec (float): Base delay between retry attempts in seconds
         max_retry_attempt (int): Maximum number of retry attempts
         timeout_sec (int): Request timeout duration in seconds
+        session (requests.Session, optional): Session reused across calls to keep connections warm,
+            or a cassette.Cassette that records or replays them
+        key_pool (KeyPool, optional): Keys of the config's provider to rotate over per attempt
+        gzip_request (bool): Whether request bodies are gzip-compressed where the config supports it
+        observers (List[Callable]): Callables notified with an event dict after every HTTP attempt
         logger (logging.Logger): Logger instance for tracking operations
     """
 
-    def __init__(self, config: LLMConfig, retry_delay_sec: float = 5.0,
-                 max_retry_attempt: int = 3, timeout_sec: int = 60):
+    def __init__(self, config: 'LLMConfig', retry_delay_sec: float = 5.0,
+                 max_retry_attempt: int = 3, timeout_sec: int = 60,
+                 session: Optional['requests.Session'] = None, key_pool: Optional['KeyPool'] = None,
+                 gzip_request: bool = False):
         """Initialize the LLM API client with retry and timeout settings.
 
         Args:
@@ -32,6 +67,12 @@ class LLMAPIClient:
             retry_delay_sec (float, optional): Base delay between retries in seconds. Defaults to 5.0
             max_retry_attempt (int, optional): Maximum number of retry attempts. Defaults to 3
             timeout_sec (int, optional): Maximum time allowed per request in seconds. Defaults to 60
+            session (requests.Session, optional): Session for connection pooling. Defaults to None,
+                which sends each request with a fresh connection
+            key_pool (KeyPool, optional): API keys to rotate over; a 429 retries at once with
+                another key when one is available. Defaults to None, which uses config.api_key
+            gzip_request (bool, optional): Compress request bodies of GZIP_MIN_BYTES or more if
+                config.supports_gzip_request. Defaults to False
 
         Raises:
             ValueError: If retry_delay_sec or timeout_sec is not positive, or max_retry_attempt is negative
@@ -49,8 +90,125 @@ class LLMAPIClient:
         self.retry_delay_sec = retry_delay_sec
         self.max_retry_attempt = max_retry_attempt
         self.timeout_sec = timeout_sec
+        self.session = session
+        self.key_pool = key_pool
+        self.gzip_request = gzip_request
+        self._key_configs: Dict[str, 'LLMConfig'] = {}
+        self.observers: List[Callable[[Dict[str, Any]], None]] = []
         self.logger = logging.getLogger(__name__)  # Logger for this module
         self.last_raw_response = None  # Store last API response for token usage extraction
+        self._warmup_thread: Optional[threading.Thread] = None
+
+    def warmup(self) -> Optional[threading.Thread]:
+        """Open the connection to the provider on a daemon thread while the caller works.
+
+        Imports requests, creates a session if the client has none, and sends
+        a HEAD request without credentials to the origin of config.api_url.
+        DNS, TCP and TLS setup then happen during local work (such as
+        building the prompt), and the connection stays in the session's pool
+        for the first call. call_api and stream_api wait for a running warmup
+        before sending, so they reuse its connection instead of opening a
+        second one. Failures are logged at debug level and change nothing.
+
+        Returns:
+            Optional[threading.Thread]: The warmup thread, or None if the session
+            cannot pool connections (e.g. a cassette.Cassette) or a warmup already ran
+        """
+        if self._warmup_thread is not None or (self.session is not None and not hasattr(self.session, 'head')):
+            return None
+        self._warmup_thread = threading.Thread(target=self._warm_connection, name='llm-warmup', daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    def _warm_connection(self) -> None:
+        start = time.perf_counter()
+        try:
+            import requests
+
+            if self.session is None:
+                self.session = requests.Session()
+            parts = urllib.parse.urlsplit(self.config.api_url)
+            self.session.head(f"{parts.scheme}://{parts.netloc}/", timeout=min(self.timeout_sec, WARMUP_TIMEOUT_SEC))
+        except Exception as e:
+            self.logger.debug(f"Connection warmup failed: {e}")
+            return
+        self.logger.debug(f"Connection to {parts.netloc} warmed up in {time.perf_counter() - start:.3f}s")
+
+    def _wait_for_warmup(self) -> None:
+        thread = self._warmup_thread
+        if thread is not None and thread.is_alive():
+            with tracing.span('wait_for_warmup'):
+                # Name resolution is not bound by the HEAD timeout; don't hang on it
+                thread.join(min(self.timeout_sec, WARMUP_TIMEOUT_SEC))
+
+    def _attempt_config(self) -> 'LLMConfig':
+        """The config for the next attempt: self.config, or a copy with the pool's next key."""
+        if self.key_pool is None:
+            return self.config
+        api_key = self.key_pool.acquire()
+        config = self._key_configs.get(api_key)
+        if config is None:
+            config = self._key_configs[api_key] = self.config.with_api_key(api_key)
+        return config
+
+    def _body_kwargs(self, data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str], Optional[Tuple[int, int]]]:
+        """Body arguments for post, extra headers, and (raw, sent) body bytes when compressed.
+
+        Without compression the payload goes as ``json=`` like before, and
+        its size is not measured.
+        """
+        if not (self.gzip_request and getattr(self.config, 'supports_gzip_request', False)):
+            return {'json': data}, {}, None
+        raw = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        if len(raw) < GZIP_MIN_BYTES:
+            return {'json': data}, {}, None
+
+        import gzip
+
+        body = gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+        return {'data': body}, {'Content-Encoding': 'gzip'}, (len(raw), len(body))
+
+    def _notify(self, attempt: int, latency_sec: float, response: Any = None,
+                raw_response: Optional[dict] = None, error: Optional[str] = None,
+                config: Optional['LLMConfig'] = None, request_bytes: Optional[Tuple[int, int]] = None,
+                streamed: bool = False) -> None:
+        """Report one HTTP attempt to the metrics registry, the key pool, and every observer.
+
+        The event carries model, provider, key_id (short hash of the key used),
+        attempt, status_code (None when no response arrived), latency_sec,
+        lower-cased response headers, the parsed raw_response on success, an
+        error tag, and body sizes as (decoded, wire) bytes: request_bytes when
+        the request was compressed, response_bytes when the response was and
+        was not *streamed*.
+        Metrics and observer failures are logged and never affect the call.
+        """
+        config = config or self.config
+        api_key = getattr(config, 'api_key', None)
+        headers = getattr(response, 'headers', None)
+        event = {
+            'model': self.config.model,
+            'provider': getattr(self.config, 'provider', 'unknown'),
+            'key_id': key_id(api_key) if isinstance(api_key, str) else None,
+            'attempt': attempt,
+            'status_code': getattr(response, 'status_code', None),
+            'latency_sec': latency_sec,
+            'headers': {str(k).lower(): v for k, v in headers.items()} if isinstance(headers, Mapping) else {},
+            'raw_response': raw_response,
+            'error': error,
+            'request_bytes': request_bytes,
+            'response_bytes': response_body_sizes(response, streamed) if raw_response is not None else None,
+        }
+        try:
+            metrics.observe_attempt(event)
+            if self.key_pool is not None:
+                self.key_pool.observe(api_key, event)
+        except Exception:
+            self.logger.exception("Recording metrics failed")
+        for observer in self.observers:
+            try:
+                observer(event)
+            except Exception:
+                self.logger.exception(f"Observer {observer!r} failed")
 
     def call_api(self, question: str) -> Optional[str]:
         """Send a question to the LLM API with retry and timeout handling.
@@ -72,48 +230,92 @@ class LLMAPIClient:
             - Logs detailed errors for debugging and monitoring
             - Returns None for any unrecoverable error (timeout, network, parsing, etc.)
         """
-        # Prepare request components from config
-        headers = self.config.get_headers()
+        with tracing.span('call_api', model=self.config.model, question_chars=len(question)):
+            answer = self._call_api(question)
+        metrics.llm_calls.inc(**self._metric_labels(), outcome='success' if answer else 'failure')
+        return answer
+
+    def _metric_labels(self) -> Dict[str, str]:
+        return {'provider': getattr(self.config, 'provider', 'unknown'), 'model': self.config.model}
+
+    def _call_api(self, question: str) -> Optional[str]:
+        import requests
+
+        self._wait_for_warmup()
+        # Prepare request components from config; the key (in headers or URL) may change per attempt
         data = self.config.format_request_data(question)
+        body_kwargs, body_headers, request_bytes = self._body_kwargs(data)
+        post = self.session.post if self.session is not None else requests.post
 
         # Retry loop for handling rate limits and transient failures
         for attempt in range(self.max_retry_attempt + 1):
+            config = self._attempt_config()
+            start = time.perf_counter()
             try:
                 # Make the POST request with timeout
-                response = requests.post(
-                    self.config.api_url,
-                    headers=headers,
-                    json=data,
-                    timeout=self.timeout_sec
-                )
+                with tracing.span('http_post', attempt=attempt) as span:
+                    response = post(
+                        config.api_url,
+                        headers={**config.get_headers(), **body_headers},
+                        timeout=self.timeout_sec,
+                        **body_kwargs,
+                    )
+                    span.set_attribute('status_code', response.status_code)
             except requests.Timeout:
+                self._notify(attempt, time.perf_counter() - start, error='timeout',
+                             config=config, request_bytes=request_bytes)
                 # Log timeout errors and fail immediately
                 self.logger.error(f"Request timed out after {self.timeout_sec}s for question: {question if len(question) < 100 else question[:10]}")
                 return None
             except requests.RequestException as e:
+                self._notify(attempt, time.perf_counter() - start, error='network',
+                             config=config, request_bytes=request_bytes)
                 # Log general network errors (connection issues, etc.) and fail
                 self.logger.error(f"Network error occurred for question '{question if len(question) < 100 else question[:10]}': {str(e)}")
                 return None
 
+            latency_sec = time.perf_counter() - start
+
             # Handle successful response
             if response.status_code == 200:
                 try:
                     # Parse JSON and extract response using config-specific method
                     result = response.json()
-                    self.last_raw_response = result
+                except ValueError as e:
+                    self._notify(attempt, latency_sec, response=response, error='invalid_json',
+                                 config=config, request_bytes=request_bytes)
+                    self.logger.exception(f"Failed to parse API response for question '{question if len(question) < 100 else question[:10]}': {str(e)}")
+                    return None
+                self.last_raw_response = result
+                self._notify(attempt, latency_sec, response=response, raw_response=result,
+                             config=config, request_bytes=request_bytes)
+                try:
                     return self.config.parse_response(result)
                 except (ValueError, KeyError) as e:
-                    # Log parsing errors (invalid JSON or unexpected structure)
+                    # Log parsing errors (unexpected structure)
                     self.logger.exception(f"Failed to parse API response for question '{question if len(question) < 100 else question[:10]}': {str(e)}")
                     return None
-            elif response.status_code == 429:  # Rate limit exceeded
-                if attempt < self.max_retry_attempt:
+
+            # Every other status is reported before deciding whether to retry
+            self._notify(attempt, latency_sec, response=response, config=config, request_bytes=request_bytes)
+
+            if response.status_code == 429:  # Rate limit exceeded
+                if attempt < self.max_retry_attempt and self.key_pool is not None and self.key_pool.available():
+                    # The pool benched this key; another one can go right away
+                    self.logger.warning(
+                        f"Rate limit (429) hit. Retrying with another API key "
+                        f"(attempt {attempt + 1}/{self.max_retry_attempt})"
+                    )
+                    metrics.llm_retries.inc(**self._metric_labels())
+                    continue
+                elif attempt < self.max_retry_attempt:
                     # Calculate exponential backoff delay: base_delay * 2^attempt
                     delay = self.retry_delay_sec * (2 ** attempt)
                     self.logger.warning(
                         f"Rate limit (429) hit. Retrying in {delay:.1f}s "
                         f"(attempt {attempt + 1}/{self.max_retry_attempt})"
                     )
+                    metrics.llm_retries.inc(**self._metric_labels())
                     time.sleep(delay)
                     continue  # Retry the request
                 else:
@@ -132,4 +334,140 @@ class LLMAPIClient:
         # but included for completeness and static analysis tools
         return None
 
+    def stream_api(self, question: str) -> Iterator[str]:
+        """Send a question and yield the answer text as it is generated.
+
+        Uses the config's streaming endpoint and payload (server-sent events).
+        Closing the generator early (``close()``, or leaving a ``for`` loop over
+        it that is then garbage-collected) closes the connection, which cancels
+        the generation on the provider's side.
+
+        Args:
+            question (str): The input prompt or question to send to the API
+
+        Yields:
+            str: Text deltas in arrival order
+
+        Notes:
+            - No retries: on a timeout, network error or non-200 status nothing is
+              yielded and the error is logged, so callers can fall back to call_api
+            - The token usage the events reported (``config.merge_stream_usage``) is kept in last_raw_response
+        """
+        import requests
+
+        self._wait_for_warmup()
+        config = self._attempt_config()
+        data = self.config.format_stream_request_data(question)
+        body_kwargs, body_headers, request_bytes = self._body_kwargs(data)
+        post = self.session.post if self.session is not None else requests.post
+
+        start = time.perf_counter()
+        try:
+            with tracing.span('http_post', attempt=0, stream=True) as span:
+                # A gzip-encoded event stream is decoded chunk by chunk as lines are read
+                response = post(
+                    config.get_stream_url(),
+                    headers={**config.get_headers(), **body_headers},
+                    timeout=self.timeout_sec,
+                    stream=True,
+                    **body_kwargs,
+                )
+                span.set_attribute('status_code', response.status_code)
+        except requests.Timeout:
+            self._notify(0, time.perf_counter() - start, error='timeout', config=config, request_bytes=request_bytes)
+            self.logger.error(f"Streaming request timed out after {self.timeout_sec}s")
+            return
+        except requests.RequestException as e:
+            self._notify(0, time.perf_counter() - start, error='network', config=config, request_bytes=request_bytes)
+            self.logger.error(f"Network error occurred while streaming: {str(e)}")
+            return
+
+        if response.status_code != 200:
+            self._notify(0, time.perf_counter() - start, response=response, config=config, request_bytes=request_bytes)
+            self.logger.error(f"Streaming request failed with status {response.status_code} {response.text}")
+            response.close()
+            return
+
+        usage = None
+        error = None
+        try:
+            for event in iter_sse_events(response.iter_lines()):
+                usage = self.config.merge_stream_usage(usage, event)
+                text = self.config.parse_stream_event(event)
+                if text:
+                    yield text
+        except requests.RequestException as e:
+            error = 'network'
+            self.logger.error(f"Stream interrupted: {str(e)}")
+        finally:
+            response.close()
+            self.last_raw_response = usage
+            self._notify(0, time.perf_counter() - start, response=response, raw_response=usage, error=error,
+                         config=config, request_bytes=request_bytes, streamed=True)
+
+
+def response_body_sizes(response: Any, streamed: bool = False) -> Optional[Tuple[int, int]]:
+    """(decoded, wire) bytes of a compressed response body read in full, else None.
+
+    requests asks for gzip and deflate and decodes them transparently; the
+    decoded size is that of ``response.content`` and the wire size the
+    Content-Length of the encoded body. A *streamed* body was consumed line
+    by line and is not measured.
+    """
+    headers = getattr(response, 'headers', None)
+    if streamed or not isinstance(headers, Mapping):
+        return None
+    lowered = {str(k).lower(): v for k, v in headers.items()}
+    if lowered.get('content-encoding', 'identity') == 'identity':
+        return None
+    content = getattr(response, 'content', None)
+    if not isinstance(content, bytes):
+        return None
+    try:
+        return len(content), int(lowered['content-length'])
+    except (KeyError, ValueError):
+        return None
+
+
+def iter_sse_events(lines: Iterable[Union[bytes, str]]) -> Iterator[Dict[str, Any]]:
+    """Decode the JSON ``data:`` payloads of a server-sent event stream.
+
+    Multi-line data fields are joined; ``event:``, ``id:`` and comment lines
+    are ignored, and the OpenAI-style ``[DONE]`` sentinel ends the stream.
+    """
+    data_lines: List[str] = []
+
+    def dispatch() -> Optional[Dict[str, Any]]:
+        payload = '\n'.join(data_lines)
+        data_lines.clear()
+        if not payload:
+            return None
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logging.getLogger(__name__).warning(f"Skipping malformed stream event: {payload[:100]}")
+            return None
+        return event if isinstance(event, dict) else None
+
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.rstrip('\r')
+
+        if not line:
+            event = dispatch()
+            if event is not None:
+                yield event
+            continue
+
+        if line.startswith('data:'):
+            value = line[5:].lstrip(' ')
+            if value == '[DONE]':
+                break
+            data_lines.append(value)
+
+    event = dispatch()
+    if event is not None:
+        yield event
+
 # end llm_client.py
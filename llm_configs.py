@@ -1,17 +1,15 @@
 # begin llm_configs.py
+import copy
 import logging
 
 from dataclasses import dataclass
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 
 # Type alias for headers dictionary to improve code readability and type hinting
 HEADER = Dict[str, str]
 
 
-logging.basicConfig(level=logging.INFO)
-
-
 @dataclass
 class LLMConfig:
     """Base configuration class for LLM APIs.
@@ -24,6 +22,8 @@ class LLMConfig:
         api_url (str): Base URL endpoint for the API
         model (str): Specific model identifier to use
         default_headers (HEADER, optional): Default HTTP headers. Defaults to None.
+        provider (str): Provider name, matching the keys of llm_utils.get_api_key_dict_from_env()
+        supports_gzip_request (bool): Whether the API accepts gzip request bodies (``Content-Encoding: gzip``)
     """
 
     api_key: str
@@ -31,6 +31,10 @@ class LLMConfig:
     model: str
     default_headers: HEADER = None
 
+    # class attributes, not dataclass fields
+    provider = 'generic'
+    supports_gzip_request = False  # unless the provider documents it
+
     def __post_init__(self):
         """Initialize default headers if not provided.
 
@@ -43,6 +47,30 @@ class LLMConfig:
         if not self.api_key.strip():
             raise ValueError("API key is required")
 
+    def with_api_key(self, api_key: str) -> 'LLMConfig':
+        """Returns a copy of this config that authenticates with another key.
+
+        The key is swapped wherever __post_init__ placed it (headers, or the
+        URL for Gemini); per-instance overrides such as a patched
+        format_request_data carry over.
+
+        Args:
+            api_key (str): Key of the same provider
+
+        Returns:
+            LLMConfig: Shallow copy with the new key
+        """
+        old, new = self.api_key.strip(), api_key.strip()
+        clone = copy.copy(self)
+        clone.api_key = new
+        if self.api_url:
+            clone.api_url = self.api_url.replace(old, new)
+        if self.default_headers:
+            clone.default_headers = {
+                k: v.replace(old, new) if isinstance(v, str) else v for k, v in self.default_headers.items()
+            }
+        return clone
+
     def get_headers(self) -> HEADER:
         """Returns headers with Authorization token by default.
 
@@ -89,6 +117,61 @@ class LLMConfig:
         """
         raise NotImplementedError("Subclasses must implement parse_response()")
 
+    def get_stream_url(self) -> str:
+        """Returns the endpoint for streaming requests.
+
+        Returns:
+            str: Same as api_url for OpenAI-like APIs, which select streaming in the payload
+        """
+        return self.api_url
+
+    def format_stream_request_data(self, question: str) -> Dict[str, Any]:
+        """Request payload for a streamed (server-sent events) response.
+
+        Starts from format_request_data, so per-instance overrides such as the
+        prompt pipeline's codegen parameters carry over. OpenAI-like APIs send
+        token usage in a last event only when ``stream_options`` asks for it.
+
+        Args:
+            question (str): The input prompt or question to send to the API
+
+        Returns:
+            Dict[str, Any]: Formatted request payload with streaming enabled
+        """
+        data = self.format_request_data(question)
+        data['stream'] = True
+        data['stream_options'] = {'include_usage': True}
+        return data
+
+    def merge_stream_usage(self, usage: Optional[Dict], event: Dict) -> Optional[Dict]:
+        """Token usage of a stream so far, given the next event.
+
+        OpenAI-like APIs and Gemini report the usage whole, in the last event
+        that carries it.
+
+        Args:
+            usage (Optional[Dict]): What the previous events reported, None if nothing yet
+            event (Dict): One decoded event of the stream
+
+        Returns:
+            Optional[Dict]: Usage shaped like a parsed response, for llm_utils.extract_token_usage
+        """
+        if event.get('usage') or event.get('usageMetadata'):
+            return event
+        return usage
+
+    def parse_stream_event(self, event: Dict) -> str:
+        """Extracts the text delta from one streamed event, suitable for OpenAI-like APIs.
+
+        Args:
+            event (Dict): One decoded ``data:`` payload of the event stream
+
+        Returns:
+            str: Text added by this event, empty if none
+        """
+        choices = event.get('choices') or [{}]
+        return (choices[0].get('delta') or {}).get('content') or ''
+
 
 @dataclass
 class GeminiConfig(LLMConfig):
@@ -109,6 +192,9 @@ class GeminiConfig(LLMConfig):
     api_url: str = None
     model: str = "gemini-2.5-flash"
 
+    provider = 'gemini'
+    supports_gzip_request = True  # Google APIs accept gzip-encoded request bodies
+
     def __post_init__(self):
         """Initialize Gemini-specific URL with API key.
 
@@ -156,6 +242,40 @@ class GeminiConfig(LLMConfig):
         """
         return '\n'.join(part['text'] for part in response_json['candidates'][0]['content']['parts'])
 
+    def get_stream_url(self) -> str:
+        """Gemini streams from streamGenerateContent; alt=sse selects server-sent events.
+
+        Returns:
+            str: Streaming endpoint URL including the API key
+        """
+        if ':generateContent?' not in self.api_url:
+            return self.api_url
+        return self.api_url.replace(':generateContent?', ':streamGenerateContent?alt=sse&', 1)
+
+    def format_stream_request_data(self, question: str) -> Dict[str, Any]:
+        """Gemini selects streaming by URL and reports usage in every chunk.
+
+        Args:
+            question (str): Input prompt or question
+
+        Returns:
+            Dict[str, Any]: Gemini-formatted request payload
+        """
+        return self.format_request_data(question)
+
+    def parse_stream_event(self, event: Dict) -> str:
+        """Extracts text from one streamed Gemini chunk.
+
+        Args:
+            event (Dict): One decoded chunk, shaped like a generateContent response
+
+        Returns:
+            str: Text added by this chunk, empty if none
+        """
+        candidates = event.get('candidates') or [{}]
+        parts = (candidates[0].get('content') or {}).get('parts') or []
+        return ''.join(part.get('text', '') for part in parts)
+
 
 @dataclass
 class GrokConfig(LLMConfig):
@@ -175,6 +295,8 @@ class GrokConfig(LLMConfig):
     model: str = "grok-code-fast"
     api_url: str = "https://api.x.ai/v1/chat/completions"
 
+    provider = 'grok'
+
     def format_request_data(self, question: str) -> Dict[str, Any]:
         """Format request payload for Grok API.
 
@@ -226,6 +348,8 @@ class NvidiaNIMConfig(LLMConfig):
     model: str = "google/gemma-2-9b-it"  # or 'meta/llama-3.1-8b-instruct'
     api_url: str = "https://integrate.api.nvidia.com/v1/chat/completions"
 
+    provider = 'nvidia_nim'
+
     def parse_response(self, response_json: Dict) -> str:
         """Parse NVIDIA NIM API response to extract text.
 
@@ -260,6 +384,8 @@ class ClaudeConfig(LLMConfig):
     model: str = "claude-sonnet-4-20250514"
     default_headers: HEADER = None
 
+    provider = 'claude'
+
     def __post_init__(self):
         """Initialize Claude-specific headers.
 
@@ -293,6 +419,52 @@ class ClaudeConfig(LLMConfig):
         """
         return response_json["content"][0]["text"]
 
+    def format_stream_request_data(self, question: str) -> Dict[str, Any]:
+        """Claude always reports usage in its stream and rejects ``stream_options``.
+
+        Args:
+            question (str): Input prompt or question
+
+        Returns:
+            Dict[str, Any]: Claude-formatted request payload with streaming enabled
+        """
+        data = self.format_request_data(question)
+        data['stream'] = True
+        return data
+
+    def merge_stream_usage(self, usage: Optional[Dict], event: Dict) -> Optional[Dict]:
+        """Claude reports input tokens in ``message_start`` and output tokens in ``message_delta``.
+
+        Args:
+            usage (Optional[Dict]): What the previous events reported, None if nothing yet
+            event (Dict): One decoded event of the Messages stream
+
+        Returns:
+            Optional[Dict]: ``{'usage': {...}}`` with the counts reported so far
+        """
+        if event.get('type') == 'message_start':
+            reported = (event.get('message') or {}).get('usage')
+        elif event.get('type') == 'message_delta':
+            reported = event.get('usage')
+        else:
+            return usage
+        merged = dict((usage or {}).get('usage') or {})
+        merged.update({k: v for k, v in (reported or {}).items() if v is not None})
+        return {'usage': merged} if merged else usage
+
+    def parse_stream_event(self, event: Dict) -> str:
+        """Extracts text from Claude's ``content_block_delta`` events.
+
+        Args:
+            event (Dict): One decoded event of the Messages stream
+
+        Returns:
+            str: Text added by this event, empty for other event types
+        """
+        if event.get('type') != 'content_block_delta':
+            return ''
+        return (event.get('delta') or {}).get('text') or ''
+
     def format_request_data(self, question: str) -> Dict[str, Any]:
         '''
         Probably multiple tokens of Claude would be equivalent to 1 token of others
@@ -323,6 +495,8 @@ class PerplexityConfig(LLMConfig):
     model: str = "sonar"
     default_headers: HEADER = None
 
+    provider = 'perplexity'
+
     def __post_init__(self):
         """Initialize Perplexity-specific headers.
 
@@ -366,6 +540,19 @@ class PerplexityConfig(LLMConfig):
         )
         return result
 
+    def format_stream_request_data(self, question: str) -> Dict[str, Any]:
+        """Perplexity reports usage in its stream without ``stream_options``, which it does not document.
+
+        Args:
+            question (str): Input prompt or question
+
+        Returns:
+            Dict[str, Any]: Perplexity-formatted request payload with streaming enabled
+        """
+        data = self.format_request_data(question)
+        data['stream'] = True
+        return data
+
     def parse_response(self, response_json: Dict) -> str:
         """Parse Perplexity API response to extract text.
 
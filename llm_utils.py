@@ -5,21 +5,16 @@ Extracted from entrypoint.py to eliminate circular imports between
 entrypoint.py and prompt_pipeline/entrypoint.py.
 """
 
+import datetime
 import logging
 import os
+import re
 
-from typing import Any, Dict, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Tuple
 
-from llm_configs import (
-    ClaudeConfig,
-    GeminiConfig,
-    GrokConfig,
-    NvidiaNIMConfig,
-    PerplexityConfig,
-)
 
-
-logging.basicConfig(level=logging.INFO)
+if TYPE_CHECKING:
+    from llm_client import LLMAPIClient
 
 
 def get_startwith(key: str, dictionary: dict) -> Any:
@@ -35,6 +30,7 @@ def get_api_key_dict_from_env() -> Dict[str, str]:
     """
     Retrieves API keys for different models from environment variables.
     Returns empty strings for unset variables.
+    A value may hold several comma-separated keys (see split_api_keys).
     """
     return {
         'claude': os.getenv('INPUT_CLAUDE_API_KEY', ''),
@@ -45,10 +41,23 @@ def get_api_key_dict_from_env() -> Dict[str, str]:
     }
 
 
+def split_api_keys(value: str) -> List[str]:
+    """Keys in a comma-separated *value*, stripped, without blanks or duplicates."""
+    return list(dict.fromkeys(k.strip() for k in value.split(',') if k.strip()))
+
+
 def get_config_class_dict() -> Dict[str, type]:
     """
     Returns a dictionary mapping model names to their respective configuration classes.
     """
+    from llm_configs import (
+        ClaudeConfig,
+        GeminiConfig,
+        GrokConfig,
+        NvidiaNIMConfig,
+        PerplexityConfig,
+    )
+
     return {
         'claude': ClaudeConfig,
         'claude-sonnet-4-20250514': ClaudeConfig,  # Add specific model
@@ -71,6 +80,184 @@ def get_config_class(model: str) -> type:
     return config_class
 
 
+def is_gzip_request_enabled_from_env() -> bool:
+    """INPUT_GZIP-REQUEST: compress request bodies for providers that accept it."""
+    return 'true' == os.getenv('INPUT_GZIP-REQUEST', 'false').strip().lower()
+
+
+def is_warmup_enabled_from_env() -> bool:
+    """INPUT_WARMUP: open the provider connection while the prompt is built (default true)."""
+    return 'false' != os.getenv('INPUT_WARMUP', 'true').strip().lower()
+
+
+def create_client(model: str, api_key: str, **client_kwargs) -> 'LLMAPIClient':
+    """
+    Builds the configuration for *model* and wraps it in an LLMAPIClient.
+    Extra keyword arguments are passed to LLMAPIClient.
+    If *api_key* holds several comma-separated keys, the client rotates over
+    them with the provider's shared key_pool.KeyPool.
+    Request compression follows INPUT_GZIP-REQUEST unless gzip_request is given.
+    With INPUT_CASSETTE set, the client talks to that cassette.Cassette
+    instead of the network (or through it, when recording), whatever
+    session was given. With INPUT_PROVIDER-STATS set, its attempts are added
+    to that provider_stats.ProviderStats history.
+    """
+    from cassette import cassette_from_env
+    from llm_client import LLMAPIClient
+    from provider_stats import stats_from_env
+
+    config_class = get_config_class(model)
+    api_keys = split_api_keys(api_key)
+
+    config_args = {'api_key': api_keys[0] if api_keys else api_key}
+    if model:
+        config_args['model'] = model
+    config = config_class(**config_args)
+    client_kwargs.setdefault('gzip_request', is_gzip_request_enabled_from_env())
+    cassette = cassette_from_env()
+    if cassette is not None:
+        client_kwargs['session'] = cassette
+    if len(api_keys) > 1:
+        from key_pool import get_pool
+        client_kwargs.setdefault('key_pool', get_pool(config.provider, api_keys))
+    client = LLMAPIClient(config, **client_kwargs)
+    stats = stats_from_env()
+    if stats is not None:
+        client.observers.append(stats.observe)
+    return client
+
+
+def extract_token_usage(raw_response: Optional[dict]) -> Dict[str, Any]:
+    """Extract token usage from LLM API response (best-effort, multi-provider).
+
+    Different providers return usage in different structures:
+      Gemini:     usageMetadata.promptTokenCount / candidatesTokenCount
+      Claude:     usage.input_tokens / output_tokens
+      OpenAI-like: usage.prompt_tokens / completion_tokens (Grok, NVIDIA, Perplexity)
+
+    Returns dict with input_tokens, output_tokens, total_tokens (None if unavailable).
+    """
+    if not raw_response or not isinstance(raw_response, dict):
+        return {"input_tokens": None, "output_tokens": None, "total_tokens": None}
+
+    # Gemini format
+    usage = raw_response.get("usageMetadata", {})
+    if usage:
+        return {
+            "input_tokens": usage.get("promptTokenCount"),
+            "output_tokens": usage.get("candidatesTokenCount"),
+            "total_tokens": usage.get("totalTokenCount"),
+        }
+
+    # Claude / OpenAI-compatible format
+    usage = raw_response.get("usage", {})
+    if usage:
+        input_t = usage.get("input_tokens") or usage.get("prompt_tokens")
+        output_t = usage.get("output_tokens") or usage.get("completion_tokens")
+        total_t = usage.get("total_tokens")
+        if total_t is None and input_t is not None and output_t is not None:
+            total_t = input_t + output_t
+        return {
+            "input_tokens": input_t,
+            "output_tokens": output_t,
+            "total_tokens": total_t,
+        }
+
+    return {"input_tokens": None, "output_tokens": None, "total_tokens": None}
+
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+
+def parse_duration_sec(value: str) -> Optional[float]:
+    """Seconds in '12', '1.5s', '6m0s', '20ms' or '1h2m', else None."""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts or ''.join(n + u for n, u in parts) != value:
+        return None
+    scale = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+    return sum(float(n) * scale[u] for n, u in parts)
+
+
+def parse_reset_sec(value: str) -> Optional[float]:
+    """Seconds until a reset given as a duration, an RFC 3339 time or an HTTP date."""
+    seconds = parse_duration_sec(value)
+    if seconds is not None:
+        return seconds
+    try:
+        when = datetime.datetime.fromisoformat(value.strip())
+    except ValueError:
+        import email.utils
+
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+def parse_rate_limit_headers(headers: Mapping[str, str]) -> Dict[str, Optional[float]]:
+    """Normalize provider rate limit headers (best-effort, multi-provider).
+
+    Recognized header families, matched case-insensitively:
+      OpenAI-like (Grok, NVIDIA, Perplexity): x-ratelimit-{limit,remaining,reset}-{requests,tokens}
+      Claude:      anthropic-ratelimit-{requests,tokens}-{limit,remaining,reset}
+      IETF draft:  ratelimit-{limit,remaining,reset}, counted as requests
+      Any:         retry-after, in seconds or as an HTTP date
+
+    Returns dict with limit_requests, remaining_requests, limit_tokens,
+    remaining_tokens, reset_sec (the later reset of the two) and
+    retry_after_sec; None where unavailable. Gemini sends none of these.
+    """
+    lowered = {str(k).lower(): str(v) for k, v in headers.items()}
+
+    def number(*names: str) -> Optional[float]:
+        for name in names:
+            if name in lowered:
+                try:
+                    return float(lowered[name])
+                except ValueError:
+                    return None
+        return None
+
+    def reset(*names: str) -> Optional[float]:
+        for name in names:
+            if name in lowered:
+                return parse_reset_sec(lowered[name])
+        return None
+
+    resets = [r for r in (
+        reset('x-ratelimit-reset-requests', 'anthropic-ratelimit-requests-reset', 'ratelimit-reset'),
+        reset('x-ratelimit-reset-tokens', 'anthropic-ratelimit-tokens-reset'),
+    ) if r is not None]
+
+    return {
+        'limit_requests': number('x-ratelimit-limit-requests', 'anthropic-ratelimit-requests-limit', 'ratelimit-limit'),
+        'remaining_requests': number(
+            'x-ratelimit-remaining-requests', 'anthropic-ratelimit-requests-remaining', 'ratelimit-remaining'),
+        'limit_tokens': number('x-ratelimit-limit-tokens', 'anthropic-ratelimit-tokens-limit'),
+        'remaining_tokens': number('x-ratelimit-remaining-tokens', 'anthropic-ratelimit-tokens-remaining'),
+        'reset_sec': max(resets) if resets else None,
+        'retry_after_sec': reset('retry-after'),
+    }
+
+
+def quota_fraction(limits: Dict[str, Optional[float]]) -> Optional[float]:
+    """Smallest remaining/limit ratio among requests and tokens, None if neither is known."""
+    fractions = []
+    for kind in ('requests', 'tokens'):
+        remaining, limit = limits[f'remaining_{kind}'], limits[f'limit_{kind}']
+        if remaining is not None and limit:
+            fractions.append(max(0.0, min(1.0, remaining / limit)))
+    return min(fractions) if fractions else None
+
+
 def get_model_key_from_env() -> Tuple[str, str]:
     """
     Extracts the LLM model and API key from environment variables with flexible selection.
@@ -78,6 +265,13 @@ def get_model_key_from_env() -> Tuple[str, str]:
     - Falls back to model-specific API keys if INPUT_API-KEY is not set.
     - Raises ValueError if no API keys are available.
     - Uses model-to-provider mapping for precise model IDs.
+    - The key may list several comma-separated keys of one provider;
+      create_client rotates over them.
+    - Without a model, and with INPUT_PROVIDER-STATS history, picks the
+      provider with the best expected latency (or cost, per
+      INPUT_PROVIDER-OBJECTIVE) above INPUT_PROVIDER-SUCCESS-FLOOR
+      before falling back to Gemini; a share INPUT_PROVIDER-EXPLORE of
+      runs tries a provider with little or stale history instead.
     """
     api_key_dict = get_api_key_dict_from_env()
     valid_keys_dict = {k: v for k, v in api_key_dict.items() if v and v.strip()}
@@ -131,12 +325,25 @@ def get_model_key_from_env() -> Tuple[str, str]:
             logging.info(f"Using specified model with provider matching: {model}")
             return model, api_key.strip()
 
-    # Case 6: Fallback to Gemini if available
+    # Case 6: No model pinned; follow the recorded provider history if there is one
+    if not model:
+        from provider_stats import choice_params_from_env, stats_from_env
+
+        stats = stats_from_env()
+        if stats is not None:
+            objective, success_floor, explore = choice_params_from_env()
+            provider = stats.choose(valid_keys_dict, objective, success_floor, explore=explore)
+            if provider:
+                provider_to_model = {p: m for m, p in model_to_provider.items()}
+                logging.info(f"Using {provider} by provider history")
+                return provider_to_model[provider], valid_keys_dict[provider].strip()
+
+    # Case 7: Fallback to Gemini if available
     if 'gemini' in valid_keys_dict:
         logging.info("Falling back to Gemini model")
         return 'gemini-2.5-flash', valid_keys_dict['gemini'].strip()
 
-    # Case 7: No matching model or Gemini
+    # Case 8: No matching model or Gemini
     raise ValueError(
         f"No API key provided for specified model '{model}' and Gemini not available. "
         f"Available models: {', '.join(valid_keys_dict.keys())}"
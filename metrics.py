@@ -0,0 +1,295 @@
+# begin metrics.py
+"""Process-wide counters, gauges and histograms in Prometheus text format.
+
+``LLMAPIClient`` records every HTTP attempt (requests by status, 429s,
+retries, latency, tokens), ``prompt.get_prompt`` records prompt sizes and
+build times, and the entry points record runs. One-shot runs write the
+registry to ``metrics.prom`` in the output directory at exit (readable by the
+node_exporter textfile collector or ``promtool``); the service serves it on
+``GET /metrics``.
+
+Metrics are labelled by provider and model where they concern an LLM.
+"""
+
+import bisect
+import contextlib
+import logging
+import os
+import pathlib
+import threading
+import time
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from llm_utils import extract_token_usage, get_config_class
+
+
+METRICS_FILENAME = 'metrics.prom'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+PROMPT_CHARS_BUCKETS = (1_000, 2_000, 5_000, 10_000, 20_000, 50_000, 100_000, 200_000, 500_000)
+BUILD_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base of Counter, Gauge and Histogram: a name, help text and fixed label names."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def label_values(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters only go up")
+        key = self.label_values(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self.label_values(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self.values.items())
+        return self.header() + [f'{self.name}{format_labels(self.labelnames, k)} {format_value(v)}' for k, v in items]
+
+
+class Gauge(Counter):
+    """A value that goes up and down, such as a queue depth."""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        key = self.label_values(labels)
+        with self._lock:
+            self.values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self.label_values(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum, count
+        self.values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self.label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self.values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def count(self, **labels) -> int:
+        counts, _ = self.values.get(self.label_values(labels), ([0], [0.0]))
+        return sum(counts)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), t[0])) for k, (c, t) in self.values.items())
+        lines = self.header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Named metrics of one process; ``counter``, ``gauge`` and ``histogram`` return existing metrics by name."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls: type, name: str, *args, **kwargs) -> Any:
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets)
+
+    def reset(self) -> None:
+        """Forget every recorded value; the metrics stay registered."""
+        for metric in list(self.metrics.values()):
+            with metric._lock:
+                metric.values.clear()
+
+    def render(self) -> str:
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return '\n'.join(lines) + '\n'
+
+    def write(self, output_dir: pathlib.Path, filename: str = METRICS_FILENAME) -> None:
+        """Write the rendered registry to *output_dir* / *filename* atomically."""
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / filename
+        tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        try:
+            tmp_path.write_text(self.render(), encoding='utf-8')
+            os.replace(tmp_path, path)
+            logging.info(f"Metrics written to {path}")
+        except OSError as e:
+            logging.warning(f"Could not write metrics: {e}")
+
+
+REGISTRY = Registry()
+
+LLM_LABELS = ('provider', 'model')
+
+llm_requests = REGISTRY.counter(
+    'tutor_llm_requests_total', 'HTTP attempts to LLM APIs by response status or error', LLM_LABELS + ('status',))
+llm_rate_limited = REGISTRY.counter(
+    'tutor_llm_rate_limited_total', 'LLM API responses with status 429', LLM_LABELS)
+llm_retries = REGISTRY.counter(
+    'tutor_llm_retries_total', 'LLM API attempts retried after a rate limit', LLM_LABELS)
+llm_calls = REGISTRY.counter(
+    'tutor_llm_calls_total', 'call_api invocations by outcome (success, failure)', LLM_LABELS + ('outcome',))
+llm_latency = REGISTRY.histogram(
+    'tutor_llm_request_duration_seconds', 'Latency of each HTTP attempt to an LLM API', LLM_LABELS)
+llm_tokens = REGISTRY.counter(
+    'tutor_llm_tokens_total', 'Tokens reported by LLM APIs (direction: input, output)', LLM_LABELS + ('direction',))
+llm_body_bytes = REGISTRY.counter(
+    'tutor_llm_compressed_body_bytes_total',
+    'Bytes of compressed LLM request and response bodies (direction: request, response; stage: decoded, wire)',
+    LLM_LABELS + ('direction', 'stage'))
+
+prompt_chars = REGISTRY.histogram(
+    'tutor_prompt_chars', 'Characters in each assembled prompt', LLM_LABELS, buckets=PROMPT_CHARS_BUCKETS)
+prompt_failed_tests = REGISTRY.counter(
+    'tutor_prompt_failed_tests_total', 'Failed tests explained in assembled prompts')
+prompt_build_seconds = REGISTRY.histogram(
+    'tutor_prompt_build_seconds', 'Time to assemble a prompt', LLM_LABELS, buckets=BUILD_SECONDS_BUCKETS)
+
+runs = REGISTRY.counter(
+    'tutor_runs_total', 'Entry point runs by outcome (success, failure)', ('entrypoint', 'outcome'))
+run_seconds = REGISTRY.histogram(
+    'tutor_run_duration_seconds', 'Wall time of entry point runs', ('entrypoint',))
+
+
+def observe_attempt(event: Dict[str, Any]) -> None:
+    """Record one HTTP attempt, given the event passed to ``LLMAPIClient`` observers."""
+    labels = {'provider': event['provider'], 'model': event['model']}
+    status = event['status_code'] if event['status_code'] is not None else event['error'] or 'error'
+    llm_requests.inc(**labels, status=status)
+    if event['status_code'] == 429:
+        llm_rate_limited.inc(**labels)
+    llm_latency.observe(event['latency_sec'], **labels)
+
+    for direction in ('request', 'response'):
+        sizes = event.get(f'{direction}_bytes')
+        if sizes:
+            llm_body_bytes.inc(sizes[0], **labels, direction=direction, stage='decoded')
+            llm_body_bytes.inc(sizes[1], **labels, direction=direction, stage='wire')
+
+    if event['raw_response'] is not None:
+        usage = extract_token_usage(event['raw_response'])
+        if usage['input_tokens']:
+            llm_tokens.inc(usage['input_tokens'], **labels, direction='input')
+        if usage['output_tokens']:
+            llm_tokens.inc(usage['output_tokens'], **labels, direction='output')
+
+
+def prompt_labels(model: str) -> Dict[str, str]:
+    """Provider and model labels of a prompt built for *model*; 'unknown' where it cannot tell."""
+    try:
+        provider = get_config_class(model).provider if model else 'unknown'
+    except ValueError:
+        provider = 'unknown'
+    return {'provider': provider, 'model': model or 'unknown'}
+
+
+def observe_prompt(prompt: str, n_failed_tests: int, build_sec: float, model: str = '') -> None:
+    labels = prompt_labels(model)
+    prompt_chars.observe(len(prompt), **labels)
+    prompt_failed_tests.inc(n_failed_tests)
+    prompt_build_seconds.observe(build_sec, **labels)
+
+
+@contextlib.contextmanager
+def recording(entrypoint: str, output_dir: Optional[str]) -> Iterator[None]:
+    """Count and time the enclosed run, then write ``metrics.prom`` to *output_dir* if set."""
+    start = time.perf_counter()
+    outcome = 'failure'
+    try:
+        yield
+        outcome = 'success'
+    except SystemExit as e:
+        outcome = 'success' if not e.code else 'failure'
+        raise
+    finally:
+        runs.inc(entrypoint=entrypoint, outcome=outcome)
+        run_seconds.observe(time.perf_counter() - start, entrypoint=entrypoint)
+        if output_dir:
+            REGISTRY.write(pathlib.Path(output_dir))
+
+# end metrics.py
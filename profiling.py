@@ -0,0 +1,199 @@
+# begin profiling.py
+"""In-place CPU and memory profiling for the tutor and the prompt pipeline.
+
+INPUT_PROFILE selects what ``profiling()`` records around a run:
+
+- ``cpu``: cProfile of the calling thread, written as ``profile.prof`` (for
+  snakeviz, pstats) and ``profile_cpu.txt`` (top functions by cumulative
+  time), plus ``profile.collapsed``: stacks of every thread sampled every
+  ``SAMPLE_INTERVAL_SEC``, in the collapsed format read by flamegraph.pl and
+  speedscope
+- ``mem``: tracemalloc, written as ``profile_mem.txt`` with the peak and the
+  top allocation sites by line and by traceback
+- ``both``: all of the above
+
+INPUT_PROFILE-TOP sets how many entries each text report lists. Profiling is
+off by default and costs nothing then; cProfile, pstats and tracemalloc are
+imported only when it is on, keeping them out of the start-up budget.
+"""
+
+import collections
+import contextlib
+import io
+import logging
+import os
+import pathlib
+import sys
+import threading
+
+from typing import TYPE_CHECKING, Counter, Iterator, Optional
+
+if TYPE_CHECKING:
+    import cProfile
+    import tracemalloc
+
+
+PROF_FILENAME = 'profile.prof'
+CPU_REPORT_FILENAME = 'profile_cpu.txt'
+COLLAPSED_FILENAME = 'profile.collapsed'
+MEM_REPORT_FILENAME = 'profile_mem.txt'
+
+PROFILE_MODES = ('cpu', 'mem', 'both')
+DEFAULT_TOP_N = 30
+SAMPLE_INTERVAL_SEC = 0.005
+TRACEMALLOC_FRAMES = 25
+
+
+def mode_from_env() -> Optional[str]:
+    """'cpu', 'mem' or 'both' from INPUT_PROFILE; None when unset, 'false' or unknown."""
+    mode = os.getenv('INPUT_PROFILE', '').strip().lower()
+    if mode in ('', 'false', 'none', 'off'):
+        return None
+    if mode not in PROFILE_MODES:
+        logging.warning(f"Unknown profile mode {mode!r}; expected one of {', '.join(PROFILE_MODES)}")
+        return None
+    return mode
+
+
+def top_n_from_env() -> int:
+    return int(os.getenv('INPUT_PROFILE-TOP', str(DEFAULT_TOP_N)))
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({pathlib.Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Counts the call stacks of all other threads on a background thread.
+
+    Attributes:
+        interval_sec (float): Time between samples
+        counts (Counter[str]): Samples per collapsed stack, ``thread;outer;...;inner``
+    """
+
+    def __init__(self, interval_sec: float = SAMPLE_INTERVAL_SEC):
+        self.interval_sec = interval_sec
+        self.counts: Counter[str] = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval_sec):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.counts.items()))
+
+
+def cpu_report(profiler: 'cProfile.Profile', top_n: int) -> str:
+    import pstats
+
+    buffer = io.StringIO()
+    stats = pstats.Stats(profiler, stream=buffer)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+    return buffer.getvalue()
+
+
+def memory_report(snapshot: 'tracemalloc.Snapshot', peak_bytes: int, top_n: int) -> str:
+    import tracemalloc
+
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+    ))
+    lines = [f"Peak traced memory: {peak_bytes / 1024:.1f} KiB", '', f"Top {top_n} allocation sites by line:"]
+    for stat in snapshot.statistics('lineno')[:top_n]:
+        lines.append(f"  {stat}")
+
+    lines += ['', f"Top {min(top_n, 10)} allocation tracebacks:"]
+    for stat in snapshot.statistics('traceback')[:min(top_n, 10)]:
+        lines.append(f"  {stat.count} blocks, {stat.size / 1024:.1f} KiB")
+        lines.extend(f"    {line}" for line in stat.traceback.format())
+    return '\n'.join(lines) + '\n'
+
+
+def write_report(path: pathlib.Path, text: str) -> None:
+    try:
+        path.write_text(text, encoding='utf-8')
+        logging.info(f"Profile written to {path}")
+    except OSError as e:
+        logging.warning(f"Could not write profile: {e}")
+
+
+@contextlib.contextmanager
+def profiling(output_dir: Optional[str], mode: Optional[str], top_n: int = DEFAULT_TOP_N) -> Iterator[None]:
+    """Profile the enclosed block per *mode* and write the reports to *output_dir*.
+
+    Does nothing unless *mode* is set; reports are written only if *output_dir* is set.
+    """
+    if not mode:
+        yield
+        return
+
+    import cProfile
+    import tracemalloc
+
+    cpu = mode in ('cpu', 'both')
+    mem = mode in ('mem', 'both')
+
+    profiler = cProfile.Profile() if cpu else None
+    sampler = StackSampler() if cpu else None
+    # Leave an enclosing tracemalloc session (e.g. a benchmark) running afterwards
+    started_tracemalloc = mem and not tracemalloc.is_tracing()
+
+    if started_tracemalloc:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    if mem:
+        tracemalloc.reset_peak()
+    if sampler:
+        sampler.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        if sampler:
+            sampler.stop()
+        snapshot = peak_bytes = None
+        if mem:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak_bytes = tracemalloc.get_traced_memory()
+        if started_tracemalloc:
+            tracemalloc.stop()
+
+        if not output_dir:
+            logging.warning("Profiling enabled but no output directory set; profile discarded")
+        else:
+            path = pathlib.Path(output_dir)
+            path.mkdir(parents=True, exist_ok=True)
+            if profiler:
+                try:
+                    profiler.dump_stats(str(path / PROF_FILENAME))
+                except OSError as e:
+                    logging.warning(f"Could not write profile: {e}")
+                write_report(path / CPU_REPORT_FILENAME, cpu_report(profiler, top_n))
+                write_report(path / COLLAPSED_FILENAME, sampler.collapsed())
+            if snapshot is not None:
+                write_report(path / MEM_REPORT_FILENAME, memory_report(snapshot, peak_bytes, top_n))
+
+# end profiling.py
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# begin prompt_pipeline/batch.py
+#
+# Generate exercise.py for every prompt.txt under a directory tree.
+# One process handles a whole class section instead of one container per
+# student; codegen calls run concurrently within per-provider limits.
+#
+# Environment variables:
+#   INPUT_PROMPT-ROOT        Directory searched recursively for prompt.txt
+#   INPUT_BATCH-OUTPUT       Output root; exercise.py lands at the prompt's
+#                            relative directory (default: next to each prompt)
+#   INPUT_BATCH-CONCURRENCY  Concurrent calls per provider, either one number
+#                            or "gemini=8,claude=4" (default PROVIDER_CONCURRENCY)
+#   INPUT_BATCH-ADAPTIVE     "true" to adjust those limits from rate limit
+#                            headers and 429s (AIMD, see adaptive.py)
+#   INPUT_BATCH-MAX-CONCURRENCY  Ceiling of adaptive limits, same syntax
+#                            (default ADAPTIVE_MAX_FACTOR times the start limit)
+#   INPUT_CANDIDATE-MODELS   Models to spread students over (default INPUT_MODEL)
+#   INPUT_MODEL, INPUT_*-API-KEY, INPUT_STREAM, INPUT_CODEGEN-CACHE-DIR,
+#   INPUT_USAGE-LEDGER, INPUT_REQUIRED-FUNCTIONS, INPUT_FORBIDDEN-IMPORTS,
+#   INPUT_SMOKE-IMPORT, INPUT_REPAIR-ATTEMPTS  as for entrypoint.py
+#
+# batch_summary.json in the output root lists each student's status, model,
+# latency and token counts, repair calls included.
+
+import concurrent.futures
+import contextlib
+import json
+import logging
+import os
+import pathlib
+import sys
+import threading
+import time
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+# Import the pipeline as a package so its sibling modules resolve the same way
+# whether this file runs as a script or is imported by the tests.
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from prompt_pipeline import entrypoint as pipeline  # noqa: E402
+
+import codegen_cache  # noqa: E402
+from adaptive import AIMDLimiter  # noqa: E402
+import metrics  # noqa: E402
+import usage_ledger  # noqa: E402
+from llm_utils import extract_token_usage, get_config_class, get_model_key_from_env  # noqa: E402
+
+
+PROMPT_FILENAME = 'prompt.txt'
+EXERCISE_FILENAME = 'exercise.py'
+SUMMARY_FILENAME = 'batch_summary.json'
+
+# Concurrent requests per provider; conservative for free-tier rate limits
+PROVIDER_CONCURRENCY = {
+    'gemini': 8,
+    'grok': 4,
+    'claude': 4,
+    'nvidia_nim': 2,
+    'perplexity': 2,
+}
+DEFAULT_CONCURRENCY = 2
+ADAPTIVE_MAX_FACTOR = 4
+
+
+def find_prompts(root: pathlib.Path) -> List[pathlib.Path]:
+    return sorted(root.rglob(PROMPT_FILENAME))
+
+
+def parse_concurrency(text: str, defaults: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Provider limits from "8" (every provider) or "gemini=8,claude=4" (overrides of *defaults*)."""
+    limits = dict(PROVIDER_CONCURRENCY if defaults is None else defaults)
+    text = text.strip()
+    if not text:
+        return limits
+    if '=' not in text:
+        return {provider: int(text) for provider in limits}
+    for item in text.split(','):
+        provider, _, value = item.partition('=')
+        limits[provider.strip()] = int(value)
+    return limits
+
+
+class ProviderScheduler:
+    """Hands out per-provider call slots, preferring the model whose provider has the most free slots.
+
+    Attributes:
+        limits (Dict[str, int]): Concurrent calls allowed per provider
+        limiters (Dict[str, AIMDLimiter]): Adaptive limits per provider, replacing *limits*,
+            when ceilings are given; clients report to ``observe``
+    """
+
+    def __init__(self, models: Sequence[str], limits: Dict[str, int], max_limits: Optional[Dict[str, int]] = None):
+        self.models = list(models)
+        self.providers = {model: get_config_class(model).provider for model in self.models}
+        self.limits = limits
+        self.in_use = {provider: 0 for provider in self.providers.values()}
+        self._condition = threading.Condition()
+        self.limiters: Dict[str, AIMDLimiter] = {}
+        if max_limits is not None:
+            for provider in self.in_use:
+                initial = self.limits.get(provider, DEFAULT_CONCURRENCY)
+                limiter = AIMDLimiter(provider, initial, max_limit=max_limits.get(provider, initial))
+                limiter.listeners.append(self._limit_changed)
+                self.limiters[provider] = limiter
+
+    def capacity(self) -> int:
+        """Most calls that may ever run at once (adaptive limits at their ceilings)."""
+        if self.limiters:
+            return sum(limiter.max_limit for limiter in self.limiters.values())
+        return sum(self.limit(provider) for provider in self.in_use)
+
+    def limit(self, provider: str) -> int:
+        if provider in self.limiters:
+            return self.limiters[provider].current()
+        return max(1, self.limits.get(provider, DEFAULT_CONCURRENCY))
+
+    def observe(self, event: Dict[str, Any]) -> None:
+        """LLMAPIClient observer feeding the adaptive limiter of the event's provider."""
+        limiter = self.limiters.get(event.get('provider'))
+        if limiter is not None:
+            limiter.observe(event)
+
+    def _limit_changed(self, limit: int) -> None:
+        with self._condition:
+            self._condition.notify_all()
+
+    def free(self, model: str) -> int:
+        provider = self.providers[model]
+        return self.limit(provider) - self.in_use[provider]
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[str]:
+        """Block until a provider has a free slot; yields the model to call."""
+        with self._condition:
+            while True:
+                model = max(self.models, key=self.free)
+                if self.free(model) > 0:
+                    break
+                self._condition.wait()
+            self.in_use[self.providers[model]] += 1
+        try:
+            yield model
+        finally:
+            with self._condition:
+                self.in_use[self.providers[model]] -= 1
+                self._condition.notify()
+
+
+def write_atomic(path: pathlib.Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp_path.write_text(text, encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+class UsageCounter:
+    """Client observer summing the token usage of every answered attempt.
+
+    One counter per student covers the codegen call and all repair calls.
+    """
+
+    def __init__(self):
+        self.usage: Dict[str, Optional[int]] = {'input_tokens': None, 'output_tokens': None, 'total_tokens': None}
+
+    def observe(self, event: Dict[str, Any]) -> None:
+        for name, count in extract_token_usage(event.get('raw_response')).items():
+            if count is not None:
+                self.usage[name] = (self.usage[name] or 0) + count
+
+
+class BatchRunner:
+    """Runs codegen for many prompts sharing one scheduler, cache and ledger.
+
+    Attributes:
+        api_keys (Dict[str, str]): API key per model the scheduler may pick
+        scheduler (ProviderScheduler): Per-provider concurrency limits
+    """
+
+    def __init__(
+        self,
+        api_keys: Dict[str, str],
+        scheduler: ProviderScheduler,
+        cache: Optional[codegen_cache.CodegenCache] = None,
+        ledger: Optional[usage_ledger.UsageLedger] = None,
+        stream: bool = False,
+    ):
+        self.api_keys = api_keys
+        self.scheduler = scheduler
+        self.cache = cache
+        self.ledger = ledger
+        self.stream = stream
+        self.repair_attempts = pipeline.get_repair_attempts_from_env()
+
+    def run(self, prompt_paths: Sequence[pathlib.Path], prompt_root: pathlib.Path,
+            output_root: pathlib.Path) -> Dict[str, Any]:
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.scheduler.capacity()) as executor:
+            futures = [
+                executor.submit(self.generate_one, path, prompt_root, output_root)
+                for path in prompt_paths
+            ]
+            students = [future.result() for future in futures]
+
+        statuses = [s['status'] for s in students]
+        summary = {
+            'total': len(students),
+            'generated': statuses.count('generated'),
+            'cached': statuses.count('cached'),
+            'failed': len(students) - statuses.count('generated') - statuses.count('cached'),
+            'wall_sec': round(time.perf_counter() - start, 3),
+            'total_tokens': sum(s.get('total_tokens') or 0 for s in students),
+            'students': students,
+        }
+        write_atomic(output_root / SUMMARY_FILENAME, json.dumps(summary, indent=2, ensure_ascii=False))
+        return summary
+
+    def generate_one(self, prompt_path: pathlib.Path, prompt_root: pathlib.Path,
+                     output_root: pathlib.Path) -> Dict[str, Any]:
+        relative_dir = prompt_path.parent.relative_to(prompt_root)
+        output_path = output_root / relative_dir / EXERCISE_FILENAME
+        record: Dict[str, Any] = {
+            'prompt': str(prompt_path.relative_to(prompt_root)),
+            'output': str(output_path.relative_to(output_root)),
+            'status': 'failed',
+            'model': None,
+            'contains_code': False,
+            'latency_sec': None,
+            'input_tokens': None,
+            'output_tokens': None,
+            'total_tokens': None,
+        }
+        try:
+            self._generate(prompt_path, output_path, record)
+        except Exception as e:
+            logging.exception("Codegen failed for %s", prompt_path)
+            record['error'] = str(e)
+        return record
+
+    def _generate(self, prompt_path: pathlib.Path, output_path: pathlib.Path, record: Dict[str, Any]) -> None:
+        student_prompt = prompt_path.read_text(encoding='utf-8').strip()
+        if not student_prompt:
+            record['error'] = 'empty prompt'
+            return
+        record['contains_code'] = pipeline.contains_python_code(student_prompt)
+        if record['contains_code']:
+            logging.warning("%s appears to contain Python code constructs", prompt_path)
+
+        cache_key = None
+        if self.cache:
+            cache_key = codegen_cache.make_key(
+                student_prompt, pipeline._SYSTEM_INSTRUCTION, self.scheduler.models,
+                # Each student gets one candidate at the default temperature on one of these models
+                pipeline.get_codegen_params((model, pipeline.CODEGEN_TEMPERATURE) for model in self.scheduler.models),
+            )
+            code = self.cache.get(cache_key)
+            if code:
+                write_atomic(output_path, code)
+                record['status'] = 'cached'
+                return
+
+        with self.scheduler.slot() as model:
+            record['model'] = model
+            client = pipeline.make_codegen_client(model, self.api_keys[model], ledger=self.ledger)
+            if self.scheduler.limiters:
+                client.observers.append(self.scheduler.observe)
+            counter = UsageCounter()
+            client.observers.append(counter.observe)
+
+            try:
+                start = time.perf_counter()
+                response = pipeline.call_codegen(client, pipeline.build_question(student_prompt), self.stream)
+                record['latency_sec'] = round(time.perf_counter() - start, 3)
+
+                code = pipeline.extract_python_code(response) if response else ''
+                if not code:
+                    record['error'] = 'no code in response'
+                    return
+                code, problems = pipeline.check_and_repair(client, code, self.repair_attempts)
+            finally:
+                record.update(counter.usage)
+
+        write_atomic(output_path, code)
+        record['status'] = 'generated'
+        record['problems'] = problems
+        if self.cache and not problems:
+            # The scheduled model is the one whose response was written
+            self.cache.put(cache_key, code, record['model'])
+
+
+def main() -> None:
+    prompt_root = pathlib.Path(os.environ['INPUT_PROMPT-ROOT'])
+    output_root = pathlib.Path(os.getenv('INPUT_BATCH-OUTPUT', '') or prompt_root)
+
+    model, api_key = get_model_key_from_env()
+    api_keys = dict(pipeline.get_model_keys_from_env(model, api_key))
+
+    limits = parse_concurrency(os.getenv('INPUT_BATCH-CONCURRENCY', ''))
+    max_limits = None
+    if os.getenv('INPUT_BATCH-ADAPTIVE', 'false').strip().lower() == 'true':
+        max_limits = parse_concurrency(
+            os.getenv('INPUT_BATCH-MAX-CONCURRENCY', ''),
+            {provider: limit * ADAPTIVE_MAX_FACTOR for provider, limit in limits.items()},
+        )
+    scheduler = ProviderScheduler(list(api_keys), limits, max_limits)
+    runner = BatchRunner(
+        api_keys,
+        scheduler,
+        cache=codegen_cache.cache_from_env(),
+        ledger=usage_ledger.ledger_from_env(),
+        stream=pipeline.is_streaming_enabled_from_env(),
+    )
+
+    prompt_paths = find_prompts(prompt_root)
+    logging.info("Generating code for %d prompts with %s", len(prompt_paths), ', '.join(api_keys))
+    with metrics.recording('batch', str(output_root)):
+        summary = runner.run(prompt_paths, prompt_root, output_root)
+    logging.info(
+        "Batch done in %.1fs: %d generated, %d cached, %d failed",
+        summary['wall_sec'], summary['generated'], summary['cached'], summary['failed'],
+    )
+    if summary['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
+
+# end prompt_pipeline/batch.py
@@ -0,0 +1,153 @@
+# begin prompt_pipeline/codegen_cache.py
+"""Cache of generated exercise.py code keyed by a normalized student prompt.
+
+Students of one class often submit prompts that differ only in whitespace,
+letter case or sentence punctuation. The key hashes the normalized prompt together
+with the system instruction, the model(s) and the generation parameters, so
+such prompts share one codegen call.
+
+The cache is a directory of one JSON file per key, safe to share between
+concurrent runs (a mounted volume, or actions/cache): entries are written
+atomically, a hit refreshes the entry's modification time, and the least
+recently used entries are evicted beyond ``max_entries``.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import re
+import threading
+import time
+
+from typing import Any, Dict, Iterable, Optional
+
+
+# 2: punctuation other than sentence punctuation is part of the key
+CACHE_KEY_VERSION = 2
+DEFAULT_MAX_ENTRIES = 1000
+
+# Sentence punctuation ends a clause; inside a token (3.5, a,b, x:y) it is part of the spec
+_SENTENCE_PUNCTUATION_PATTERN = re.compile(r'[,.;:!?]+(?=\s|$)')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_prompt(text: str) -> str:
+    """Case-folded *text* without sentence punctuation and with whitespace collapsed.
+
+    Only ``,.;:!?`` followed by whitespace or at the end are dropped, so
+    operators, signs and decimal points (``a+b`` vs ``a-b``, ``x <= 3.5``)
+    keep prompts for different specs apart.
+    """
+    text = _SENTENCE_PUNCTUATION_PATTERN.sub('', text.casefold())
+    return _WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+def make_key(
+    student_prompt: str,
+    system_instruction: str,
+    models: Iterable[str],
+    params: Dict[str, Any],
+) -> str:
+    payload = {
+        'version': CACHE_KEY_VERSION,
+        'prompt': normalize_prompt(student_prompt),
+        'system_instruction': system_instruction,
+        'models': sorted(set(models)),
+        'params': params,
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class CodegenCache:
+    """Directory-backed LRU cache of generated code.
+
+    Attributes:
+        cache_dir (pathlib.Path): Directory holding ``<key>.json`` entries
+        max_entries (int): Entries kept after each store
+    """
+
+    def __init__(self, cache_dir: pathlib.Path, max_entries: int = DEFAULT_MAX_ENTRIES):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be a positive integer")
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.max_entries = max_entries
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def entry_path(self, key: str) -> pathlib.Path:
+        return self.cache_dir / f'{key}.json'
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached code for *key*, or None; a hit marks the entry as recently used."""
+        path = self.entry_path(key)
+        try:
+            entry = json.loads(path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning("Ignoring unreadable codegen cache entry %s: %s", path, e)
+            return None
+
+        if not isinstance(entry, dict) or entry.get('key') != key or not entry.get('code'):
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry['code']
+
+    def put(self, key: str, code: str, model: str) -> None:
+        entry = {
+            'key': key,
+            'model': model,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'code': code,
+        }
+        path = self.entry_path(key)
+        # Unique per writer so concurrent runs never share a temporary file
+        tmp_path = path.with_name(f'.{key}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            tmp_path.write_text(json.dumps(entry, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning("Could not write codegen cache entry %s: %s", path, e)
+            return
+        self.evict()
+
+    def evict(self) -> int:
+        """Remove the least recently used entries beyond ``max_entries``; returns the number removed."""
+        entries = []
+        for path in self.cache_dir.glob('*.json'):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue  # evicted by another run
+
+        n_excess = len(entries) - self.max_entries
+        if n_excess <= 0:
+            return 0
+
+        entries.sort()
+        for _, path in entries[:n_excess]:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        logging.info("Evicted %d codegen cache entries from %s", n_excess, self.cache_dir)
+        return n_excess
+
+
+def cache_from_env() -> Optional[CodegenCache]:
+    """Cache at INPUT_CODEGEN-CACHE-DIR sized by INPUT_CODEGEN-CACHE-MAX-ENTRIES, else None."""
+    cache_dir = os.getenv('INPUT_CODEGEN-CACHE-DIR', '')
+    if not cache_dir:
+        return None
+    return CodegenCache(
+        pathlib.Path(cache_dir),
+        max_entries=int(os.getenv('INPUT_CODEGEN-CACHE-MAX-ENTRIES', str(DEFAULT_MAX_ENTRIES))),
+    )
+
+# end prompt_pipeline/codegen_cache.py
@@ -0,0 +1,203 @@
+# begin prompt_pipeline/codegen_check.py
+"""Local checks for generated exercise.py code.
+
+Run on each codegen candidate before it is written, so code the grader would
+reject anyway (syntax errors, missing functions, statements that run on
+import, forbidden imports) is caught without another workflow run.
+
+``smoke_import`` additionally imports the code in a separate interpreter with
+CPU time, memory and wall-clock limits; at most one such subprocess per CPU
+runs at a time.
+"""
+
+import ast
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+from typing import Iterable, List, Optional, Sequence, Set
+
+
+# Module-level nodes that do not execute student logic on import
+_ALLOWED_TOP_LEVEL = (
+    ast.Import,
+    ast.ImportFrom,
+    ast.FunctionDef,
+    ast.AsyncFunctionDef,
+    ast.ClassDef,
+)
+
+
+# Modules an exercise has no business importing: process, file system,
+# network and interpreter internals. INPUT_FORBIDDEN-IMPORTS replaces the list.
+DEFAULT_FORBIDDEN_IMPORTS = (
+    'builtins', 'ctypes', 'http', 'importlib', 'multiprocessing', 'os', 'pickle',
+    'requests', 'shutil', 'socket', 'subprocess', 'sys', 'urllib',
+)
+
+SMOKE_TIMEOUT_SEC = 5
+SMOKE_MEMORY_MB = 256
+
+# The child limits itself before running the code; unlike preexec_fn this is
+# safe when smoke imports are started from worker threads.
+_SMOKE_SCRIPT = """
+try:
+    import resource
+except ImportError:
+    pass
+else:
+    resource.setrlimit(resource.RLIMIT_CPU, ({cpu_sec}, {cpu_sec}))
+    resource.setrlimit(resource.RLIMIT_AS, ({memory_bytes}, {memory_bytes}))
+import runpy
+runpy.run_path('exercise.py', run_name='exercise')
+"""
+_smoke_slots = threading.BoundedSemaphore(os.cpu_count() or 2)
+
+
+def get_required_names_from_env() -> List[str]:
+    """Names from INPUT_REQUIRED-FUNCTIONS (comma-separated), empty if unset."""
+    names = os.getenv('INPUT_REQUIRED-FUNCTIONS', '')
+    return [name.strip() for name in names.split(',') if name.strip()]
+
+
+def get_forbidden_imports_from_env() -> Sequence[str]:
+    names = os.getenv('INPUT_FORBIDDEN-IMPORTS')
+    if names is None:
+        return DEFAULT_FORBIDDEN_IMPORTS
+    return [name.strip() for name in names.split(',') if name.strip()]
+
+
+def is_smoke_import_enabled_from_env() -> bool:
+    return 'true' == os.getenv('INPUT_SMOKE-IMPORT', 'false').lower()
+
+
+def is_literal(node: ast.AST) -> bool:
+    try:
+        ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return False
+    return True
+
+
+def is_allowed_top_level(node: ast.stmt) -> bool:
+    if isinstance(node, _ALLOWED_TOP_LEVEL):
+        return True
+    # Docstrings
+    if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+        return True
+    # Constants such as PI = 3.14
+    if isinstance(node, ast.Assign):
+        return all(isinstance(t, ast.Name) for t in node.targets) and is_literal(node.value)
+    if isinstance(node, ast.AnnAssign):
+        return isinstance(node.target, ast.Name) and (node.value is None or is_literal(node.value))
+    return False
+
+
+def defined_names(tree: ast.Module) -> Set[str]:
+    names = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+    return names
+
+
+def imported_modules(tree: ast.AST) -> List[str]:
+    """Top-level package of every import anywhere in *tree*; relative imports as '.'."""
+    modules = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            modules.append('.' if node.level else node.module.split('.')[0])
+    return modules
+
+
+def validate_code(
+    code: str,
+    required_names: Iterable[str] = (),
+    forbidden_imports: Iterable[str] = DEFAULT_FORBIDDEN_IMPORTS,
+) -> List[str]:
+    """Return a list of problems with *code*; an empty list means it passed.
+
+    Checks, in order: the code is non-empty and compiles, every name in
+    *required_names* is defined as a top-level function or class, the module
+    body holds only imports, definitions, docstrings and literal constants,
+    and nothing imports a module in *forbidden_imports* or a relative module.
+    """
+    if not code.strip():
+        return ['no code']
+
+    try:
+        tree = compile(code, 'exercise.py', 'exec', flags=ast.PyCF_ONLY_AST)
+        compile(tree, 'exercise.py', 'exec')
+    except (SyntaxError, ValueError) as e:
+        return [f'does not compile: {e}']
+
+    problems = []
+
+    missing = [name for name in required_names if name not in defined_names(tree)]
+    if missing:
+        problems.append(f"missing required definitions: {', '.join(missing)}")
+
+    for node in tree.body:
+        if not is_allowed_top_level(node):
+            problems.append(f'module-level code at line {node.lineno}: {type(node).__name__}')
+
+    forbidden = set(forbidden_imports) | {'.'}
+    bad_imports = sorted({m for m in imported_modules(tree) if m in forbidden})
+    if bad_imports:
+        problems.append(f"forbidden imports: {', '.join(bad_imports)}")
+
+    return problems
+
+
+def smoke_import(code: str, timeout_sec: float = SMOKE_TIMEOUT_SEC, memory_mb: int = SMOKE_MEMORY_MB) -> Optional[str]:
+    """Import *code* in an isolated interpreter; return the error, or None if it imported cleanly.
+
+    The child runs with ``-I`` (no environment variables, user site or
+    current directory on sys.path), an empty environment, a temporary
+    working directory, and CPU time and address-space limits where the
+    platform supports them.
+    """
+    script = _SMOKE_SCRIPT.format(cpu_sec=int(timeout_sec) + 1, memory_bytes=memory_mb * 1024 * 1024)
+
+    with _smoke_slots, tempfile.TemporaryDirectory(prefix='codegen_smoke_') as tmp_dir:
+        exercise_path = os.path.join(tmp_dir, 'exercise.py')
+        with open(exercise_path, 'w', encoding='utf-8') as f:
+            f.write(code)
+        try:
+            result = subprocess.run(
+                [sys.executable, '-I', '-c', script],
+                cwd=tmp_dir,
+                env={},
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                text=True,
+                timeout=timeout_sec,
+            )
+        except subprocess.TimeoutExpired:
+            return f'import did not finish within {timeout_sec}s'
+
+    if result.returncode == 0:
+        return None
+    lines = [line for line in result.stderr.strip().splitlines() if line.strip()]
+    return lines[-1] if lines else f'exit status {result.returncode}'
+
+
+def check_code(
+    code: str,
+    required_names: Iterable[str] = (),
+    forbidden_imports: Iterable[str] = DEFAULT_FORBIDDEN_IMPORTS,
+    smoke: bool = False,
+) -> List[str]:
+    """validate_code, then smoke_import if *smoke* and the static checks passed."""
+    problems = validate_code(code, required_names, forbidden_imports)
+    if not problems and smoke:
+        error = smoke_import(code)
+        if error:
+            problems.append(f'import failed: {error}')
+    return problems
+
+# end prompt_pipeline/codegen_check.py
@@ -10,14 +10,28 @@
 #   INPUT_MODEL          LLM model name (optional)
 #   INPUT_CLAUDE_API_KEY, INPUT_GEMINI-API-KEY, INPUT_GROK-API-KEY,
 #   INPUT_NVIDIA-API-KEY, INPUT_PERPLEXITY-API-KEY  (at least one required)
+#   INPUT_CANDIDATES     Number of concurrent codegen candidates (default 1)
+#   INPUT_CANDIDATE-MODELS  Comma-separated models to spread candidates over
+#                           (default: INPUT_MODEL)
+#   INPUT_REQUIRED-FUNCTIONS  Comma-separated names a candidate must define
+#   INPUT_CODEGEN-CACHE-DIR   Shared cache of generated code (optional)
+#   INPUT_CODEGEN-CACHE-MAX-ENTRIES  Entries kept in that cache (default 1000)
+#   INPUT_STREAM         'true' to stream codegen and stop at the closing fence
+#   INPUT_FORBIDDEN-IMPORTS  Comma-separated modules generated code must not
+#                            import (default codegen_check.DEFAULT_FORBIDDEN_IMPORTS)
+#   INPUT_SMOKE-IMPORT   'true' to also import the code in a sandboxed subprocess
+#   INPUT_REPAIR-ATTEMPTS  Repair calls allowed when the checks fail (default 1)
+#   INPUT_PROFILE        'cpu', 'mem' or 'both' to write profiles to CONTAINER_OUTPUT
 
 import logging
 import os
 import pathlib
+import queue
 import re
 import sys
+import threading
 
-logging.basicConfig(level=logging.INFO)
+from typing import TYPE_CHECKING, Any, Iterable, List, NamedTuple, Optional, Sequence, Tuple
 
 # ai_tutor/ lives one level above prompt_pipeline/ inside the container:
 #   /app/ai_tutor/   ← llm_client.py, llm_configs.py, llm_utils.py
@@ -29,24 +43,38 @@ if _ai_tutor.is_dir():
     sys.path.insert(0, str(_ai_tutor))
 else:
     sys.path.insert(0, str(_project_root))
-
-from llm_client import LLMAPIClient  # noqa: E402
+# Sibling modules; appended so they never shadow the tutor's entrypoint.py
+sys.path.append(str(pathlib.Path(__file__).parent))
+
+import codegen_cache  # noqa: E402
+import codegen_check  # noqa: E402
+import metrics  # noqa: E402
+import profiling  # noqa: E402
+import tracing  # noqa: E402
+import usage_ledger  # noqa: E402
 from llm_configs import GeminiConfig, LLMConfig  # noqa: E402
-from llm_utils import get_model_key_from_env, get_config_class  # noqa: E402
+from llm_utils import (  # noqa: E402
+    create_client, get_api_key_dict_from_env, get_config_class, get_model_key_from_env,
+)
+
+if TYPE_CHECKING:
+    from llm_client import LLMAPIClient
 
 
 # Code generation needs higher token limits and deterministic output.
 # Tutoring (entrypoint.py) uses the config defaults (96 tokens, temp 0.2).
 CODEGEN_MAX_TOKENS = 4096
 CODEGEN_TEMPERATURE = 0
+# Extra samples from the same model need some diversity to be worth racing
+CANDIDATE_SAMPLE_TEMPERATURE = 0.7
 
 
-def patch_config_for_codegen(config: LLMConfig) -> None:
+def patch_config_for_codegen(config: LLMConfig, temperature: float = CODEGEN_TEMPERATURE) -> None:
     """Override generation parameters for code generation.
 
     Wraps config.format_request_data to set higher max_tokens and
-    temperature=0. Gemini uses ``generationConfig``; OpenAI-compatible
-    providers use top-level ``max_tokens`` / ``temperature``.
+    temperature (0 by default). Gemini uses ``generationConfig``;
+    OpenAI-compatible providers use top-level ``max_tokens`` / ``temperature``.
     """
     original = config.format_request_data
 
@@ -55,14 +83,14 @@ def patch_config_for_codegen(config: LLMConfig) -> None:
             data = original(question)
             data['generationConfig'] = {
                 'maxOutputTokens': CODEGEN_MAX_TOKENS,
-                'temperature': CODEGEN_TEMPERATURE,
+                'temperature': temperature,
             }
             return data
     else:
         def patched(question: str):
             data = original(question)
             data['max_tokens'] = CODEGEN_MAX_TOKENS
-            data['temperature'] = CODEGEN_TEMPERATURE
+            data['temperature'] = temperature
             return data
 
     config.format_request_data = patched
@@ -106,62 +134,483 @@ def extract_python_code(response: str) -> str:
     return response.strip()
 
 
+_CODE_BLOCK_PATTERN = re.compile(r'```[^\n`]*\n.*?```', re.DOTALL)
+
+
+def has_code_block(response: str) -> bool:
+    """Return True if *response* contains a complete fenced code block."""
+    return bool(_CODE_BLOCK_PATTERN.search(response))
+
+
+class StreamingCodeExtractor:
+    """Accumulates streamed text until the first fenced code block is complete.
+
+    ``feed()`` returns True once the closing fence has arrived; anything the
+    model writes afterwards is irrelevant to ``extract_python_code``.
+    """
+
+    _OPENING_FENCE = re.compile(r'```[^\n`]*\n')
+
+    def __init__(self):
+        self.text = ''
+        self.closed = False
+        self._code_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> bool:
+        if self.closed:
+            return True
+        scan_from = max(len(self.text) - 2, 0)  # a fence may straddle chunks
+        self.text += chunk
+
+        if self._code_start is None:
+            match = self._OPENING_FENCE.search(self.text)
+            if not match:
+                return False
+            self._code_start = match.end()
+            scan_from = self._code_start
+
+        close = self.text.find('```', max(scan_from, self._code_start))
+        if close == -1:
+            return False
+
+        self.text = self.text[:close + 3]
+        self.closed = True
+        return True
+
+    def get_response(self) -> str:
+        """Text received so far, with the fence closed if the stream ended inside the code block."""
+        if self._code_start is not None and not self.closed:
+            return self.text.rstrip() + '\n```'
+        return self.text
+
+
+def is_streaming_enabled_from_env() -> bool:
+    return 'true' == os.getenv('INPUT_STREAM', 'false').lower()
+
+
+def stream_response(client: 'LLMAPIClient', question: str) -> Optional[str]:
+    """Stream a codegen response, stopping as soon as the code block is complete.
+
+    The stream is closed once a closing fence follows an opening one. No
+    stop sequence is sent: a provider cannot tell a closing fence from an
+    untagged opening fence after some prose, and would end the generation
+    before the code.
+
+    Returns:
+        Optional[str]: Response text up to the closing fence, or None if nothing was received
+    """
+    extractor = StreamingCodeExtractor()
+
+    chunks = client.stream_api(question)
+    try:
+        for chunk in chunks:
+            if extractor.feed(chunk):
+                logging.info("Closing code fence received; stopping the stream")
+                break
+    finally:
+        chunks.close()
+
+    return extractor.get_response() or None
+
+
+def call_codegen(client: 'LLMAPIClient', question: str, stream: bool = False) -> Optional[str]:
+    """Streamed response if *stream*, falling back to a regular call when streaming yields nothing."""
+    if stream:
+        response = stream_response(client, question)
+        if response:
+            return response
+        logging.warning("Streaming returned no text; retrying without streaming")
+    return client.call_api(question)
+
+
 def build_question(student_prompt: str) -> str:
     return f"{_SYSTEM_INSTRUCTION}\n\nStudent requirements:\n{student_prompt}"
 
 
+_REPAIR_INSTRUCTION = (
+    "The Python code below fails these checks. Fix only what the checks report "
+    "and keep everything else unchanged. Output ONLY a single ```python code block.\n"
+)
+
+
+def build_repair_question(code: str, problems: Sequence[str]) -> str:
+    """Repair request carrying only the failed checks and the code, not the student prompt."""
+    problem_lines = ''.join(f"- {problem}\n" for problem in problems)
+    return f"{_REPAIR_INSTRUCTION}\nChecks:\n{problem_lines}\n```python\n{code}\n```\n"
+
+
+def get_repair_attempts_from_env() -> int:
+    return max(0, int(os.getenv('INPUT_REPAIR-ATTEMPTS', '1')))
+
+
+def check_code_from_env(code: str) -> List[str]:
+    """codegen_check.check_code with the required names, forbidden imports and smoke setting from the environment."""
+    return codegen_check.check_code(
+        code,
+        codegen_check.get_required_names_from_env(),
+        codegen_check.get_forbidden_imports_from_env(),
+        smoke=codegen_check.is_smoke_import_enabled_from_env(),
+    )
+
+
+def check_and_repair(
+    client: 'LLMAPIClient',
+    code: str,
+    max_attempts: int,
+    problems: Optional[List[str]] = None,
+) -> Tuple[str, List[str]]:
+    """Check *code* and make up to *max_attempts* repair calls while it fails.
+
+    A repaired version replaces the current one unless it has more problems.
+    Pass *problems* when *code* was already checked to skip the first check.
+
+    Returns:
+        Tuple[str, List[str]]: the final code and its remaining problems (empty if it passed)
+    """
+    if problems is None:
+        with tracing.span('check_code'):
+            problems = check_code_from_env(code)
+
+    for attempt in range(1, max_attempts + 1):
+        if not problems:
+            break
+        logging.warning("Generated code failed checks (%s); repair attempt %d/%d",
+                        '; '.join(problems), attempt, max_attempts)
+        with tracing.span('repair_code', attempt=attempt):
+            response = client.call_api(build_repair_question(code, problems))
+        repaired = extract_python_code(response) if response else ''
+        if not repaired:
+            continue
+
+        with tracing.span('check_code'):
+            repaired_problems = check_code_from_env(repaired)
+        if len(repaired_problems) <= len(problems):
+            code, problems = repaired, repaired_problems
+
+    if problems:
+        logging.warning("Generated code still fails checks: %s", '; '.join(problems))
+    return code, problems
+
+
+def make_codegen_client(
+    model: str,
+    api_key: str,
+    temperature: float = CODEGEN_TEMPERATURE,
+    ledger: Optional[usage_ledger.UsageLedger] = None,
+) -> 'LLMAPIClient':
+    client = create_client(model, api_key)
+    patch_config_for_codegen(client.config, temperature)
+    if ledger:
+        client.observers.append(ledger.observe)
+    return client
+
+
+class CancellableSession:
+    """Session of one race candidate that the race can close from another thread.
+
+    Keeps the responses it hands out, so ``close()`` drops a stream that is
+    still being read, and fails every later post as a network error, so a
+    pending retry is never sent. A regular request already on the wire
+    cannot be interrupted; its response is discarded when it arrives.
+    """
+
+    def __init__(self, session: Optional[Any] = None):
+        self._session = session
+        self._owns_session = session is None
+        self._responses: List[Any] = []
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def post(self, url: str, **kwargs) -> Any:
+        import requests
+
+        with self._lock:
+            if self.closed:
+                raise requests.ConnectionError("Candidate cancelled")
+            if self._session is None:
+                self._session = requests.Session()
+            session = self._session
+        response = session.post(url, **kwargs)
+        with self._lock:
+            if not self.closed:
+                self._responses.append(response)
+                return response
+        response.close()
+        raise requests.ConnectionError("Candidate cancelled")
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+            responses, self._responses = self._responses, []
+        for response in responses:
+            response.close()
+        if self._owns_session and self._session is not None:
+            self._session.close()
+
+
+class Candidate(NamedTuple):
+    """One codegen attempt in a race: which model, with which key and temperature."""
+    model: str
+    api_key: str
+    temperature: float
+
+
+def get_model_keys_from_env(model: str, api_key: str) -> List[Tuple[str, str]]:
+    """(model, API key) for each of INPUT_CANDIDATE-MODELS that has a key.
+
+    *model* and *api_key* come from get_model_key_from_env() and are used for
+    that model and when no other model is usable.
+    """
+    models = [m.strip() for m in os.getenv('INPUT_CANDIDATE-MODELS', '').split(',') if m.strip()] or [model]
+
+    api_keys = {k: v.strip() for k, v in get_api_key_dict_from_env().items() if v.strip()}
+    general_api_key = os.getenv('INPUT_API-KEY', '').strip()
+
+    usable = []
+    for candidate_model in dict.fromkeys(models):
+        if candidate_model == model:
+            usable.append((candidate_model, api_key))
+            continue
+        key = api_keys.get(get_config_class(candidate_model).provider) or general_api_key
+        if key:
+            usable.append((candidate_model, key))
+        else:
+            logging.warning("No API key for candidate model %s; skipping", candidate_model)
+    return usable or [(model, api_key)]
+
+
+def get_candidates_from_env(model: str, api_key: str) -> List[Candidate]:
+    """Spread INPUT_CANDIDATES over INPUT_CANDIDATE-MODELS round-robin.
+
+    The first candidate of each model runs at CODEGEN_TEMPERATURE; repeated
+    samples of a model use CANDIDATE_SAMPLE_TEMPERATURE. Models without an
+    API key are skipped.
+    """
+    n_candidates = max(1, int(os.getenv('INPUT_CANDIDATES', '1')))
+    usable = get_model_keys_from_env(model, api_key)
+
+    candidates = []
+    for i in range(n_candidates):
+        candidate_model, key = usable[i % len(usable)]
+        temperature = CODEGEN_TEMPERATURE if i < len(usable) else CANDIDATE_SAMPLE_TEMPERATURE
+        candidates.append(Candidate(candidate_model, key, temperature))
+    return candidates
+
+
+def generate_first_valid(
+    question: str,
+    candidates: Sequence[Candidate],
+    timeout_sec: Optional[float] = None,
+    ledger: Optional[usage_ledger.UsageLedger] = None,
+    stream: bool = False,
+) -> Tuple[Optional[str], Optional[Candidate], List[str]]:
+    """Run *candidates* concurrently and return the first code that validates.
+
+    Each response is checked with ``check_code_from_env`` as it arrives; one
+    without a fenced code block fails.
+    Once one passes, the others are cancelled: their ``CancellableSession``
+    is closed, which drops open streams and pending retries, and since the
+    workers are daemon threads, requests still in flight do not keep the
+    process alive. If none passes, the first non-empty code is returned
+    with its problems so the grader can still report on it.
+
+    Returns:
+        Tuple[Optional[str], Optional[Candidate], List[str]]: code, the candidate that
+            produced it and the checks it fails (empty if it passed), or (None, None, [])
+            if no candidate produced any code
+    """
+    results: queue.Queue = queue.Queue()
+    cancelled = threading.Event()
+    sessions: List[CancellableSession] = []
+    sessions_lock = threading.Lock()
+
+    def worker(index: int, candidate: Candidate) -> None:
+        response = None
+        try:
+            client = make_codegen_client(candidate.model, candidate.api_key, candidate.temperature, ledger)
+            client.session = CancellableSession(client.session)
+            with sessions_lock:
+                sessions.append(client.session)
+                if cancelled.is_set():
+                    client.session.close()
+            if not cancelled.is_set():
+                response = call_codegen(client, question, stream)
+        except Exception:
+            logging.exception("Candidate %d (%s) failed", index, candidate.model)
+        results.put((index, candidate, response))
+
+    for index, candidate in enumerate(candidates):
+        threading.Thread(
+            target=worker, args=(index, candidate), name=f'codegen-candidate-{index}', daemon=True,
+        ).start()
+
+    chosen: Tuple[Optional[str], Optional[Candidate], List[str]] = (None, None, [])
+    for _ in candidates:
+        try:
+            index, candidate, response = results.get(timeout=timeout_sec)
+        except queue.Empty:
+            logging.error("Timed out waiting for codegen candidates")
+            break
+
+        # Without a fenced block extract_python_code would return the prose itself
+        code = extract_python_code(response) if response and has_code_block(response) else ''
+        problems = check_code_from_env(code) if code else ['no code block']
+        if not problems:
+            logging.info("Candidate %d (%s, temperature %s) passed validation",
+                         index, candidate.model, candidate.temperature)
+            chosen = (code, candidate, problems)
+            break
+
+        logging.warning("Candidate %d (%s) rejected: %s", index, candidate.model, '; '.join(problems))
+        if code and chosen[0] is None:
+            chosen = (code, candidate, problems)
+    else:
+        if chosen[0] is not None:
+            logging.warning("No candidate passed validation; keeping the first one with code")
+
+    with sessions_lock:
+        cancelled.set()
+        open_sessions = list(sessions)
+    for session in open_sessions:
+        session.close()
+    return chosen
+
+
 def main() -> None:
     prompt_path = pathlib.Path(os.environ['INPUT_PROMPT-FILE'])
     output_dir = pathlib.Path(os.environ['CONTAINER_OUTPUT'])
 
-    if not prompt_path.exists():
-        logging.error("Prompt file not found: %s", prompt_path)
-        sys.exit(1)
+    with metrics.recording('prompt_pipeline', str(output_dir)), \
+            profiling.profiling(str(output_dir), profiling.mode_from_env(), profiling.top_n_from_env()), \
+            tracing.recording('prompt_pipeline.main', str(output_dir), tracing.is_enabled_from_env()):
+        run(prompt_path, output_dir)
 
-    student_prompt = prompt_path.read_text(encoding='utf-8').strip()
-    if not student_prompt:
-        logging.error("Prompt file is empty: %s", prompt_path)
-        sys.exit(1)
 
-    if contains_python_code(student_prompt):
-        logging.warning(
-            "Prompt appears to contain Python code constructs. "
-            "This will be penalized by the grader. "
-            "Write a natural language description, not code."
-        )
+def run(prompt_path: pathlib.Path, output_dir: pathlib.Path) -> None:
+    with tracing.span('read_prompt'):
+        if not prompt_path.exists():
+            logging.error("Prompt file not found: %s", prompt_path)
+            sys.exit(1)
+
+        student_prompt = prompt_path.read_text(encoding='utf-8').strip()
+        if not student_prompt:
+            logging.error("Prompt file is empty: %s", prompt_path)
+            sys.exit(1)
+
+        if contains_python_code(student_prompt):
+            logging.warning(
+                "Prompt appears to contain Python code constructs. "
+                "This will be penalized by the grader. "
+                "Write a natural language description, not code."
+            )
 
     logging.info("Prompt length: %d chars", len(student_prompt))
 
-    model, api_key = get_model_key_from_env()
-    config_class = get_config_class(model)
-    config_args = {'api_key': api_key}
-    if model:
-        config_args['model'] = model
-    config = config_class(**config_args)
-    patch_config_for_codegen(config)
-    client = LLMAPIClient(config)
-
-    question = build_question(student_prompt)
-    logging.info("Calling %s for code generation...", model)
-    response = client.call_api(question)
-
-    if not response:
-        logging.error("No response from LLM — check API key and model name")
-        sys.exit(1)
-
-    code = extract_python_code(response)
-    if not code:
-        logging.error("LLM response contained no Python code block")
-        logging.error("Raw response (first 500 chars): %s", response[:500])
-        sys.exit(1)
-
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_file = output_dir / 'exercise.py'
-    output_file.write_text(code, encoding='utf-8')
+    with tracing.span('select_candidates'):
+        model, api_key = get_model_key_from_env()
+        ledger = usage_ledger.ledger_from_env()
+        candidates = get_candidates_from_env(model, api_key)
+
+    cache = codegen_cache.cache_from_env()
+    cache_key = None
+    if cache:
+        cache_key = codegen_cache.make_key(
+            student_prompt, _SYSTEM_INSTRUCTION, [c.model for c in candidates],
+            get_codegen_params((c.model, c.temperature) for c in candidates),
+        )
+        with tracing.span('codegen_cache_lookup'):
+            code = cache.get(cache_key)
+        if code:
+            logging.info("Reusing cached code for an equivalent prompt (key %s)", cache_key[:12])
+            write_exercise(code, output_dir)
+            return
+
+    code, problems, code_model = generate_code(build_question(student_prompt), model, api_key, candidates, ledger)
+
+    if cache and not problems:
+        # Only code that passes the local checks is shared with other students
+        cache.put(cache_key, code, code_model)
+
+    write_exercise(code, output_dir)
+
+
+def get_codegen_params(samples: Iterable[Tuple[str, float]]) -> dict:
+    """Generation parameters of the codegen calls, for the cache key.
+
+    *samples* holds the (model, temperature) pair of each candidate, so runs
+    that race sampled candidates do not share entries with deterministic ones.
+    """
+    return {
+        'max_tokens': CODEGEN_MAX_TOKENS,
+        'samples': sorted([model, temperature] for model, temperature in samples),
+    }
+
+
+def generate_code(
+    question: str,
+    model: str,
+    api_key: str,
+    candidates: Sequence[Candidate],
+    ledger: Optional[usage_ledger.UsageLedger],
+) -> Tuple[str, List[str], str]:
+    """Call the LLM (or race *candidates*), then check and repair the extracted code.
+
+    A race winner that passed validation is returned as is.
+
+    Returns:
+        Tuple[str, List[str], str]: the code, the checks it still fails, and the model
+            that produced it; exits if no code was produced
+    """
+    if len(candidates) > 1:
+        logging.info("Racing %d codegen candidates: %s", len(candidates),
+                     ', '.join(c.model for c in candidates))
+        with tracing.span('generate_candidates', n_candidates=len(candidates)):
+            code, candidate, problems = generate_first_valid(
+                question, candidates, ledger=ledger, stream=is_streaming_enabled_from_env(),
+            )
+        if not code:
+            logging.error("No candidate produced Python code — check API keys and model names")
+            sys.exit(1)
+        model = candidate.model
+        if not problems:
+            # Already validated in the race
+            return code, problems, model
+        client = make_codegen_client(candidate.model, candidate.api_key, ledger=ledger)
+    else:
+        with tracing.span('create_client'):
+            client = make_codegen_client(model, api_key, ledger=ledger)
+
+        logging.info("Calling %s for code generation...", model)
+        response = call_codegen(client, question, is_streaming_enabled_from_env())
+
+        if not response:
+            logging.error("No response from LLM — check API key and model name")
+            sys.exit(1)
+
+        with tracing.span('extract_python_code'):
+            code = extract_python_code(response)
+        if not code:
+            logging.error("LLM response contained no Python code block")
+            logging.error("Raw response (first 500 chars): %s", response[:500])
+            sys.exit(1)
+
+        problems = None
+
+    # Remaining problems are logged, not fatal: the grader reports on the code either way
+    code, problems = check_and_repair(client, code, get_repair_attempts_from_env(), problems)
+    return code, problems, model
+
+
+def write_exercise(code: str, output_dir: pathlib.Path) -> None:
+    with tracing.span('write_exercise'):
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_file = output_dir / 'exercise.py'
+        output_file.write_text(code, encoding='utf-8')
     logging.info("exercise.py written to %s (%d chars)", output_file, len(code))
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     main()
 
 # end prompt_pipeline/entrypoint.py
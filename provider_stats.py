@@ -0,0 +1,305 @@
+# begin provider_stats.py
+"""Persistent latency, success and cost history per LLM provider.
+
+With several provider keys and no model pinned, ``get_model_key_from_env``
+used to fall back to Gemini whatever each provider was doing lately.
+``ProviderStats`` remembers, per provider, from every ``LLMAPIClient``
+attempt event (``observe``):
+
+- EWMAs of the latency of successful responses, of the success rate of
+  attempts (429s, errors and timeouts count as failures), and of the
+  estimated cost of a successful call (``usage_ledger.estimate_cost``)
+- A ``LatencySketch`` of successful latencies for percentiles, whose
+  counts are halved whenever they pass ``MAX_SKETCH_COUNT`` so old
+  traffic fades out
+
+``choose`` returns the provider with the lowest expected latency (or cost)
+per successful call, the EWMA divided by the success rate, among providers
+with at least ``min_samples`` attempts and a success rate of at least
+``success_floor``. Only the chosen provider is called, so the history
+would otherwise never grow for the others:
+
+- A share ``explore`` of choices goes to a provider with little history,
+  stale history (older than ``stale_sec``) or a success rate below the
+  floor, so every keyed provider keeps getting samples
+- A success rate below the floor decays back toward the floor with a
+  half-life of ``SUCCESS_HALF_LIFE_SEC``, so after an outage one good
+  explored call is enough to requalify a provider
+- If every provider with history is below the floor, the least bad of
+  them is chosen rather than a fallback the history knows nothing about
+
+Without any history, ``choose`` returns None except when exploring. The
+history is a small JSON file at INPUT_PROVIDER-STATS, rewritten after each
+attempt; keep it between runs like the feedback cache.
+"""
+
+import json
+import logging
+import math
+import os
+import pathlib
+import random
+import threading
+import time
+
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from llm_utils import extract_token_usage
+from usage_ledger import estimate_cost
+
+
+STATS_VERSION = 1
+EWMA_ALPHA = 0.2
+DEFAULT_SUCCESS_FLOOR = 0.9
+DEFAULT_MIN_SAMPLES = 3
+DEFAULT_EXPLORE = 0.1
+DEFAULT_STALE_SEC = 7 * 24 * 3600.0
+SUCCESS_HALF_LIFE_SEC = 24 * 3600.0
+OBJECTIVES = ('latency', 'cost')
+
+# Relative accuracy of sketch quantiles, and the count above which old samples fade
+SKETCH_ACCURACY = 0.05
+MAX_SKETCH_COUNT = 500
+MIN_LATENCY_SEC = 0.001
+
+
+def ewma(previous: Optional[float], value: float, alpha: float = EWMA_ALPHA) -> float:
+    return value if previous is None else previous + alpha * (value - previous)
+
+
+class LatencySketch:
+    """Log-bucket quantile sketch: any quantile within SKETCH_ACCURACY relative error.
+
+    Attributes:
+        counts (Dict[int, float]): Samples per bucket; bucket i holds (gamma**(i-1), gamma**i]
+    """
+
+    gamma = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+
+    def __init__(self, counts: Optional[Dict[int, float]] = None):
+        self.counts: Dict[int, float] = dict(counts or {})
+
+    def total(self) -> float:
+        return sum(self.counts.values())
+
+    def add(self, value: float) -> None:
+        index = math.ceil(math.log(max(value, MIN_LATENCY_SEC)) / math.log(self.gamma))
+        self.counts[index] = self.counts.get(index, 0.0) + 1.0
+        if self.total() > MAX_SKETCH_COUNT:
+            self.counts = {i: c / 2 for i, c in self.counts.items() if c / 2 >= 0.01}
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The *q* quantile (0 to 1) of the samples, None if there are none."""
+        total = self.total()
+        if not total:
+            return None
+        rank = q * total
+        seen = 0.0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                # Midpoint of the bucket in relative terms
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.counts) / (self.gamma + 1)
+
+    def to_json(self) -> Dict[str, float]:
+        return {str(i): round(c, 4) for i, c in sorted(self.counts.items())}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, float]) -> 'LatencySketch':
+        return cls({int(i): float(c) for i, c in data.items()})
+
+
+class ProviderRecord:
+    """History of one provider."""
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        data = data or {}
+        self.attempts = int(data.get('attempts', 0))
+        self.latency_sec: Optional[float] = data.get('latency_sec')
+        self.success: Optional[float] = data.get('success')
+        self.cost_usd: Optional[float] = data.get('cost_usd')
+        self.sketch = LatencySketch.from_json(data.get('sketch') or {})
+        self.updated: Optional[str] = data.get('updated')
+        self.updated_at: Optional[float] = data.get('updated_at')
+
+    def observe(self, event: Dict[str, Any], now: float) -> None:
+        ok = event.get('status_code') == 200
+        self.attempts += 1
+        self.success = ewma(self.success, 1.0 if ok else 0.0)
+        if ok and event.get('latency_sec') is not None:
+            self.latency_sec = ewma(self.latency_sec, event['latency_sec'])
+            self.sketch.add(event['latency_sec'])
+            usage = extract_token_usage(event.get('raw_response'))
+            cost = estimate_cost(event.get('model', ''), usage['input_tokens'], usage['output_tokens'])
+            if cost is not None:
+                self.cost_usd = ewma(self.cost_usd, cost)
+        self.updated = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now))
+        self.updated_at = now
+
+    def age_sec(self, now: float) -> float:
+        return float('inf') if self.updated_at is None else max(0.0, now - self.updated_at)
+
+    def success_at(self, now: float, success_floor: float) -> float:
+        """Success rate, where a rate below *success_floor* recovers toward it as the history ages."""
+        success = self.success or 0.0
+        if success >= success_floor or self.updated_at is None:
+            return success
+        return success_floor - (success_floor - success) * 0.5 ** (self.age_sec(now) / SUCCESS_HALF_LIFE_SEC)
+
+    def expected(self, objective: str, success: Optional[float] = None) -> Optional[float]:
+        """Expected latency or cost per successful call, counting the failed attempts before it."""
+        value = self.latency_sec if objective == 'latency' else self.cost_usd
+        success = self.success if success is None else success
+        if value is None or not success:
+            return None
+        return value / success
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'attempts': self.attempts,
+            'latency_sec': self.latency_sec,
+            'success': self.success,
+            'cost_usd': self.cost_usd,
+            'p50_sec': self.sketch.quantile(0.5),
+            'p90_sec': self.sketch.quantile(0.9),
+            'p99_sec': self.sketch.quantile(0.99),
+            'sketch': self.sketch.to_json(),
+            'updated': self.updated,
+            'updated_at': self.updated_at,
+        }
+
+
+class ProviderStats:
+    """Provider histories kept in a JSON file.
+
+    Attributes:
+        path (Optional[pathlib.Path]): File the history is loaded from and saved to; None keeps it in memory
+        providers (Dict[str, ProviderRecord]): History per provider name
+        clock (Callable[[], float]): Wall-clock time, for the age of the history
+    """
+
+    def __init__(self, path: Optional[pathlib.Path] = None, clock: Callable[[], float] = time.time):
+        self.path = pathlib.Path(path) if path else None
+        self.providers: Dict[str, ProviderRecord] = {}
+        self.clock = clock
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable provider stats {self.path}: {e}")
+            return
+        if data.get('version') != STATS_VERSION:
+            logging.warning(f"Ignoring provider stats {self.path} of version {data.get('version')}")
+            return
+        self.providers = {name: ProviderRecord(record) for name, record in data.get('providers', {}).items()}
+
+    def observe(self, event: Dict[str, Any]) -> None:
+        """Add one ``LLMAPIClient`` attempt event and save the history."""
+        provider = event.get('provider')
+        if not provider or provider == 'unknown':
+            return
+        with self._lock:
+            self.providers.setdefault(provider, ProviderRecord()).observe(event, self.clock())
+            self.save()
+
+    def save(self) -> None:
+        """Write the history atomically; call with the lock held."""
+        if self.path is None:
+            return
+        document = {
+            'version': STATS_VERSION,
+            'providers': {name: record.to_json() for name, record in sorted(self.providers.items())},
+        }
+        tmp_path = self.path.with_suffix('.tmp')
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(json.dumps(document, indent=2), encoding='utf-8')
+            tmp_path.replace(self.path)
+        except OSError as e:
+            logging.warning(f"Could not write provider stats: {e}")
+
+    def choose(self, providers: Iterable[str], objective: str = 'latency',
+               success_floor: float = DEFAULT_SUCCESS_FLOOR,
+               min_samples: int = DEFAULT_MIN_SAMPLES, explore: float = 0.0,
+               stale_sec: float = DEFAULT_STALE_SEC, rng: Optional[random.Random] = None) -> Optional[str]:
+        """The provider to use among *providers*, or None if there is no history to go by.
+
+        Args:
+            providers (Iterable[str]): Providers with a key available
+            objective (str): 'latency' or 'cost' per successful call
+            success_floor (float): Lowest acceptable success rate of attempts
+            min_samples (int): Attempts needed before a provider's history counts
+            explore (float): Share of choices given to a provider with little, stale or failing history
+            stale_sec (float): Age after which a provider's history counts as stale
+            rng (random.Random, optional): Source of the exploration draws. Defaults to the random module
+
+        Raises:
+            ValueError: If objective is not one of OBJECTIVES
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective {objective!r}; use one of {', '.join(OBJECTIVES)}")
+        rng = rng or random
+        now = self.clock()
+        scored, rejected, unexplored = [], [], []
+        with self._lock:
+            for provider in sorted(set(providers)):
+                record = self.providers.get(provider)
+                if record is None or record.attempts < min_samples:
+                    unexplored.append(provider)
+                    continue
+                success = record.success_at(now, success_floor)
+                if success < success_floor or record.age_sec(now) > stale_sec:
+                    unexplored.append(provider)
+                if success < success_floor:
+                    rejected.append((-success, provider))
+                    continue
+                expected = record.expected(objective, success)
+                if expected is not None:
+                    scored.append((expected, provider))
+
+        if unexplored and rng.random() < explore:
+            provider = rng.choice(unexplored)
+            logging.info(f"Exploring provider {provider} to refresh its history")
+            return provider
+        if scored:
+            expected, provider = min(scored)
+            logging.info(f"Provider history favours {provider} (expected {objective} {expected:.4g} per call)")
+            return provider
+        if rejected:
+            # Every provider with history fails too often; the least bad one beats a blind fallback
+            success, provider = min(rejected)
+            logging.warning(f"No provider meets the success floor {success_floor:.0%}; using {provider} ({-success:.0%})")
+            return provider
+        return None
+
+
+_stats: Dict[str, ProviderStats] = {}
+_stats_lock = threading.Lock()
+
+
+def stats_from_env() -> Optional[ProviderStats]:
+    """The process-wide history at INPUT_PROVIDER-STATS, or None."""
+    path = os.getenv('INPUT_PROVIDER-STATS', '').strip()
+    if not path:
+        return None
+    with _stats_lock:
+        stats = _stats.get(path)
+        if stats is None:
+            stats = _stats[path] = ProviderStats(pathlib.Path(path))
+        return stats
+
+
+def choice_params_from_env() -> Tuple[str, float, float]:
+    """INPUT_PROVIDER-OBJECTIVE ('latency' or 'cost'), INPUT_PROVIDER-SUCCESS-FLOOR and INPUT_PROVIDER-EXPLORE."""
+    objective = os.getenv('INPUT_PROVIDER-OBJECTIVE', 'latency').strip().lower() or 'latency'
+    floor = os.getenv('INPUT_PROVIDER-SUCCESS-FLOOR', '').strip()
+    explore = os.getenv('INPUT_PROVIDER-EXPLORE', '').strip()
+    return (objective, float(floor) if floor else DEFAULT_SUCCESS_FLOOR,
+            float(explore) if explore else DEFAULT_EXPLORE)
+
+# end provider_stats.py
@@ -0,0 +1,119 @@
+# begin report_merge.py
+"""Merge pytest-json-report files from pytest-xdist workers or matrix shards.
+
+Shards often collect the same tests, so concatenating their failures explains
+one failing test several times. Tests are merged by ``nodeid``: the merged
+outcome is the worst one seen in any shard, and for each phase (setup, call,
+teardown) the most informative record is kept, i.e. the worst phase outcome
+with the longest ``longrepr`` plus ``stderr``.
+"""
+
+import concurrent.futures
+import json
+import logging
+import pathlib
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import tracing
+
+
+TEST_PHASES = ('setup', 'call', 'teardown')
+
+# Higher is worse; a test failing in any shard is reported as failing
+OUTCOME_SEVERITY = {
+    'skipped': 0,
+    'passed': 1,
+    'xfailed': 2,
+    'xpassed': 3,
+    'failed': 4,
+    'error': 5,
+}
+
+
+def load_report(report_path: pathlib.Path) -> Dict[str, Any]:
+    logging.info(f"Processing report file: {report_path}")
+    with tracing.span('load_report', path=str(report_path)):
+        return json.loads(report_path.read_text())
+
+
+def load_reports(
+    report_paths: Iterable[pathlib.Path],
+    max_workers: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Read and parse report files concurrently, preserving their order.
+
+    Threads overlap the file reads, which dominate on network or container
+    mounted volumes; a single report is read in the calling thread.
+    """
+    report_paths = list(report_paths)
+    if len(report_paths) <= 1:
+        return [load_report(p) for p in report_paths]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(load_report, report_paths))
+
+
+def severity(outcome: Optional[str]) -> int:
+    return OUTCOME_SEVERITY.get(outcome, OUTCOME_SEVERITY['failed'])
+
+
+def phase_score(phase: Dict[str, Any]) -> Tuple[int, int]:
+    detail = len(str(phase.get('longrepr') or '')) + len(str(phase.get('stderr') or ''))
+    return severity(phase.get('outcome')), detail
+
+
+def merge_test(merged: Dict[str, Any], test: Dict[str, Any]) -> None:
+    """Fold *test* from another shard into *merged* in place."""
+    if severity(test.get('outcome')) > severity(merged.get('outcome')):
+        merged['outcome'] = test.get('outcome')
+
+    for phase in TEST_PHASES:
+        candidate = test.get(phase)
+        if not isinstance(candidate, dict):
+            continue
+        current = merged.get(phase)
+        if not isinstance(current, dict) or phase_score(candidate) > phase_score(current):
+            merged[phase] = candidate
+
+
+def merge_reports(reports: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge parsed reports into one report with a single entry per ``nodeid``.
+
+    Test order follows first appearance. Tests without a ``nodeid`` are kept
+    as they are.
+
+    Returns:
+        Dict[str, Any]: ``{'tests': [...], 'summary': {outcome: count, 'total': n}}``
+    """
+    merged: Dict[Any, Dict[str, Any]] = {}
+    n_duplicates = 0
+
+    for report in reports:
+        for test in report.get('tests', []):
+            nodeid = test.get('nodeid')
+            key = nodeid if nodeid is not None else id(test)
+            if key in merged:
+                merge_test(merged[key], test)
+                n_duplicates += 1
+            else:
+                merged[key] = dict(test)
+
+    if n_duplicates:
+        logging.info(f"Merged {n_duplicates} duplicate test entries across reports")
+
+    summary: Dict[str, int] = {}
+    for test in merged.values():
+        outcome = test.get('outcome', 'unknown')
+        summary[outcome] = summary.get(outcome, 0) + 1
+    summary['total'] = len(merged)
+
+    return {'tests': list(merged.values()), 'summary': summary}
+
+
+def load_merged_report(report_paths: Iterable[pathlib.Path]) -> Dict[str, Any]:
+    """Load report files in parallel and merge them by ``nodeid``."""
+    with tracing.span('merge_reports'):
+        return merge_reports(load_reports(report_paths))
+
+# end report_merge.py
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# begin service.py
+#
+# Long-running tutor service.
+#
+# Keeps the LLM client, its pooled HTTP connections, and the loaded locales
+# resident so that each feedback request skips the container, interpreter,
+# and import start-up cost of entrypoint.py.
+#
+# Environment variables:
+#   INPUT_SERVICE-HOST   Interface to bind (default 127.0.0.1)
+#   INPUT_SERVICE-PORT   Port to listen on (default 8080)
+#   INPUT_MODEL, INPUT_API-KEY, INPUT_*-API-KEY  as for entrypoint.py
+#   INPUT_USAGE-LEDGER   Optional usage ledger path (see usage_ledger.py)
+#   INPUT_SERVICE-MAX-CONCURRENT      Feedback requests run at once (default 8)
+#   INPUT_SERVICE-MAX-QUEUE           Requests allowed to wait (default 64)
+#   INPUT_SERVICE-MAX-QUEUE-PER-REPO  Waiting requests per repository (default 8)
+#   INPUT_SERVICE-DEGRADE-AT          Queue depth that switches to degraded
+#                                     feedback (default half the queue)
+#   INPUT_SERVICE-DEADLINE-SEC        Default deadline of requests without
+#                                     "deadline_sec" (default none)
+#   INPUT_SERVICE-ADAPTIVE            "true" to lower MAX-CONCURRENT while the
+#                                     provider's rate limit runs short (AIMD,
+#                                     see adaptive.py); it is the ceiling
+#
+# Endpoints:
+#   POST /feedback  {"report_files": [...], "student_files": [...],
+#                    "readme_path": "...", "explanation_in": "English"}
+#                   -> {"feedback": "...", "n_failed": 0, "usage": {...},
+#                       "shared": false}
+#                   Identical questions in flight at the same time share one
+#                   upstream call ("shared": true for the joiners).
+#                   Optional "repo" (fairness key, e.g. "owner/name") and
+#                   "deadline_sec" (seconds the caller will wait) feed
+#                   admission control (see admission.py): shed requests get
+#                   503 with Retry-After, and a request whose deadline
+#                   passes while the LLM is still answering gets 504 (the
+#                   abandoned call keeps its admission slot until it ends). Under overload, "degraded" is
+#                   "cached" (the last feedback for unchanged failures and
+#                   code) or "shortened" (a brief answer); otherwise null.
+#   GET  /healthz   -> {"status": "ok", "model": "..."}
+#   GET  /metrics   -> Prometheus text format (see metrics.py)
+#
+# File paths are read from the service's own filesystem, so only expose the
+# service to trusted callers (it binds to localhost by default).
+
+import collections
+import contextlib
+import copy
+import http.server
+import json
+import logging
+import os
+import pathlib
+import sys
+import threading
+import time
+
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple, Union
+
+
+sys.path.insert(
+    0,
+    str(pathlib.Path(__file__).parent.resolve())
+)
+
+
+import requests
+
+from adaptive import AIMDLimiter
+from admission import AdmissionController, Overloaded, Ticket, controller_from_env
+from entrypoint import get_path_tuple
+from llm_utils import create_client, extract_token_usage, get_model_key_from_env
+from singleflight import Flight, FlightTimeout, SingleFlight, request_key
+from usage_ledger import UsageLedger, ledger_from_env
+
+import admission
+import feedback_cache
+import metrics
+import prompt
+
+
+SERVICE_PATHS = ('/feedback', '/healthz', '/metrics')
+
+DEFAULT_REPO = 'unknown/repository'
+RECENT_FEEDBACK_SIZE = 256
+
+# Appended to the question in degraded mode: a shorter answer is generated
+# faster and frees the slot sooner.
+SHORTENED_DIRECTIVE = (
+    "\n\nThe tutor is under heavy load. Keep this answer brief: explain only the "
+    "first failing test in at most five short sentences.\n"
+)
+
+service_requests = metrics.REGISTRY.counter(
+    'tutor_service_requests_total', 'HTTP requests served by the tutor service', ('path', 'status'))
+service_shared = metrics.REGISTRY.counter(
+    'tutor_service_shared_requests_total', 'Feedback requests that joined an identical call in flight')
+
+
+class TutorService:
+    """Resident state shared by every feedback request.
+
+    Attributes:
+        model (str): Model used for all requests
+        client (LLMAPIClient): Template client holding the config and the pooled session
+        flights (SingleFlight): Identical questions in flight at once share one call_api
+        admission (Optional[AdmissionController]): Bounds and orders the requests; None admits all
+        deadline_sec (Optional[float]): Deadline of requests that do not give one
+        locales (FrozenSet[str]): Languages ``explanation_in`` may name
+    """
+
+    def __init__(self, model: str, api_key: str, ledger: Optional[UsageLedger] = None,
+                 admission: Optional[AdmissionController] = None, deadline_sec: Optional[float] = None,
+                 **client_kwargs):
+        self.model = model
+        self.admission = admission
+        self.deadline_sec = deadline_sec
+        client_kwargs.setdefault('session', requests.Session())
+        self.client = create_client(model, api_key, **client_kwargs)
+        if ledger:
+            # Per-request copies of the client share this observer list
+            self.client.observers.append(ledger.observe)
+        # prompt.assignment_code() and assignment_instruction() cache by path,
+        # but submissions reuse paths with new contents between requests.
+        self._prompt_lock = threading.Lock()
+        self.flights = SingleFlight()
+        # Last feedback by fingerprint, served instead of an LLM call under overload
+        self._recent: 'collections.OrderedDict[str, Dict[str, Any]]' = collections.OrderedDict()
+        self._recent_lock = threading.Lock()
+        self.locales = preload_locales()
+
+    def feedback(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate feedback for one submission.
+
+        Args:
+            payload (Dict[str, Any]): ``report_files``, ``student_files``, ``readme_path``
+                and optional ``explanation_in``, as accepted by entrypoint.main, plus
+                optional ``repo`` and ``deadline_sec`` for admission control
+
+        Returns:
+            Dict[str, Any]: feedback text, per-language sections, failed test count, token usage,
+                and the degraded mode if any
+
+        Raises:
+            ValueError: If a required field is missing or no valid path is given
+            RuntimeError: If the LLM returns no feedback
+            Overloaded: If admission control sheds the request
+            TimeoutError: If the LLM does not answer within ``deadline_sec``
+        """
+        try:
+            report_files = get_path_tuple(join_paths(payload['report_files']))
+            student_files = get_path_tuple(join_paths(payload['student_files']))
+            readme_path = payload['readme_path']
+        except KeyError as e:
+            raise ValueError(f"Missing field: {e.args[0]}") from e
+        if not isinstance(readme_path, str):
+            raise ValueError('readme_path must be a string')
+        readme_file = pathlib.Path(readme_path)
+        if not readme_file.exists():
+            raise ValueError('No README file found')
+
+        explanation_in = payload.get('explanation_in', 'English')
+        if not isinstance(explanation_in, str):
+            raise ValueError('explanation_in must be a string')
+        languages = prompt.get_language_list(explanation_in)
+        # Language names become locale file paths, so only the shipped ones are accepted
+        unknown = [language for language in languages if language not in self.locales]
+        if unknown:
+            raise ValueError(f"Unsupported explanation language: {', '.join(unknown)}")
+        repo = str(payload.get('repo') or DEFAULT_REPO)
+        deadline_sec = payload.get('deadline_sec', self.deadline_sec)
+        if deadline_sec is not None:
+            try:
+                deadline_sec = float(deadline_sec)
+            except (TypeError, ValueError) as e:
+                raise ValueError('deadline_sec must be a number') from e
+            if deadline_sec <= 0:
+                raise ValueError('deadline_sec must be positive')
+
+        if self.admission is None:
+            slot = contextlib.nullcontext(Ticket(repo, False, 0.0))
+        else:
+            slot = self.admission.admit(repo, deadline_sec)
+        with contextlib.ExitStack() as stack:
+            ticket = stack.enter_context(slot)
+            # The caller's clock started on arrival, so the queue wait is spent already
+            remaining_sec = None if deadline_sec is None else deadline_sec - ticket.wait_sec
+            try:
+                return self._feedback(report_files, student_files, readme_file, languages, ticket.degraded,
+                                      remaining_sec)
+            except FlightTimeout as e:
+                # The abandoned call still talks to the provider; keep its slot until it ends
+                e.flight.on_done(stack.pop_all().close)
+                raise
+
+    def _feedback(self, report_files: Tuple[pathlib.Path, ...], student_files: Tuple[pathlib.Path, ...],
+                  readme_file: pathlib.Path, languages: Tuple[str, ...], degraded: bool,
+                  deadline_sec: Optional[float] = None) -> Dict[str, Any]:
+        started = time.monotonic()
+        fingerprint = feedback_cache.compute_fingerprint(report_files, student_files, readme_file,
+                                                         languages, self.model)
+        if degraded:
+            cached = self.recent_feedback(fingerprint)
+            if cached is not None:
+                admission.degraded.inc(mode='cached')
+                logging.info(f"Overloaded; serving cached feedback {fingerprint[:12]}")
+                return {
+                    'feedback': feedback_cache.get_reuse_notice(cached) + cached['feedback'],
+                    'sections': cached['sections'],
+                    'n_failed': cached['n_failed'],
+                    'usage': {'input_tokens': 0, 'output_tokens': 0, 'model': self.model},
+                    'shared': False,
+                    'degraded': 'cached',
+                }
+
+        with self._prompt_lock:
+            prompt.assignment_code.cache_clear()
+            prompt.assignment_instruction.cache_clear()
+            if len(languages) > 1:
+                n_failed, question = prompt.engineering_multilingual(
+                    report_files, student_files, readme_file, languages, model=self.model)
+            else:
+                n_failed, question = prompt.engineering(
+                    report_files, student_files, readme_file, languages[0], model=self.model)
+
+        if degraded:
+            admission.degraded.inc(mode='shortened')
+            logging.info("Overloaded; asking for shortened feedback")
+            question += SHORTENED_DIRECTIVE
+
+        timeout_sec = None
+        if deadline_sec is not None:
+            timeout_sec = deadline_sec - (time.monotonic() - started)
+            if timeout_sec <= 0:
+                raise TimeoutError(f"Deadline of {deadline_sec:.3g}s passed before the LLM call")
+
+        (feedback, raw_response), shared = self.flights.do(
+            request_key(self.client.config, question),
+            lambda flight: self.call_api(question, flight, timeout_sec),
+            timeout=timeout_sec,
+        )
+        if shared:
+            service_shared.inc()
+            logging.info("Shared an in-flight call_api with an identical request")
+        if not feedback:
+            raise RuntimeError("Failed to get feedback from LLM")
+
+        sections = {languages[0]: feedback}
+        if len(languages) > 1:
+            sections = prompt.split_feedback_by_language(feedback, languages)
+
+        usage = extract_token_usage(raw_response)
+        usage['model'] = self.model
+
+        if not degraded:
+            self.remember_feedback(fingerprint, feedback, sections, n_failed)
+
+        return {
+            'feedback': feedback,
+            'sections': sections,
+            'n_failed': n_failed,
+            'usage': usage,
+            'shared': shared,
+            'degraded': 'shortened' if degraded else None,
+        }
+
+    def adapt_concurrency(self) -> AIMDLimiter:
+        """Let the provider's rate limit headers and 429s drive admission's concurrent slots.
+
+        The configured max_concurrent is the ceiling; the limit drops on
+        overload and climbs back as responses show quota to spare.
+
+        Raises:
+            ValueError: If the service has no admission control
+        """
+        if self.admission is None:
+            raise ValueError("Adaptive concurrency needs admission control")
+        limiter = AIMDLimiter(self.client.config.provider, self.admission.max_concurrent)
+        limiter.listeners.append(self.admission.set_max_concurrent)
+        # Per-request copies of the client share this observer list
+        self.client.observers.append(limiter.observe)
+        return limiter
+
+    def recent_feedback(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        with self._recent_lock:
+            entry = self._recent.get(fingerprint)
+            if entry is not None:
+                self._recent.move_to_end(fingerprint)
+            return entry
+
+    def remember_feedback(self, fingerprint: str, feedback: str, sections: Dict[str, str], n_failed: int) -> None:
+        """Keep the feedback as a feedback_cache-style entry, evicting the least recently used."""
+        entry = {
+            'fingerprint': fingerprint,
+            'model': self.model,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'feedback': feedback,
+            'sections': sections,
+            'n_failed': n_failed,
+        }
+        with self._recent_lock:
+            self._recent[fingerprint] = entry
+            self._recent.move_to_end(fingerprint)
+            while len(self._recent) > RECENT_FEEDBACK_SIZE:
+                self._recent.popitem(last=False)
+
+    def call_api(self, question: str, flight: Flight,
+                 timeout_sec: Optional[float] = None) -> Tuple[Optional[str], Optional[dict]]:
+        """One upstream call for a flight; returns the feedback and the raw response.
+
+        *timeout_sec*, what is left of the first caller's deadline, caps the
+        client's request timeout.
+        """
+        # A shallow copy shares config and session but keeps last_raw_response per call
+        client = copy.copy(self.client)
+        if timeout_sec is not None:
+            client.timeout_sec = min(client.timeout_sec, timeout_sec)
+
+        def stop_retrying() -> None:
+            client.max_retry_attempt = 0
+
+        flight.on_cancel(stop_retrying)
+        return client.call_api(question), client.last_raw_response
+
+
+def join_paths(paths: Union[str, Iterable[str]]) -> str:
+    """Accepts either a comma-separated string or a list of paths.
+
+    Raises:
+        ValueError: If *paths* is neither
+    """
+    if isinstance(paths, str):
+        return paths
+    if isinstance(paths, list) and all(isinstance(path, str) for path in paths):
+        return ','.join(paths)
+    raise ValueError('Paths must be a string or a list of strings')
+
+
+def preload_locales() -> FrozenSet[str]:
+    """Load every shipped locale and return their language names."""
+    languages = []
+    for locale_file in (pathlib.Path(__file__).parent / 'locale').glob('*.json'):
+        prompt.load_locale(locale_file.stem)
+        languages.append(locale_file.stem)
+    return frozenset(languages)
+
+
+class TutorRequestHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP front end for TutorService; the server must carry a ``service`` attribute."""
+
+    def do_GET(self) -> None:
+        if self.path == '/healthz':
+            self.send_json(200, {'status': 'ok', 'model': self.server.service.model})
+        elif self.path == '/metrics':
+            self.send_text(200, metrics.REGISTRY.render(), metrics.CONTENT_TYPE)
+        else:
+            self.send_json(404, {'error': f'Unknown path: {self.path}'})
+
+    def do_POST(self) -> None:
+        if self.path != '/feedback':
+            self.send_json(404, {'error': f'Unknown path: {self.path}'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(payload, dict):
+                raise ValueError('Request body must be a JSON object')
+            result = self.server.service.feedback(payload)
+        except Overloaded as e:
+            self.send_json(503, {'error': str(e), 'reason': e.reason},
+                           headers={'Retry-After': str(e.retry_after_sec)})
+        except (ValueError, AssertionError) as e:
+            self.send_json(400, {'error': str(e)})
+        except TimeoutError as e:
+            # The flight keeps running for other waiters, or is cancelled if this was the last
+            self.send_json(504, {'error': str(e)})
+        except RuntimeError as e:
+            self.send_json(502, {'error': str(e)})
+        except Exception:
+            # e.g. an unreadable file; the client gets an answer, the details stay in the log
+            logging.exception("Feedback request failed")
+            self.send_json(500, {'error': 'Internal server error'})
+        else:
+            self.send_json(200, result)
+
+    def send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_text(status, json.dumps(body, ensure_ascii=False), 'application/json; charset=utf-8', headers)
+
+    def send_text(self, status: int, text: str, content_type: str,
+                  headers: Optional[Dict[str, str]] = None) -> None:
+        data = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        # Unknown paths share one label value to keep the series count bounded
+        service_requests.inc(path=self.path if self.path in SERVICE_PATHS else 'other', status=status)
+
+    def log_message(self, format: str, *args) -> None:
+        logging.info(f"{self.address_string()} {format % args}")
+
+
+def make_server(service: TutorService, host: str, port: int) -> http.server.ThreadingHTTPServer:
+    server = http.server.ThreadingHTTPServer((host, port), TutorRequestHandler)
+    server.service = service
+    return server
+
+
+def main() -> None:
+    host = os.getenv('INPUT_SERVICE-HOST', '127.0.0.1')
+    port = int(os.getenv('INPUT_SERVICE-PORT', '8080'))
+
+    deadline_sec = os.getenv('INPUT_SERVICE-DEADLINE-SEC', '')
+
+    model, api_key = get_model_key_from_env()
+    tutor = TutorService(
+        model, api_key, ledger=ledger_from_env(), admission=controller_from_env(),
+        deadline_sec=float(deadline_sec) if deadline_sec else None,
+    )
+    if os.getenv('INPUT_SERVICE-ADAPTIVE', 'false').strip().lower() == 'true':
+        tutor.adapt_concurrency()
+    server = make_server(tutor, host, port)
+
+    logging.info(f"Tutor service using {model} listening on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Shutting down tutor service")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
+
+# end service.py
@@ -0,0 +1,189 @@
+# begin singleflight.py
+"""Coalesce concurrent identical calls into one.
+
+Used by the service so that identical questions in flight at the same time
+(a student re-triggering a run, or a class failing the same starter-code
+test) share one upstream ``call_api`` and its result.
+
+The shared call runs on its own thread; every caller, including the first,
+only waits for it. An exception raised by the call is re-raised in every
+waiter. A waiter that gives up (timeout, or any exception while waiting)
+leaves the flight; when the last waiter leaves before the call finishes, the
+flight is cancelled: its cancel callbacks run (e.g. to stop retrying) and the
+next identical request starts a fresh call. A waiter that timed out gets a
+``FlightTimeout`` carrying the flight, so it can hold resources (such as an
+admission slot) until the call it abandoned actually ends (``on_done``).
+"""
+
+import contextvars
+import hashlib
+import json
+import logging
+import threading
+
+from typing import TYPE_CHECKING, Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+if TYPE_CHECKING:
+    from llm_configs import LLMConfig
+
+
+T = TypeVar('T')
+
+
+def request_key(config: 'LLMConfig', question: str) -> str:
+    """Hash of the endpoint, model, and formatted request payload for *question*."""
+    payload = {
+        'url': config.api_url,
+        'model': config.model,
+        'data': config.format_request_data(question),
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class Flight(Generic[T]):
+    """One in-progress call shared by its waiters.
+
+    Attributes:
+        key (str): Coalescing key
+        waiters (int): Callers currently waiting for the result
+        cancelled (threading.Event): Set when every waiter left before the call finished
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.waiters = 0
+        self.done = threading.Event()
+        self.cancelled = threading.Event()
+        self.result: Optional[T] = None
+        self.error: Optional[BaseException] = None
+        self._cancel_callbacks: List[Callable[[], None]] = []
+        self._done_callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """Run *callback* when the flight is cancelled, immediately if it already was."""
+        with self._lock:
+            if not self.cancelled.is_set():
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def on_done(self, callback: Callable[[], None]) -> None:
+        """Run *callback* when the call finishes, immediately if it already has."""
+        with self._lock:
+            if not self.done.is_set():
+                self._done_callbacks.append(callback)
+                return
+        callback()
+
+    def finish(self) -> None:
+        with self._lock:
+            self.done.set()
+            callbacks, self._done_callbacks = self._done_callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logging.exception(f"Done callback of flight {self.key[:12]} failed")
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self.cancelled.is_set():
+                return
+            self.cancelled.set()
+            callbacks, self._cancel_callbacks = self._cancel_callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logging.exception(f"Cancel callback of flight {self.key[:12]} failed")
+
+
+class FlightTimeout(TimeoutError):
+    """A waiter's timeout; *flight* may still be running."""
+
+    def __init__(self, message: str, flight: Flight):
+        super().__init__(message)
+        self.flight = flight
+
+
+class SingleFlight:
+    """Registry of in-progress calls by key.
+
+    Attributes:
+        calls (int): Upstream calls started
+        shared (int): Requests that joined a call already in flight
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._flights: Dict[str, Flight] = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def do(self, key: str, fn: Callable[[Flight], T], timeout: Optional[float] = None) -> Tuple[T, bool]:
+        """Return ``fn(flight)``'s result and whether it was shared with an earlier caller.
+
+        *fn* runs once per flight on a separate thread and receives the
+        flight, so it can register ``on_cancel`` callbacks.
+
+        Raises:
+            FlightTimeout: If the result is not ready within *timeout* seconds
+            Exception: Whatever *fn* raised
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            joined = flight is not None
+            if joined:
+                self.shared += 1
+            else:
+                flight = Flight(key)
+                self._flights[key] = flight
+                self.calls += 1
+            flight.waiters += 1
+
+        if not joined:
+            # Copy the context so spans of the shared call nest under the first caller's
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run, args=(self._run, flight, fn), name=f'flight-{key[:12]}', daemon=True,
+            ).start()
+
+        try:
+            if not flight.done.wait(timeout):
+                raise FlightTimeout(f"No result within {timeout:.3g}s", flight)
+        finally:
+            self._leave(flight)
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result, joined
+
+    def _run(self, flight: Flight, fn: Callable[[Flight], Any]) -> None:
+        try:
+            flight.result = fn(flight)
+        except BaseException as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                if self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+            flight.finish()
+
+    def _leave(self, flight: Flight) -> None:
+        with self._lock:
+            flight.waiters -= 1
+            abandoned = flight.waiters == 0 and not flight.done.is_set()
+            if abandoned and self._flights.get(flight.key) is flight:
+                # Later identical requests start afresh instead of joining a cancelled call
+                del self._flights[flight.key]
+        if abandoned:
+            logging.info(f"All waiters left flight {flight.key[:12]}; cancelling it")
+            flight.cancel()
+
+# end singleflight.py
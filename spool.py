@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+# begin spool.py
+#
+# Queue-driven tutor: a pool of worker processes serving a spool directory.
+#
+# Producers drop one JSON file per submission into <spool>/incoming/, either
+# a bare /feedback payload ({"report_files": [...], "student_files": [...],
+# "readme_path": "...", "explanation_in": "English"}) or the envelope written
+# by Spool.submit(). Workers move each file through
+#
+#   incoming/ --claim--> claimed/ --> done/    result envelope with feedback
+#                                 \-> failed/  envelope with the last error
+#
+# A claim is an atomic rename, so exactly one worker wins each file. While a
+# worker processes a job it refreshes the claimed file's modification time
+# (the lease); a claim whose lease has not been refreshed for
+# INPUT_SPOOL-LEASE-SEC belongs to a crashed or stuck worker and is put back
+# into incoming/ by any worker's reaper, up to INPUT_SPOOL-MAX-ATTEMPTS
+# attempts. Files are written to a temporary name and renamed into place, so
+# readers never see partial JSON.
+#
+# Environment variables:
+#   INPUT_SPOOL-DIR           Spool root (required)
+#   INPUT_SPOOL-WORKERS       Worker processes (default: CPU count)
+#   INPUT_SPOOL-LEASE-SEC     Lease duration in seconds (default 120)
+#   INPUT_SPOOL-MAX-ATTEMPTS  Attempts per job before it fails (default 3)
+#   INPUT_SPOOL-DRAIN         'true' to exit once the spool is empty
+#   INPUT_MODEL, INPUT_*-API-KEY, INPUT_USAGE-LEDGER  as for service.py
+#
+# Throughput metrics (jobs per minute, wait and processing percentiles,
+# per-worker counts) are written to <spool>/spool_metrics.json, and each
+# worker's Prometheus metrics to <spool>/metrics_worker_<n>.prom.
+
+import json
+import logging
+import multiprocessing
+import os
+import pathlib
+import queue
+import secrets
+import sys
+import threading
+import time
+
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+
+sys.path.insert(
+    0,
+    str(pathlib.Path(__file__).parent.resolve())
+)
+
+
+import metrics  # noqa: E402
+
+
+INCOMING_DIR = 'incoming'
+CLAIMED_DIR = 'claimed'
+DONE_DIR = 'done'
+FAILED_DIR = 'failed'
+METRICS_FILENAME = 'spool_metrics.json'
+
+DEFAULT_LEASE_SEC = 120.0
+DEFAULT_MAX_ATTEMPTS = 3
+POLL_INTERVAL_SEC = 0.5
+METRICS_INTERVAL_SEC = 10.0
+
+
+def write_json_atomic(path: pathlib.Path, content: Dict[str, Any]) -> None:
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp_path.write_text(json.dumps(content, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def new_job_id() -> str:
+    # Time-ordered, so sorting incoming/ by name serves jobs first in, first out
+    return f'{time.time_ns():020d}-{secrets.token_hex(4)}'
+
+
+def job_id_from_name(name: str) -> str:
+    """Job id of ``<id>.json`` or of a private ``.<id>.json.<pid>.<tid>.<stage>`` name."""
+    return name.lstrip('.').split('.')[0]
+
+
+class Claim(NamedTuple):
+    job_id: str
+    path: pathlib.Path
+    job: Dict[str, Any]
+    claimed_at: float
+
+
+class Spool:
+    """Operations on a spool directory; safe to use from many processes at once.
+
+    Attributes:
+        root (pathlib.Path): Spool root holding incoming/, claimed/, done/ and failed/
+        lease_sec (float): Age after which an unrefreshed claim is reaped
+        max_attempts (int): Attempts per job before it is moved to failed/
+    """
+
+    def __init__(self, root: pathlib.Path, lease_sec: float = DEFAULT_LEASE_SEC,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        if lease_sec <= 0:
+            raise ValueError("lease_sec must be a positive number")
+        if max_attempts <= 0:
+            raise ValueError("max_attempts must be a positive integer")
+        self.root = pathlib.Path(root)
+        self.lease_sec = lease_sec
+        self.max_attempts = max_attempts
+        self.incoming = self.root / INCOMING_DIR
+        self.claimed = self.root / CLAIMED_DIR
+        self.done = self.root / DONE_DIR
+        self.failed = self.root / FAILED_DIR
+        for directory in (self.incoming, self.claimed, self.done, self.failed):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def submit(self, payload: Dict[str, Any]) -> str:
+        """Enqueue a /feedback payload; returns the job id."""
+        job_id = new_job_id()
+        write_json_atomic(self.incoming / f'{job_id}.json', {
+            'id': job_id,
+            'submitted_at': time.time(),
+            'attempts': 0,
+            'payload': payload,
+        })
+        return job_id
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            name: sum(1 for p in directory.iterdir() if not p.name.startswith('.'))
+            for name, directory in (
+                (INCOMING_DIR, self.incoming), (CLAIMED_DIR, self.claimed),
+                (DONE_DIR, self.done), (FAILED_DIR, self.failed),
+            )
+        }
+
+    def is_idle(self) -> bool:
+        """True when nothing is waiting and nothing is being processed."""
+        return not any(self.incoming.glob('*.json')) and not any(self.claimed.iterdir())
+
+    def claim(self) -> Optional[Claim]:
+        """Take the oldest incoming job, or None if there is none."""
+        for path in sorted(self.incoming.glob('*.json')):
+            claimed_path = self.claimed / path.name
+            try:
+                submitted_at = path.stat().st_mtime
+                # Start the lease before the rename, which keeps the modification time
+                os.utime(path)
+                os.rename(path, claimed_path)
+            except FileNotFoundError:
+                continue  # another worker was faster
+            claimed_at = time.time()
+
+            try:
+                job = json.loads(claimed_path.read_text(encoding='utf-8'))
+                if not isinstance(job, dict):
+                    raise ValueError('job is not a JSON object')
+            except (OSError, ValueError) as e:
+                logging.error(f"Unreadable job {path.name}: {e}")
+                self._move_to_failed(claimed_path, {'id': path.stem, 'error': f'unreadable job: {e}'})
+                continue
+
+            if 'payload' not in job:
+                job = {'id': path.stem, 'submitted_at': submitted_at, 'attempts': 0, 'payload': job}
+            job.setdefault('id', path.stem)
+            return Claim(path.stem, claimed_path, job, claimed_at)
+        return None
+
+    def heartbeat(self, claim: Claim) -> bool:
+        """Refresh the lease; False if the claim was reaped meanwhile."""
+        try:
+            os.utime(claim.path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _take_over(self, path: pathlib.Path, stage: str) -> Optional[pathlib.Path]:
+        """Rename a claimed file to a name private to this process; None if someone else got it first."""
+        private = self.claimed / f'.{path.name}.{os.getpid()}.{threading.get_ident()}.{stage}'
+        try:
+            os.rename(path, private)
+        except FileNotFoundError:
+            return None
+        return private
+
+    def complete(self, claim: Claim, result: Dict[str, Any]) -> bool:
+        """Write the result to done/; False (and nothing written) if the lease was lost."""
+        private = self._take_over(claim.path, 'complete')
+        if private is None:
+            logging.warning(f"Lease on job {claim.job_id} was lost; discarding its result")
+            return False
+        write_json_atomic(self.done / f'{claim.job_id}.json', {**claim.job, **result})
+        private.unlink()
+        return True
+
+    def fail(self, claim: Claim, error: str, retry: bool = True) -> Optional[str]:
+        """Requeue the job or move it to failed/; returns 'retry', 'failed', or None if the lease was lost."""
+        private = self._take_over(claim.path, 'fail')
+        if private is None:
+            logging.warning(f"Lease on job {claim.job_id} was lost; not recording its failure")
+            return None
+        return self._requeue(private, claim.job, error, retry)
+
+    def _requeue(self, path: pathlib.Path, job: Dict[str, Any], error: str, retry: bool) -> str:
+        job = {**job, 'attempts': job.get('attempts', 0) + 1, 'last_error': error}
+        if retry and job['attempts'] < self.max_attempts:
+            write_json_atomic(self.incoming / f"{job['id']}.json", job)
+            path.unlink()
+            return 'retry'
+        self._move_to_failed(path, job)
+        return 'failed'
+
+    def _move_to_failed(self, path: pathlib.Path, job: Dict[str, Any]) -> None:
+        write_json_atomic(self.failed / f"{job['id']}.json", job)
+        path.unlink()
+
+    def reap(self) -> int:
+        """Requeue claims whose lease expired; returns how many were taken back."""
+        now = time.time()
+        n_reaped = 0
+        # Private files of dead workers and reapers are reaped like any other once stale
+        for path in list(self.claimed.iterdir()):
+            try:
+                if now - path.stat().st_mtime <= self.lease_sec:
+                    continue
+            except FileNotFoundError:
+                continue
+
+            private = self._take_over(path, 'reap')
+            if private is None:
+                continue
+            try:
+                job = json.loads(private.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                self._move_to_failed(private, {'id': job_id_from_name(path.name), 'error': f'unreadable job: {e}'})
+                continue
+            if 'payload' not in job:
+                job = {'id': job_id_from_name(path.name), 'attempts': 0, 'payload': job}
+
+            if (self.done / f"{job['id']}.json").exists():
+                private.unlink()  # the worker finished but died before releasing its claim
+                continue
+            logging.warning(f"Lease on job {job['id']} expired; attempt {job.get('attempts', 0) + 1} of {self.max_attempts}")
+            self._requeue(private, job, 'lease expired', retry=True)
+            n_reaped += 1
+        return n_reaped
+
+
+class Heartbeat:
+    """Keeps a claim's lease fresh from a background thread while a job runs."""
+
+    def __init__(self, spool: Spool, claim: Claim):
+        self.spool = spool
+        self.claim = claim
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'lease-{claim.job_id}', daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.spool.lease_sec / 3):
+            if not self.spool.heartbeat(self.claim):
+                self.lost = True
+                return
+
+    def __enter__(self) -> 'Heartbeat':
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def process_claim(spool: Spool, tutor: Any, claim: Claim, worker_id: int) -> Dict[str, Any]:
+    """Run one job through ``tutor.feedback``; returns its metrics record."""
+    start = time.perf_counter()
+    record = {
+        'id': claim.job_id,
+        'worker': worker_id,
+        'wait_sec': max(0.0, claim.claimed_at - claim.job.get('submitted_at', claim.claimed_at)),
+    }
+    with Heartbeat(spool, claim):
+        try:
+            result = tutor.feedback(claim.job['payload'])
+        except (ValueError, AssertionError) as e:
+            # The submission itself is bad; retrying would fail the same way
+            status = spool.fail(claim, str(e), retry=False)
+        except Exception as e:
+            logging.exception(f"Job {claim.job_id} failed")
+            status = spool.fail(claim, f'{type(e).__name__}: {e}', retry=True)
+        else:
+            record['process_sec'] = time.perf_counter() - start
+            record['total_tokens'] = result.get('usage', {}).get('total_tokens')
+            status = 'done' if spool.complete(claim, {
+                'result': result,
+                'worker': worker_id,
+                'finished_at': time.time(),
+                'process_sec': record['process_sec'],
+            }) else None
+
+    record.setdefault('process_sec', time.perf_counter() - start)
+    record['status'] = status or 'lost'
+    return record
+
+
+def tutor_from_env() -> Any:
+    """A TutorService for the model and key selected by the environment."""
+    from llm_utils import get_model_key_from_env
+    from service import TutorService
+    from usage_ledger import ledger_from_env
+
+    model, api_key = get_model_key_from_env()
+    return TutorService(model, api_key, ledger=ledger_from_env())
+
+
+def worker_main(
+    root: str,
+    worker_id: int,
+    lease_sec: float,
+    max_attempts: int,
+    drain: bool,
+    stop_event: Any,
+    records: Any,
+    tutor_factory: Callable[[], Any] = tutor_from_env,
+) -> None:
+    """Worker process loop: claim, process, report; reap stale claims while idle."""
+    logging.basicConfig(level=logging.INFO, format=f'%(levelname)s:worker-{worker_id}:%(message)s')
+    spool = Spool(pathlib.Path(root), lease_sec, max_attempts)
+    tutor = tutor_factory()
+    metrics_filename = f'metrics_worker_{worker_id}.prom'
+    next_metrics_write = time.monotonic() + METRICS_INTERVAL_SEC
+
+    while not stop_event.is_set():
+        claim = spool.claim()
+        if claim is None:
+            spool.reap()
+            if drain and spool.is_idle():
+                break
+            stop_event.wait(POLL_INTERVAL_SEC)
+            continue
+        records.put(process_claim(spool, tutor, claim, worker_id))
+        if time.monotonic() >= next_metrics_write:
+            metrics.REGISTRY.write(spool.root, metrics_filename)
+            next_metrics_write = time.monotonic() + METRICS_INTERVAL_SEC
+
+    metrics.REGISTRY.write(spool.root, metrics_filename)
+
+
+def percentiles(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {'p50': None, 'p95': None, 'max': None}
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    return {'p50': at(0.50), 'p95': at(0.95), 'max': round(ordered[-1], 4)}
+
+
+class SpoolMetrics:
+    """Aggregates the per-job records reported by the workers."""
+
+    def __init__(self, n_workers: int):
+        self.n_workers = n_workers
+        self.start = time.perf_counter()
+        self.records: List[Dict[str, Any]] = []
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self.records.append(record)
+
+    def snapshot(self, spool: Optional[Spool] = None) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.start
+        statuses = [r['status'] for r in self.records]
+        done = [r for r in self.records if r['status'] == 'done']
+        per_worker: Dict[str, int] = {}
+        for r in done:
+            per_worker[str(r['worker'])] = per_worker.get(str(r['worker']), 0) + 1
+
+        snapshot = {
+            'workers': self.n_workers,
+            'elapsed_sec': round(elapsed, 3),
+            'done': len(done),
+            'failed': statuses.count('failed'),
+            'retried': statuses.count('retry'),
+            'lost': statuses.count('lost'),
+            'jobs_per_min': round(len(done) / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            'wait_sec': percentiles([r['wait_sec'] for r in done]),
+            'process_sec': percentiles([r['process_sec'] for r in done]),
+            'total_tokens': sum(r.get('total_tokens') or 0 for r in done),
+            'per_worker': per_worker,
+        }
+        if spool is not None:
+            snapshot['spool'] = spool.counts()
+        return snapshot
+
+
+def run_pool(
+    root: pathlib.Path,
+    n_workers: int,
+    lease_sec: float = DEFAULT_LEASE_SEC,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    drain: bool = False,
+    tutor_factory: Callable[[], Any] = tutor_from_env,
+    metrics_interval_sec: float = METRICS_INTERVAL_SEC,
+) -> Dict[str, Any]:
+    """Run *n_workers* worker processes until they drain the spool or are interrupted.
+
+    Returns the final metrics snapshot, also written to ``spool_metrics.json``.
+    """
+    spool = Spool(root, lease_sec, max_attempts)
+    # spawn: workers start without inheriting this process's threads or locks
+    context = multiprocessing.get_context('spawn')
+    stop_event = context.Event()
+    records = context.Queue()
+    workers = [
+        context.Process(
+            target=worker_main,
+            args=(str(root), worker_id, lease_sec, max_attempts, drain, stop_event, records, tutor_factory),
+            name=f'spool-worker-{worker_id}',
+        )
+        for worker_id in range(n_workers)
+    ]
+    spool_metrics = SpoolMetrics(n_workers)
+    for worker in workers:
+        worker.start()
+
+    next_write = time.monotonic() + metrics_interval_sec
+    try:
+        while any(worker.is_alive() for worker in workers) or not records.empty():
+            try:
+                spool_metrics.add(records.get(timeout=POLL_INTERVAL_SEC))
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_write:
+                write_json_atomic(root / METRICS_FILENAME, spool_metrics.snapshot(spool))
+                next_write = time.monotonic() + metrics_interval_sec
+    except KeyboardInterrupt:
+        logging.info("Stopping spool workers")
+        stop_event.set()
+    finally:
+        stop_event.set()
+        for worker in workers:
+            worker.join()
+        while True:
+            try:
+                spool_metrics.add(records.get_nowait())
+            except queue.Empty:
+                break
+
+    snapshot = spool_metrics.snapshot(spool)
+    write_json_atomic(root / METRICS_FILENAME, snapshot)
+    return snapshot
+
+
+def main() -> None:
+    root = pathlib.Path(os.environ['INPUT_SPOOL-DIR'])
+    n_workers = int(os.getenv('INPUT_SPOOL-WORKERS', '') or os.cpu_count() or 1)
+    lease_sec = float(os.getenv('INPUT_SPOOL-LEASE-SEC', str(DEFAULT_LEASE_SEC)))
+    max_attempts = int(os.getenv('INPUT_SPOOL-MAX-ATTEMPTS', str(DEFAULT_MAX_ATTEMPTS)))
+    drain = 'true' == os.getenv('INPUT_SPOOL-DRAIN', 'false').lower()
+
+    logging.info(f"Serving spool {root} with {n_workers} workers")
+    snapshot = run_pool(root, n_workers, lease_sec, max_attempts, drain)
+    logging.info(
+        f"Spool workers stopped after {snapshot['elapsed_sec']:.1f}s: {snapshot['done']} done, "
+        f"{snapshot['failed']} failed, {snapshot['jobs_per_min']} jobs/min"
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
+
+# end spool.py
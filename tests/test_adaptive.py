@@ -0,0 +1,126 @@
+# begin tests/test_adaptive.py
+import pathlib
+import sys
+from typing import Dict, Optional
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import adaptive
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.REGISTRY.reset()
+    yield
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def event(status_code: Optional[int] = 200, remaining: Optional[int] = None, limit: int = 100,
+          provider: str = 'grok', latency_sec: float = 0.5) -> Dict:
+    headers = {}
+    if remaining is not None:
+        headers = {'x-ratelimit-limit-requests': str(limit), 'x-ratelimit-remaining-requests': str(remaining)}
+    return {'provider': provider, 'status_code': status_code, 'headers': headers, 'latency_sec': latency_sec}
+
+
+def test_init_clamps_limit():
+    limiter = adaptive.AIMDLimiter('grok', initial=10, min_limit=2, max_limit=4)
+
+    assert limiter.current() == 4
+    assert adaptive.concurrency_limit.get(provider='grok') == 4
+    with pytest.raises(ValueError):
+        adaptive.AIMDLimiter('grok', initial=2, decrease=1.0)
+
+
+def test_additive_increase_about_one_per_window():
+    limiter = adaptive.AIMDLimiter('grok', initial=4, max_limit=10)
+
+    for _ in range(4):
+        limiter.observe(event(200))
+
+    assert limiter.current() == 4  # 4 + 1/4 + 1/4.25 + ... just under 5
+    limiter.observe(event(200))
+    assert limiter.current() == 5
+
+
+def test_increase_stops_at_ceiling():
+    limiter = adaptive.AIMDLimiter('grok', initial=2, max_limit=3)
+
+    for _ in range(50):
+        limiter.observe(event(200))
+
+    assert limiter.limit == 3
+
+
+def test_429_halves_once_per_round_trip():
+    clock = Clock()
+    limiter = adaptive.AIMDLimiter('grok', initial=16, max_limit=16, clock=clock)
+
+    limiter.observe(event(429))
+    limiter.observe(event(429))  # same window
+    assert limiter.current() == 8
+
+    clock.now += 0.5
+    limiter.observe(event(429))
+    assert limiter.current() == 4
+
+
+def test_backs_off_before_429_when_quota_runs_low():
+    limiter = adaptive.AIMDLimiter('grok', initial=8, max_limit=8)
+
+    limiter.observe(event(200, remaining=5))
+
+    assert limiter.current() == 4
+
+
+def test_holds_when_quota_is_short_or_on_errors():
+    limiter = adaptive.AIMDLimiter('grok', initial=4, max_limit=8)
+
+    limiter.observe(event(200, remaining=20))
+    limiter.observe(event(500))
+    limiter.observe(event(None))
+
+    assert limiter.limit == 4
+
+
+def test_never_below_min_limit():
+    clock = Clock()
+    limiter = adaptive.AIMDLimiter('grok', initial=2, min_limit=1, clock=clock)
+
+    for _ in range(5):
+        clock.now += 1
+        limiter.observe(event(429))
+
+    assert limiter.current() == 1
+
+
+def test_ignores_other_providers_and_notifies_listeners():
+    limiter = adaptive.AIMDLimiter('grok', initial=4)
+    changes = []
+    limiter.listeners.append(changes.append)
+
+    limiter.observe(event(429, provider='gemini'))
+    limiter.observe(event(429))
+
+    assert changes == [2]
+    assert adaptive.concurrency_limit.get(provider='grok') == 2
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_adaptive.py
@@ -0,0 +1,213 @@
+# begin tests/test_admission.py
+import pathlib
+import sys
+import threading
+from typing import List
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import admission
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.REGISTRY.reset()
+    yield
+
+
+def wait_until(condition, timeout: float = 5.0) -> None:
+    done = threading.Event()
+    for _ in range(int(timeout / 0.001)):
+        if condition():
+            return
+        done.wait(0.001)
+    raise AssertionError("Condition not met in time")
+
+
+class Holder:
+    """Holds a slot on a thread until released."""
+
+    def __init__(self, controller: admission.AdmissionController, repo: str, order: List[str] = None, **kwargs):
+        self.release = threading.Event()
+        self.ticket = None
+        self.error = None
+        self.order = order
+        self.repo = repo
+        self.thread = threading.Thread(target=self._run, args=(controller, kwargs), daemon=True)
+        self.thread.start()
+
+    def _run(self, controller, kwargs) -> None:
+        try:
+            with controller.admit(self.repo, **kwargs) as ticket:
+                self.ticket = ticket
+                if self.order is not None:
+                    self.order.append(self.repo)
+                self.release.wait(5)
+        except admission.Overloaded as e:
+            self.error = e
+
+    def finish(self) -> None:
+        self.release.set()
+        self.thread.join(5)
+
+
+def test_admit__free_slot_runs_immediately():
+    controller = admission.AdmissionController(max_concurrent=2)
+
+    with controller.admit('a/b') as ticket:
+        assert ticket == admission.Ticket('a/b', False, 0.0)
+        assert controller.running == 1
+        assert admission.in_flight.get() == 1
+
+    assert controller.running == 0
+    assert admission.in_flight.get() == 0
+
+
+def test_admit__queue_full_is_shed():
+    controller = admission.AdmissionController(max_concurrent=1, max_queue=1)
+    running = Holder(controller, 'a/1')
+    wait_until(lambda: controller.running == 1)
+    queued = Holder(controller, 'a/2')
+    wait_until(lambda: controller.queued == 1)
+
+    with pytest.raises(admission.Overloaded) as exc_info:
+        with controller.admit('a/3'):
+            pass
+
+    assert exc_info.value.reason == 'queue_full'
+    assert exc_info.value.retry_after_sec >= 1
+    assert admission.shed.get(reason='queue_full') == 1
+    assert admission.queue_depth.get() == 1
+    running.finish()
+    queued.finish()
+    assert queued.error is None
+
+
+def test_admit__per_repo_limit():
+    controller = admission.AdmissionController(max_concurrent=1, max_queue=10, max_queue_per_repo=1)
+    running = Holder(controller, 'busy/repo')
+    wait_until(lambda: controller.running == 1)
+    queued = Holder(controller, 'busy/repo')
+    wait_until(lambda: controller.queued == 1)
+
+    with pytest.raises(admission.Overloaded) as exc_info:
+        with controller.admit('busy/repo'):
+            pass
+    assert exc_info.value.reason == 'repo_limit'
+
+    other = Holder(controller, 'quiet/repo')
+    wait_until(lambda: controller.queued == 2)
+    for holder in (running, queued, other):
+        holder.finish()
+    assert other.error is None
+
+
+def test_admit__round_robin_across_repos():
+    controller = admission.AdmissionController(max_concurrent=1, max_queue=10)
+    order = []
+    first = Holder(controller, 'busy/repo')
+    wait_until(lambda: controller.running == 1)
+    holders = []
+    for repo in ('busy/repo', 'busy/repo', 'busy/repo', 'quiet/repo'):
+        holders.append(Holder(controller, repo, order))
+        wait_until(lambda: controller.queued == len(holders))
+
+    first.finish()
+    for n_served in range(1, len(holders) + 1):
+        wait_until(lambda: len(order) == n_served)
+        next(h for h in holders if h.ticket is not None and not h.release.is_set()).finish()
+
+    assert order == ['busy/repo', 'quiet/repo', 'busy/repo', 'busy/repo']
+
+
+def test_admit__rejects_work_that_cannot_meet_its_deadline():
+    controller = admission.AdmissionController(max_concurrent=1, service_sec=10.0)
+    running = Holder(controller, 'a/1')
+    wait_until(lambda: controller.running == 1)
+
+    # Expected wait 10s plus 10s of service
+    with pytest.raises(admission.Overloaded) as exc_info:
+        with controller.admit('a/2', deadline_sec=15):
+            pass
+
+    assert exc_info.value.reason == 'deadline'
+    assert exc_info.value.retry_after_sec == 10
+    running.finish()
+
+
+def test_admit__leaves_queue_when_deadline_passes():
+    controller = admission.AdmissionController(max_concurrent=1, service_sec=0.05)
+    running = Holder(controller, 'a/1')
+    wait_until(lambda: controller.running == 1)
+
+    # Admitted to the queue (0.05 + 0.05 < 0.2) but the slot never frees in time
+    with pytest.raises(admission.Overloaded) as exc_info:
+        with controller.admit('a/2', deadline_sec=0.2):
+            pass
+
+    assert exc_info.value.reason == 'deadline'
+    assert controller.queued == 0
+    assert admission.queue_depth.get() == 0
+    running.finish()
+
+
+def test_admit__degraded_from_queue_depth():
+    controller = admission.AdmissionController(max_concurrent=1, max_queue=10, degrade_at=1)
+    running = Holder(controller, 'a/1')
+    wait_until(lambda: controller.running == 1)
+    queued = Holder(controller, 'a/2')
+    wait_until(lambda: controller.queued == 1)
+    degraded = Holder(controller, 'a/3')
+    wait_until(lambda: controller.queued == 2)
+
+    for holder in (running, queued, degraded):
+        holder.finish()
+
+    assert not running.ticket.degraded
+    assert not queued.ticket.degraded
+    assert degraded.ticket.degraded
+
+
+def test_release_updates_service_time_estimate():
+    now = [0.0]
+    controller = admission.AdmissionController(service_sec=10.0, clock=lambda: now[0])
+
+    with controller.admit('a/b'):
+        now[0] += 20.0
+
+    assert controller.service_sec == pytest.approx(10.0 + admission.SERVICE_SEC_ALPHA * 10.0)
+
+
+def test_release_on_exception():
+    controller = admission.AdmissionController(max_concurrent=1)
+
+    with pytest.raises(RuntimeError):
+        with controller.admit('a/b'):
+            raise RuntimeError('boom')
+
+    assert controller.running == 0
+
+
+def test_controller_from_env(monkeypatch):
+    monkeypatch.setenv('INPUT_SERVICE-MAX-CONCURRENT', '3')
+    monkeypatch.setenv('INPUT_SERVICE-MAX-QUEUE', '30')
+    monkeypatch.setenv('INPUT_SERVICE-MAX-QUEUE-PER-REPO', '2')
+    monkeypatch.delenv('INPUT_SERVICE-DEGRADE-AT', raising=False)
+
+    controller = admission.controller_from_env()
+
+    assert (controller.max_concurrent, controller.max_queue, controller.max_queue_per_repo) == (3, 30, 2)
+    assert controller.degrade_at == 15
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_admission.py
@@ -0,0 +1,208 @@
+# begin tests/test_batch.py
+import json
+import pathlib
+import sys
+import threading
+import time
+import unittest.mock
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+from prompt_pipeline import batch
+
+
+VALID_RESPONSE = "```python\ndef add(a, b):\n    return a + b\n```"
+
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for name in ('INPUT_REQUIRED-FUNCTIONS', 'INPUT_CODEGEN-CACHE-DIR', 'INPUT_STREAM',
+                 'INPUT_FORBIDDEN-IMPORTS', 'INPUT_SMOKE-IMPORT', 'INPUT_REPAIR-ATTEMPTS'):
+        monkeypatch.delenv(name, raising=False)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('', batch.PROVIDER_CONCURRENCY),
+    ('3', {provider: 3 for provider in batch.PROVIDER_CONCURRENCY}),
+    ('gemini=1, claude=6', {**batch.PROVIDER_CONCURRENCY, 'gemini': 1, 'claude': 6}),
+])
+def test_parse_concurrency(text, expected):
+    assert batch.parse_concurrency(text) == expected
+
+
+def test_scheduler__respects_provider_limits():
+    scheduler = batch.ProviderScheduler(['gemini-2.5-flash', 'claude-sonnet-4-20250514'], {'gemini': 2, 'claude': 1})
+    lock = threading.Lock()
+    active = {'gemini': 0, 'claude': 0}
+    peak = {'gemini': 0, 'claude': 0}
+    used = []
+
+    def job():
+        with scheduler.slot() as model:
+            provider = scheduler.providers[model]
+            with lock:
+                used.append(model)
+                active[provider] += 1
+                peak[provider] = max(peak[provider], active[provider])
+            time.sleep(0.02)
+            with lock:
+                active[provider] -= 1
+
+    threads = [threading.Thread(target=job) for _ in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert scheduler.capacity() == 3
+    assert peak == {'gemini': 2, 'claude': 1}
+    assert set(used) == {'gemini-2.5-flash', 'claude-sonnet-4-20250514'}
+
+
+def test_scheduler__adaptive_limits_follow_responses():
+    scheduler = batch.ProviderScheduler(['grok-code-fast'], {'grok': 2}, max_limits={'grok': 4})
+    assert scheduler.capacity() == 4
+    assert scheduler.limit('grok') == 2
+
+    for _ in range(3):
+        scheduler.observe({'provider': 'grok', 'status_code': 200, 'headers': {}, 'latency_sec': 0.1})
+    assert scheduler.limit('grok') == 3
+
+    scheduler.observe({'provider': 'grok', 'status_code': 429, 'headers': {}, 'latency_sec': 0.1})
+    assert scheduler.limit('grok') == 1
+    # Other providers are not tracked
+    scheduler.observe({'provider': 'gemini', 'status_code': 429, 'headers': {}, 'latency_sec': 0.1})
+
+
+def test_scheduler__adaptive_increase_wakes_waiters():
+    scheduler = batch.ProviderScheduler(['grok-code-fast'], {'grok': 1}, max_limits={'grok': 2})
+    entered = threading.Event()
+
+    def second():
+        with scheduler.slot():
+            entered.set()
+
+    with scheduler.slot():
+        thread = threading.Thread(target=second)
+        thread.start()
+        assert not entered.wait(0.05)
+        scheduler.observe({'provider': 'grok', 'status_code': 200, 'headers': {}, 'latency_sec': 0.1})
+        assert entered.wait(5)
+    thread.join()
+
+
+def fake_create_client(model, api_key, responses=(VALID_RESPONSE,), **kwargs):
+    client = unittest.mock.Mock()
+    client.observers = []
+    answers = list(responses)
+
+    def call_api(question):
+        # Like LLMAPIClient, report each answered attempt to the observers
+        event = {'provider': 'gemini', 'status_code': 200, 'headers': {}, 'latency_sec': 0.1,
+                 'raw_response': {'usage': {'prompt_tokens': 100, 'completion_tokens': 20}}}
+        for observer in client.observers:
+            observer(event)
+        return answers.pop(0) if len(answers) > 1 else answers[0]
+
+    client.call_api.side_effect = call_api
+    return client
+
+
+@pytest.fixture
+def prompt_tree(tmp_path) -> pathlib.Path:
+    root = tmp_path / 'prompts'
+    for student, text in (('alice', 'Write add(a, b).'), ('bob', 'def add(a, b): pass'), ('carol', '')):
+        (root / student).mkdir(parents=True)
+        (root / student / 'prompt.txt').write_text(text)
+    return root
+
+
+def make_runner(**kwargs) -> batch.BatchRunner:
+    scheduler = batch.ProviderScheduler(['gemini-2.5-flash'], {'gemini': 2})
+    return batch.BatchRunner({'gemini-2.5-flash': 'key'}, scheduler, **kwargs)
+
+
+@unittest.mock.patch.object(batch.pipeline, 'create_client', side_effect=fake_create_client)
+def test_runner__writes_exercises_and_summary(mock_create_client, prompt_tree, tmp_path):
+    output_root = tmp_path / 'out'
+
+    summary = make_runner().run(batch.find_prompts(prompt_tree), prompt_tree, output_root)
+
+    assert (output_root / 'alice' / 'exercise.py').read_text() == 'def add(a, b):\n    return a + b'
+    assert not list(output_root.rglob('*.tmp'))
+    assert json.loads((output_root / batch.SUMMARY_FILENAME).read_text()) == summary
+    assert (summary['total'], summary['generated'], summary['failed']) == (3, 2, 1)
+    assert summary['total_tokens'] == 240
+
+    students = {pathlib.Path(s['prompt']).parent.name: s for s in summary['students']}
+    assert students['alice']['model'] == 'gemini-2.5-flash'
+    assert students['alice']['latency_sec'] >= 0
+    assert students['alice']['output_tokens'] == 20
+    assert students['bob']['contains_code'] is True
+    assert students['carol']['error'] == 'empty prompt'
+
+
+def test_runner__counts_repair_tokens(tmp_path, monkeypatch):
+    monkeypatch.setenv('INPUT_REQUIRED-FUNCTIONS', 'mul')
+    root = tmp_path / 'prompts'
+    (root / 'alice').mkdir(parents=True)
+    (root / 'alice' / 'prompt.txt').write_text('Write add and mul.')
+    repaired = "```python\ndef add(a, b):\n    return a + b\n\ndef mul(a, b):\n    return a * b\n```"
+
+    def create_client(model, api_key, **kwargs):
+        return fake_create_client(model, api_key, responses=(VALID_RESPONSE, repaired))
+
+    with unittest.mock.patch.object(batch.pipeline, 'create_client', side_effect=create_client):
+        summary = make_runner().run(batch.find_prompts(root), root, tmp_path / 'out')
+
+    student = summary['students'][0]
+    assert (student['status'], student['problems']) == ('generated', [])
+    assert (student['input_tokens'], student['output_tokens'], student['total_tokens']) == (200, 40, 240)
+    assert summary['total_tokens'] == 240
+
+
+@unittest.mock.patch.object(batch.pipeline, 'create_client', side_effect=fake_create_client)
+def test_runner__uses_codegen_cache(mock_create_client, tmp_path):
+    root = tmp_path / 'prompts'
+    for student, text in (('alice', 'Write add(a, b).'), ('bob', 'write  ADD(a, b)')):
+        (root / student).mkdir(parents=True)
+        (root / student / 'prompt.txt').write_text(text)
+    runner = make_runner(cache=batch.codegen_cache.CodegenCache(tmp_path / 'cache'))
+    # one worker at a time so the second prompt sees the first one's entry
+    runner.scheduler.limits = {'gemini': 1}
+
+    summary = runner.run(batch.find_prompts(root), root, tmp_path / 'out')
+
+    assert [s['status'] for s in summary['students']] == ['generated', 'cached']
+    assert mock_create_client.call_count == 1
+    assert (tmp_path / 'out' / 'bob' / 'exercise.py').exists()
+
+
+def test_runner__adaptive_scheduler_observes_clients(prompt_tree, tmp_path):
+    clients = []
+
+    def create_client(model, api_key, **kwargs):
+        client = fake_create_client(model, api_key)
+        client.observers = []
+        clients.append(client)
+        return client
+
+    scheduler = batch.ProviderScheduler(['gemini-2.5-flash'], {'gemini': 2}, max_limits={'gemini': 4})
+    runner = batch.BatchRunner({'gemini-2.5-flash': 'key'}, scheduler)
+    with unittest.mock.patch.object(batch.pipeline, 'create_client', side_effect=create_client):
+        runner.run(batch.find_prompts(prompt_tree), prompt_tree, tmp_path / 'out')
+
+    assert len(clients) == 2
+    assert all(scheduler.observe in client.observers for client in clients)
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_batch.py
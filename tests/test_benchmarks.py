@@ -0,0 +1,145 @@
+# begin tests/test_benchmarks.py
+import json
+import pathlib
+import sys
+from unittest.mock import Mock
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+from benchmarks import baseline, bench_prompt, synthetic  # noqa: E402
+import prompt  # noqa: E402
+
+
+def test_make_report_size_and_outcomes():
+    data = synthetic.make_report(10, stderr_bytes=2_000, failure_ratio=0.5)
+
+    assert len(data['tests']) == 10
+    failed = [t for t in data['tests'] if t['outcome'] == 'failed']
+    assert len(failed) == 5
+    assert sum(len(t['call'].get('stderr', '')) for t in failed) >= 2_000
+
+
+def test_make_report_is_deterministic():
+    assert synthetic.make_report(5, 100, seed=1) == synthetic.make_report(5, 100, seed=1)
+
+
+def test_make_readme_has_common_block():
+    readme = synthetic.make_readme(5_000, common_fraction=0.5)
+
+    assert synthetic.COMMON_START in readme
+    assert len(prompt.exclude_common_contents(readme)) < len(readme)
+
+
+def test_write_inputs_feeds_engineering(tmp_path):
+    paths = synthetic.write_inputs(tmp_path, n_tests=3, stderr_bytes=100, source_bytes=500, readme_bytes=500)
+
+    n_failed, result = prompt.engineering((paths['report'],), (paths['source'],), paths['readme'], 'English')
+
+    assert n_failed
+    assert result
+
+
+def test_main_quick(tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(bench_prompt, 'QUICK_TEST_COUNTS', (1,))
+    monkeypatch.setattr(bench_prompt, 'QUICK_STDERR_SIZES', (100,))
+    monkeypatch.setattr(bench_prompt, 'QUICK_TEXT_SIZES', (1_000,))
+    output = tmp_path / 'bench.json'
+
+    bench_prompt.main(['--quick', '--repeat', '2', '--output', str(output)])
+
+    document = json.loads(output.read_text())
+    assert document['version'] == bench_prompt.RESULTS_VERSION
+    names = {r['benchmark'] for r in document['results']}
+    assert names == {'collect_longrepr', 'engineering', 'sanitize_input', 'exclude_common_contents'}
+    for result in document['results']:
+        assert result['wall_sec']['n'] == 2
+        assert result['wall_sec']['min'] <= result['wall_sec']['median']
+        assert result['peak_bytes'] >= 0
+        assert result['output_chars'] > 0
+
+
+def make_document(**medians):
+    return {
+        'version': baseline.BASELINE_VERSION,
+        'metrics': {
+            name: {'unit': unit, 'median': median, 'stdev': stdev, 'n': 5, 'samples': [median]}
+            for name, (unit, median, stdev) in medians.items()
+        },
+    }
+
+
+def test_compare_flags_regression_beyond_tolerance():
+    base = make_document(**{'a.wall_sec': ('sec', 0.100, 0.001), 'a.prompt_chars': ('chars', 1000, 0.0)})
+    current = make_document(**{'a.wall_sec': ('sec', 0.140, 0.001), 'a.prompt_chars': ('chars', 1005, 0.0)})
+
+    rows = {row['metric']: row['status'] for row in baseline.compare(current, base)}
+
+    assert rows == {'a.wall_sec': 'regressed', 'a.prompt_chars': 'ok'}
+
+
+def test_compare_noise_within_stdev_is_ok():
+    base = make_document(**{'a.wall_sec': ('sec', 0.100, 0.020)})
+    current = make_document(**{'a.wall_sec': ('sec', 0.150, 0.0)})
+
+    assert baseline.compare(current, base)[0]['status'] == 'ok'
+    assert baseline.compare(current, base, k=1.0)[0]['status'] == 'regressed'
+
+
+def test_compare_improved_and_missing():
+    base = make_document(**{'a.wall_sec': ('sec', 0.100, 0.0), 'b.wall_sec': ('sec', 0.1, 0.0)})
+    current = make_document(**{'a.wall_sec': ('sec', 0.050, 0.0), 'c.wall_sec': ('sec', 9.0, 0.0)})
+
+    rows = {row['metric']: row['status'] for row in baseline.compare(current, base)}
+
+    assert rows == {'a.wall_sec': 'improved', 'b.wall_sec': 'missing'}
+
+
+def test_client_metrics_against_mock_server():
+    metrics = baseline.client_metrics(repeat=2)
+
+    assert set(metrics) == {'call_api[pooled].wall_sec', 'call_api[fresh].wall_sec'}
+    assert all(m['n'] == 2 and m['median'] > 0 for m in metrics.values())
+
+
+def test_main_record_then_check(tmp_path, monkeypatch):
+    documents = [
+        make_document(**{'a.wall_sec': ('sec', 0.100, 0.001)}),
+        make_document(**{'a.wall_sec': ('sec', 0.101, 0.001)}),
+        make_document(**{'a.wall_sec': ('sec', 0.500, 0.001)}),
+    ]
+    monkeypatch.setattr(baseline, 'collect', lambda repeat: documents.pop(0))
+    path = tmp_path / 'baseline.json'
+
+    assert baseline.main(['record', '--output', str(path)]) == 0
+    assert baseline.main(['check', '--baseline', str(path)]) == 0
+    assert baseline.main(['check', '--baseline', str(path)]) == 1
+
+
+def test_main_check_without_baseline(tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(baseline, 'collect', Mock(side_effect=AssertionError('should not measure')))
+
+    with pytest.raises(SystemExit) as exc_info:
+        baseline.main(['check', '--baseline', str(tmp_path / 'missing.json')])
+
+    assert exc_info.value.code == 2
+    assert 'record one first' in capsys.readouterr().err
+
+
+def test_load_baseline_rejects_other_version(tmp_path):
+    path = tmp_path / 'baseline.json'
+    path.write_text(json.dumps({'version': baseline.BASELINE_VERSION + 1, 'metrics': {}}))
+
+    with pytest.raises(ValueError):
+        baseline.load_baseline(path)
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_benchmarks.py
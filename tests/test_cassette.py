@@ -0,0 +1,261 @@
+# begin tests/test_cassette.py
+import contextlib
+import http.server
+import json
+import pathlib
+import sys
+import threading
+import time
+from typing import Iterator, List, Tuple
+from unittest.mock import patch
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import cassette  # noqa: E402
+import llm_utils  # noqa: E402
+from cassette import SCRUBBED, Cassette  # noqa: E402
+from llm_client import LLMAPIClient  # noqa: E402
+from llm_configs import ClaudeConfig, GeminiConfig  # noqa: E402
+
+
+SECRET = 'sk-secret-1234567890'
+
+
+def gemini_body(text: str) -> bytes:
+    return json.dumps({'candidates': [{'content': {'parts': [{'text': text}]}}]}).encode()
+
+
+class ScriptedHandler(http.server.BaseHTTPRequestHandler):
+    """Answers with the next (status, body) of the server's script; streams for alt=sse."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if 'alt=sse' in self.path:
+            body = b''.join(b'data: ' + gemini_body(word) + b'\r\n\r\n' for word in ('Hel', 'lo'))
+            status = 200
+        else:
+            status, body = self.server.script.pop(0)
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/event-stream' if 'alt=sse' in self.path else 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def scripted_server(script: List[Tuple[int, bytes]]) -> Iterator[str]:
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ScriptedHandler)
+    server.script = list(script)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def gemini_config(base_url: str = 'http://127.0.0.1:9') -> GeminiConfig:
+    return GeminiConfig(api_key=SECRET, api_url=f"{base_url}/v1beta/models/gemini-2.5-flash:generateContent?key={SECRET}")
+
+
+def events_of(client: LLMAPIClient) -> list:
+    events = []
+    client.observers.append(events.append)
+    return events
+
+
+def test_scrub_url_and_headers():
+    url, secrets = cassette.scrub_url(f"https://x/models/m:generateContent?alt=sse&key={SECRET}")
+    assert SECRET not in url and SCRUBBED in url and 'alt=sse' in url
+    assert secrets == [SECRET]
+    assert cassette.scrub_url('https://x/v1/messages') == ('https://x/v1/messages', [])
+
+    headers, secrets = cassette.scrub_headers(
+        {'Authorization': f"Bearer {SECRET}", 'x-api-key': SECRET, 'Content-Type': 'application/json'})
+    assert headers == {'Authorization': f"Bearer {SCRUBBED}", 'x-api-key': SCRUBBED, 'Content-Type': 'application/json'}
+    assert secrets == [SECRET, SECRET]
+
+
+def test_request_key_ignores_api_key():
+    payload = {'contents': [{'parts': [{'text': 'q'}]}]}
+    assert cassette.request_key('https://x/m?key=a', payload) == cassette.request_key('https://x/m?key=b', payload)
+    assert cassette.request_key('https://x/m?key=a', payload) != cassette.request_key('https://x/m?key=a', {})
+
+
+@patch('llm_client.time.sleep')
+def test_record_then_replay_offline(mock_sleep, tmp_path: pathlib.Path):
+    """Test that a 429-then-200 sequence is recorded without the key and replays without a server."""
+    path = tmp_path / 'llm.cassette.jsonl'
+    with scripted_server([(429, b'{"error": "slow down"}'), (200, gemini_body('recorded answer'))]) as url:
+        recorder = LLMAPIClient(gemini_config(url), session=Cassette(path, 'record'))
+        assert recorder.call_api('question') == 'recorded answer'
+
+    text = path.read_text()
+    assert SECRET not in text
+    assert [json.loads(line)['response']['status_code'] for line in text.splitlines()] == [429, 200]
+
+    # The server is gone; the same endpoint is answered from the file
+    player = LLMAPIClient(gemini_config(url), session=Cassette(path, 'replay', latency_scale=0))
+    events = events_of(player)
+
+    assert player.call_api('question') == 'recorded answer'
+    assert [e['status_code'] for e in events] == [429, 200]
+    # Identical requests get the recordings again from the start
+    assert player.call_api('question') == 'recorded answer'
+
+
+def test_header_key_is_scrubbed(tmp_path: pathlib.Path):
+    path = tmp_path / 'claude.jsonl'
+    body = json.dumps({'content': [{'type': 'text', 'text': 'hi'}], 'echo': SECRET}).encode()
+    with scripted_server([(200, body)]) as url:
+        client = LLMAPIClient(ClaudeConfig(api_key=SECRET, api_url=f"{url}/v1/messages"), session=Cassette(path, 'record'))
+        assert client.call_api('question') == 'hi'
+
+    recorded = json.loads(path.read_text())
+    assert SECRET not in path.read_text()
+    assert recorded['request']['headers']['x-api-key'] == SCRUBBED
+    assert recorded['request']['payload'] == ClaudeConfig(api_key='k').format_request_data('question')
+
+
+def test_stream_record_and_replay(tmp_path: pathlib.Path):
+    path = tmp_path / 'stream.jsonl'
+    with scripted_server([]) as url:
+        recorder = LLMAPIClient(gemini_config(url), session=Cassette(path, 'record'))
+        assert ''.join(recorder.stream_api('question')) == 'Hello'
+
+    recorded = json.loads(path.read_text())
+    assert recorded['request']['stream'] is True
+    assert [line for _, line in recorded['response']['lines'] if line] == [
+        'data: ' + gemini_body('Hel').decode(), 'data: ' + gemini_body('lo').decode()]
+
+    player = LLMAPIClient(gemini_config(url), session=Cassette(path, 'replay', latency_scale=0))
+    assert ''.join(player.stream_api('question')) == 'Hello'
+
+
+def test_replay_scales_latency(tmp_path: pathlib.Path):
+    path = tmp_path / 'slow.jsonl'
+    config = gemini_config()
+    interaction = {
+        'key': cassette.request_key(config.api_url, config.format_request_data('q')),
+        'request': {}, 'error': None, 'latency_sec': 0.4,
+        'response': {'status_code': 200, 'headers': {}, 'body': gemini_body('late').decode()},
+    }
+    path.write_text(json.dumps(interaction) + '\n')
+
+    for scale, low, high in ((0.25, 0.1, 0.3), (0, 0, 0.05)):
+        client = LLMAPIClient(config, session=Cassette(path, 'replay', latency_scale=scale))
+        start = time.perf_counter()
+        assert client.call_api('q') == 'late'
+        assert low <= time.perf_counter() - start < high
+
+
+def test_replay_reports_compressed_body_sizes(tmp_path: pathlib.Path):
+    path = tmp_path / 'gzip.jsonl'
+    config = gemini_config()
+    body = gemini_body('compressed').decode()
+    path.write_text(json.dumps({
+        'key': cassette.request_key(config.api_url, config.format_request_data('q')),
+        'request': {}, 'error': None, 'latency_sec': 0.0,
+        'response': {'status_code': 200, 'headers': {'Content-Encoding': 'gzip', 'Content-Length': '30'}, 'body': body},
+    }) + '\n')
+    client = LLMAPIClient(config, session=Cassette(path, 'replay', latency_scale=0))
+    events = events_of(client)
+
+    assert client.call_api('q') == 'compressed'
+    assert events[0]['response_bytes'] == (len(body), 30)
+
+
+def test_replay_errors(tmp_path: pathlib.Path):
+    """Test that a recorded timeout replays as one and an unrecorded request is a network error."""
+    path = tmp_path / 'timeout.jsonl'
+    config = gemini_config()
+    path.write_text(json.dumps({
+        'key': cassette.request_key(config.api_url, config.format_request_data('q')),
+        'request': {}, 'response': None, 'error': 'timeout', 'latency_sec': 0.0,
+    }) + '\n')
+    client = LLMAPIClient(config, session=Cassette(path, 'replay'))
+    events = events_of(client)
+
+    assert client.call_api('q') is None
+    assert client.call_api('not recorded') is None
+    assert [e['error'] for e in events] == ['timeout', 'network']
+
+
+def test_bad_arguments(tmp_path: pathlib.Path):
+    with pytest.raises(ValueError):
+        Cassette(tmp_path / 'x.jsonl', 'rewind')
+    with pytest.raises(ValueError):
+        Cassette(tmp_path / 'x.jsonl', 'record', latency_scale=-1)
+    with pytest.raises(FileNotFoundError):
+        Cassette(tmp_path / 'missing.jsonl', 'replay')
+
+
+def test_create_client_uses_cassette_from_env(monkeypatch, tmp_path: pathlib.Path):
+    monkeypatch.setattr(cassette, '_cassettes', {})
+    monkeypatch.setenv('INPUT_CASSETTE', str(tmp_path / 'env.jsonl'))
+    monkeypatch.setenv('INPUT_CASSETTE-MODE', 'record')
+
+    client = llm_utils.create_client('gemini-2.5-flash', 'k', session=object())
+
+    assert isinstance(client.session, Cassette)
+    assert client.session.mode == 'record'
+    assert llm_utils.create_client('gemini-2.5-flash', 'k').session is client.session
+
+    monkeypatch.delenv('INPUT_CASSETTE')
+    assert cassette.cassette_from_env() is None
+
+
+def test_entrypoint_main_replays(monkeypatch, capsys, tmp_path: pathlib.Path):
+    """Test that a run recorded once replays end to end with another key and no session."""
+    import requests
+
+    import entrypoint
+
+    def post(url, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = gemini_body('Check the divisor before dividing.')
+        return response
+
+    session = type('Session', (), {'post': staticmethod(post)})()
+    path = tmp_path / 'main.jsonl'
+    monkeypatch.setenv('INPUT_REPORT-FILES', str(test_folder / 'sample_report.json'))
+    monkeypatch.setenv('INPUT_STUDENT-FILES', str(test_folder / 'sample_code.py'))
+    monkeypatch.setenv('INPUT_README-PATH', str(test_folder / 'sample_readme.md'))
+    monkeypatch.setenv('INPUT_EXPLANATION-IN', 'English')
+    monkeypatch.delenv('INPUT_API-KEY', raising=False)
+    monkeypatch.delenv('GITHUB_STEP_SUMMARY', raising=False)
+
+    feedback = {}
+    for mode, key in (('record', SECRET), ('replay', 'another-key')):
+        recorded = Cassette(path, mode, latency_scale=0, session=session)
+        monkeypatch.setattr(cassette, 'cassette_from_env', lambda: recorded)
+        monkeypatch.setenv('INPUT_GEMINI-API-KEY', key)
+        # A fresh output directory each time, so the feedback cache cannot answer
+        monkeypatch.setenv('INPUT_OUTPUT-DIR', str(tmp_path / mode))
+        if mode == 'replay':
+            monkeypatch.setattr(session, 'post', None, raising=False)
+
+        entrypoint.main(b_ask=True)
+
+        feedback[mode] = capsys.readouterr().out
+
+    assert 'Check the divisor' in feedback['record']
+    assert feedback['replay'] == feedback['record']
+    assert SECRET not in path.read_text()
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+# end tests/test_cassette.py
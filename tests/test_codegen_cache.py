@@ -0,0 +1,181 @@
+# begin tests/test_codegen_cache.py
+import json
+import os
+import pathlib
+import sys
+import unittest.mock
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import prompt_pipeline.entrypoint as pp_entrypoint
+from prompt_pipeline import codegen_cache
+
+
+PARAMS = {'max_tokens': 4096, 'temperature': 0}
+
+
+def key(prompt: str, models=('gemini-2.5-flash',), params=PARAMS, instruction='system') -> str:
+    return codegen_cache.make_key(prompt, instruction, models, params)
+
+
+@pytest.mark.parametrize("a, b", [
+    ('Write add(a, b).', 'write  ADD(a, b)'),
+    ('Return x, then y; done!', 'return x then y done'),
+    ('Return the sum\nof two numbers!', 'return the sum of two numbers'),
+    ('합을 반환하세요.', '합을  반환하세요'),
+])
+def test_make_key__equivalent_prompts(a, b):
+    assert key(a) == key(b)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {'prompt': 'Write sub(a, b).'},
+    {'prompt': 'Write add(a, b) returning a-b.'},
+    {'prompt': "Write add(a, b).", 'models': ('claude',)},
+    {'prompt': "Write add(a, b).", 'params': {'max_tokens': 4096, 'temperature': 0.7}},
+    {'prompt': "Write add(a, b).", 'instruction': 'other system'},
+])
+def test_make_key__differs(kwargs):
+    assert key(**kwargs) != key('Write add(a, b).')
+
+
+def test_normalize_prompt__keeps_word_boundaries():
+    assert codegen_cache.normalize_prompt("don't_stop") == "don't_stop"
+
+
+@pytest.mark.parametrize("a, b", [
+    ('return a+b', 'return a-b'),
+    ('x <= 3.5', 'x >= 3.5'),
+    ('x <= 3.5', 'x 3 5'),
+    ('start at -1', 'start at 1'),
+    ('use a,b', 'use a b'),
+])
+def test_make_key__keeps_operators_and_numbers(a, b):
+    assert key(a) != key(b)
+
+
+def test_normalize_prompt__sentence_punctuation():
+    assert codegen_cache.normalize_prompt('Check x <= 3.5. Then RETURN a+b!') == 'check x <= 3.5 then return a+b'
+
+
+def test_cache__roundtrip(tmp_path):
+    cache = codegen_cache.CodegenCache(tmp_path)
+    assert cache.get('k') is None
+
+    cache.put('k', 'def add(a, b):\n    return a + b', 'gemini')
+
+    assert cache.get('k') == 'def add(a, b):\n    return a + b'
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_cache__corrupt_entry(tmp_path):
+    cache = codegen_cache.CodegenCache(tmp_path)
+    cache.entry_path('k').write_text('{not json')
+
+    assert cache.get('k') is None
+
+
+def test_cache__evicts_least_recently_used(tmp_path):
+    cache = codegen_cache.CodegenCache(tmp_path, max_entries=2)
+    cache.put('a', 'A = 1', 'm')
+    cache.put('b', 'B = 1', 'm')
+    os.utime(cache.entry_path('a'), (1, 1))
+    os.utime(cache.entry_path('b'), (2, 2))
+
+    cache.get('a')  # refreshes a; b is now the oldest
+    cache.put('c', 'C = 1', 'm')
+
+    assert cache.get('a') == 'A = 1'
+    assert cache.get('b') is None
+    assert cache.get('c') == 'C = 1'
+
+
+@pytest.fixture
+def pipeline_env(monkeypatch, tmp_path):
+    for name in ('INPUT_API-KEY', 'INPUT_CLAUDE_API_KEY', 'INPUT_GROK-API-KEY', 'INPUT_NVIDIA-API-KEY',
+                 'INPUT_PERPLEXITY-API-KEY', 'INPUT_MODEL', 'INPUT_CANDIDATES', 'INPUT_REQUIRED-FUNCTIONS',
+                 'INPUT_USAGE-LEDGER', 'INPUT_FORBIDDEN-IMPORTS', 'INPUT_SMOKE-IMPORT'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('INPUT_REPAIR-ATTEMPTS', '0')
+    monkeypatch.setenv('INPUT_GEMINI-API-KEY', 'test-key')
+    monkeypatch.setenv('INPUT_CODEGEN-CACHE-DIR', str(tmp_path / 'cache'))
+    return tmp_path
+
+
+@unittest.mock.patch('llm_client.LLMAPIClient.call_api',
+                     return_value="```python\ndef add(a, b):\n    return a + b\n```")
+def test_run__reuses_code_for_equivalent_prompt(mock_call_api, pipeline_env):
+    first = pipeline_env / 'first.txt'
+    first.write_text('Write a function add that returns the sum of a and b.')
+    second = pipeline_env / 'second.txt'
+    second.write_text('write a function ADD that returns the sum of a and b')
+
+    pp_entrypoint.run(first, pipeline_env / 'out1')
+    pp_entrypoint.run(second, pipeline_env / 'out2')
+
+    assert mock_call_api.call_count == 1
+    assert (pipeline_env / 'out2' / 'exercise.py').read_text() == 'def add(a, b):\n    return a + b'
+
+
+@unittest.mock.patch('llm_client.LLMAPIClient.call_api',
+                     return_value="```python\ndef add(a, b):\n    return a + b\n\nprint(add(1, 2))\n```")
+def test_run__does_not_cache_invalid_code(mock_call_api, pipeline_env):
+    prompt_file = pipeline_env / 'prompt.txt'
+    prompt_file.write_text('Write a function add.')
+
+    pp_entrypoint.run(prompt_file, pipeline_env / 'out1')
+    pp_entrypoint.run(prompt_file, pipeline_env / 'out2')
+
+    assert mock_call_api.call_count == 2
+    assert (pipeline_env / 'out2' / 'exercise.py').exists()
+
+
+@unittest.mock.patch('llm_client.LLMAPIClient.call_api',
+                     return_value="```python\ndef add(a, b):\n    return a + b\n```")
+def test_run__sampled_candidates_use_their_own_key(mock_call_api, pipeline_env, monkeypatch):
+    prompt_file = pipeline_env / 'prompt.txt'
+    prompt_file.write_text('Write a function add.')
+
+    pp_entrypoint.run(prompt_file, pipeline_env / 'out1')
+    # a second sample of the same model runs at CANDIDATE_SAMPLE_TEMPERATURE
+    monkeypatch.setenv('INPUT_CANDIDATES', '2')
+    pp_entrypoint.run(prompt_file, pipeline_env / 'out2')
+
+    assert mock_call_api.call_count >= 2
+    assert len(list((pipeline_env / 'cache').glob('*.json'))) == 2
+
+
+def test_get_codegen_params__temperatures_in_use():
+    params = pp_entrypoint.get_codegen_params([('grok-code-fast', 0.7), ('gemini-2.5-flash', 0)])
+
+    assert params['samples'] == [['gemini-2.5-flash', 0], ['grok-code-fast', 0.7]]
+
+
+def test_run__records_winning_model(pipeline_env, monkeypatch):
+    monkeypatch.setenv('INPUT_CANDIDATES', '2')
+    monkeypatch.setenv('INPUT_CANDIDATE-MODELS', 'gemini-2.5-flash,grok-code-fast')
+    monkeypatch.setenv('INPUT_GROK-API-KEY', 'grok-key')
+    responses = {
+        'gemini-2.5-flash': "```python\nprint('no function')\n```",
+        'grok-code-fast': "```python\ndef add(a, b):\n    return a + b\n```",
+    }
+    monkeypatch.setattr(pp_entrypoint, 'call_codegen', lambda client, question, stream: responses[client.config.model])
+    prompt_file = pipeline_env / 'prompt.txt'
+    prompt_file.write_text('Write a function add.')
+
+    pp_entrypoint.run(prompt_file, pipeline_env / 'out')
+
+    entries = [json.loads(p.read_text()) for p in (pipeline_env / 'cache').glob('*.json')]
+    assert [e['model'] for e in entries] == ['grok-code-fast']
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_codegen_cache.py
@@ -0,0 +1,103 @@
+# begin tests/test_codegen_check.py
+import pathlib
+import sys
+import unittest.mock
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+from prompt_pipeline import codegen_check
+
+
+VALID_CODE = '''"""Exercise."""
+import math
+
+PI = 3.14
+NAMES: tuple = ('a', 'b')
+
+
+def add(a, b):
+    return a + b
+
+
+class Counter:
+    pass
+'''
+
+
+def test_validate_code__valid():
+    assert codegen_check.validate_code(VALID_CODE, ['add', 'Counter']) == []
+
+
+@pytest.mark.parametrize("code, expected", [
+    ('', 'no code'),
+    ('def add(a, b)\n    return a + b\n', 'does not compile'),
+    ('def sub(a, b):\n    return a - b\n', 'missing required definitions: add'),
+    ('def add(a, b):\n    return a + b\n\nprint(add(1, 2))\n', 'module-level code at line 4: Expr'),
+    ('def add(a, b):\n    return a + b\n\nif __name__ == "__main__":\n    add(1, 2)\n', 'module-level code at line 4: If'),
+    ('def add(a, b):\n    return a + b\n\nx = add(1, 2)\n', 'module-level code at line 4: Assign'),
+])
+def test_validate_code__problems(code, expected):
+    problems = codegen_check.validate_code(code, ['add'])
+
+    assert any(p.startswith(expected) for p in problems), problems
+
+
+@pytest.mark.parametrize("code, expected", [
+    ('import os\n\ndef f():\n    return os.getcwd()\n', 'forbidden imports: os'),
+    ('def f():\n    import subprocess.run\n', 'forbidden imports: subprocess'),
+    ('from urllib.request import urlopen\n', 'forbidden imports: urllib'),
+    ('from . import helper\n', 'forbidden imports: .'),
+])
+def test_validate_code__forbidden_imports(code, expected):
+    assert expected in codegen_check.validate_code(code)
+
+
+def test_validate_code__forbidden_imports_configurable(monkeypatch):
+    monkeypatch.setenv('INPUT_FORBIDDEN-IMPORTS', 'math')
+    forbidden = codegen_check.get_forbidden_imports_from_env()
+
+    assert codegen_check.validate_code('import os\n', forbidden_imports=forbidden) == []
+    assert codegen_check.validate_code(VALID_CODE, forbidden_imports=forbidden) == ['forbidden imports: math']
+
+
+@pytest.mark.parametrize("code, expected", [
+    ('def f():\n    return 1\n', None),
+    ('import not_a_real_module_xyz\n', "ModuleNotFoundError: No module named 'not_a_real_module_xyz'"),
+    ('class A:\n    x = 1 / 0\n', 'ZeroDivisionError: division by zero'),
+])
+def test_smoke_import(code, expected):
+    assert codegen_check.smoke_import(code) == expected
+
+
+def test_smoke_import__time_limit():
+    assert codegen_check.smoke_import('class A:\n    while True:\n        pass\n', timeout_sec=1) \
+        == 'import did not finish within 1s'
+
+
+def test_check_code__smoke_only_after_static_checks(monkeypatch):
+    smoke = unittest.mock.Mock(return_value='boom')
+    monkeypatch.setattr(codegen_check, 'smoke_import', smoke)
+
+    assert codegen_check.check_code('print(1)\n', smoke=True) == ['module-level code at line 1: Expr']
+    smoke.assert_not_called()
+    assert codegen_check.check_code('def f():\n    pass\n', smoke=True) == ['import failed: boom']
+
+
+def test_get_required_names_from_env(monkeypatch):
+    monkeypatch.setenv('INPUT_REQUIRED-FUNCTIONS', ' add, sub ,,')
+    assert codegen_check.get_required_names_from_env() == ['add', 'sub']
+
+    monkeypatch.delenv('INPUT_REQUIRED-FUNCTIONS')
+    assert codegen_check.get_required_names_from_env() == []
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_codegen_check.py
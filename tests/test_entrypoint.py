@@ -261,6 +261,131 @@ class TestWriteTokenUsage:
         assert data["input_tokens"] is None
 
 
+
+class TestApiKeyLists:
+    """Tests for comma-separated keys and rate limit header parsing."""
+
+    def test_split_api_keys(self):
+        assert llm_utils.split_api_keys(' k1, k2,,k1 ,k3 ') == ['k1', 'k2', 'k3']
+        assert llm_utils.split_api_keys('') == []
+
+    def test_get_model_key_from_env_keeps_key_list(self, monkeypatch):
+        monkeypatch.delenv('INPUT_API-KEY', raising=False)
+        monkeypatch.setenv('INPUT_MODEL', '')
+        for var in ('INPUT_CLAUDE_API_KEY', 'INPUT_GROK-API-KEY', 'INPUT_NVIDIA-API-KEY', 'INPUT_PERPLEXITY-API-KEY'):
+            monkeypatch.delenv(var, raising=False)
+        monkeypatch.setenv('INPUT_GEMINI-API-KEY', 'k1,k2')
+
+        assert llm_utils.get_model_key_from_env() == ('gemini', 'k1,k2')
+
+    def test_create_client_pools_key_list(self):
+        client = llm_utils.create_client('gemini-2.5-flash', 'pool_k1,pool_k2')
+
+        assert client.config.api_key == 'pool_k1'
+        assert [state.api_key for state in client.key_pool.keys] == ['pool_k1', 'pool_k2']
+        assert llm_utils.create_client('gemini-2.5-flash', 'pool_k1,pool_k2').key_pool is client.key_pool
+        assert llm_utils.create_client('gemini-2.5-flash', 'pool_k1').key_pool is None
+
+    def test_create_client_gzip_request_from_env(self, monkeypatch):
+        monkeypatch.setenv('INPUT_GZIP-REQUEST', 'True')
+        assert llm_utils.create_client('gemini-2.5-flash', 'k').gzip_request is True
+        assert llm_utils.create_client('gemini-2.5-flash', 'k', gzip_request=False).gzip_request is False
+
+        monkeypatch.delenv('INPUT_GZIP-REQUEST')
+        assert llm_utils.create_client('gemini-2.5-flash', 'k').gzip_request is False
+
+    def test_parse_rate_limit_headers__openai_like(self):
+        limits = llm_utils.parse_rate_limit_headers({
+            'X-RateLimit-Limit-Requests': '60', 'X-RateLimit-Remaining-Requests': '15',
+            'x-ratelimit-limit-tokens': '1000', 'x-ratelimit-remaining-tokens': '900',
+            'x-ratelimit-reset-requests': '1m30s', 'x-ratelimit-reset-tokens': '250ms',
+        })
+
+        assert limits == {
+            'limit_requests': 60.0, 'remaining_requests': 15.0,
+            'limit_tokens': 1000.0, 'remaining_tokens': 900.0,
+            'reset_sec': 90.0, 'retry_after_sec': None,
+        }
+
+    def test_parse_rate_limit_headers__claude_and_retry_after(self):
+        limits = llm_utils.parse_rate_limit_headers({
+            'anthropic-ratelimit-requests-limit': '50', 'anthropic-ratelimit-requests-remaining': '0',
+            'anthropic-ratelimit-requests-reset': '2000-01-01T00:00:00Z', 'retry-after': '7',
+        })
+
+        assert (limits['limit_requests'], limits['remaining_requests']) == (50.0, 0.0)
+        assert limits['reset_sec'] == 0.0  # already passed
+        assert limits['retry_after_sec'] == 7.0
+
+    def test_parse_rate_limit_headers__none(self):
+        assert set(llm_utils.parse_rate_limit_headers({'content-type': 'application/json'}).values()) == {None}
+
+    @pytest.mark.parametrize('value, expected', [
+        ('12', 12.0), ('1.5s', 1.5), ('6m0s', 360.0), ('20ms', 0.02), ('1h2m', 3720.0), ('soon', None),
+    ])
+    def test_parse_duration_sec(self, value, expected):
+        assert llm_utils.parse_duration_sec(value) == expected
+
+
+class TestWriteFeedbackSections:
+    """Tests for write_feedback_sections file output."""
+
+    def test_writes_one_file_per_language(self, tmp_path):
+        sections = {"Korean": "한국어", "Bahasa Indonesia": "Bahasa"}
+        entrypoint.write_feedback_sections(sections, tmp_path / "out")
+
+        assert (tmp_path / "out" / "feedback_Korean.md").read_text(encoding="utf-8") == "한국어"
+        assert (tmp_path / "out" / "feedback_Bahasa_Indonesia.md").read_text(encoding="utf-8") == "Bahasa"
+
+
+class TestWarmup:
+    """Tests that the connection warmup starts before the prompt is built, and only if the API is called."""
+
+    @pytest.fixture
+    def tutor_env(self, monkeypatch, tmp_path):
+        test_folder = pathlib.Path(__file__).parent
+        monkeypatch.setenv('INPUT_REPORT-FILES', str(test_folder / 'sample_report.json'))
+        monkeypatch.setenv('INPUT_STUDENT-FILES', str(test_folder / 'sample_code.py'))
+        monkeypatch.setenv('INPUT_README-PATH', str(test_folder / 'sample_readme.md'))
+        monkeypatch.setenv('INPUT_EXPLANATION-IN', 'English')
+        monkeypatch.setenv('INPUT_GEMINI-API-KEY', 'test-key')
+        monkeypatch.setenv('INPUT_OUTPUT-DIR', str(tmp_path))
+        monkeypatch.delenv('GITHUB_STEP_SUMMARY', raising=False)
+
+    @pytest.mark.parametrize('value, expected', [(None, ['warmup', 'engineering', 'call_api']),
+                                                 ('false', ['engineering', 'call_api'])])
+    def test_main_warms_up_first(self, tutor_env, monkeypatch, value, expected):
+        if value is not None:
+            monkeypatch.setenv('INPUT_WARMUP', value)
+        else:
+            monkeypatch.delenv('INPUT_WARMUP', raising=False)
+        order = self.record_order(monkeypatch)
+
+        entrypoint.main()
+
+        assert order == expected
+
+    def test_no_warmup_on_cache_hit(self, tutor_env, monkeypatch):
+        monkeypatch.delenv('INPUT_WARMUP', raising=False)
+        order = self.record_order(monkeypatch)
+        entrypoint.main()  # fills the feedback cache in the output directory
+        order.clear()
+
+        entrypoint.main()
+
+        assert order == ['engineering']
+
+    @staticmethod
+    def record_order(monkeypatch) -> list:
+        order = []
+        engineering = entrypoint.prompt.engineering
+        monkeypatch.setattr('llm_client.LLMAPIClient.warmup', lambda self: order.append('warmup'))
+        monkeypatch.setattr('llm_client.LLMAPIClient.call_api', lambda self, q: order.append('call_api') or 'ok')
+        monkeypatch.setattr(entrypoint.prompt, 'engineering',
+                            lambda *args, **kwargs: order.append('engineering') or engineering(*args, **kwargs))
+        return order
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
 
@@ -0,0 +1,171 @@
+# begin tests/test_feedback_cache.py
+import json
+import pathlib
+import sys
+import unittest.mock
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import entrypoint
+import feedback_cache
+
+
+@pytest.fixture
+def report_path() -> pathlib.Path:
+    return test_folder / 'sample_report.json'
+
+
+@pytest.fixture
+def student_file(tmp_path: pathlib.Path) -> pathlib.Path:
+    path = tmp_path / 'exercise.py'
+    path.write_text('def add(a, b):\n    return a + b\n')
+    return path
+
+
+@pytest.fixture(autouse=True)
+def readme_file(tmp_path: pathlib.Path) -> pathlib.Path:
+    # next to student_file, where fingerprint() looks for it
+    path = tmp_path / 'README.md'
+    path.write_text('# Add\n\nWrite add(a, b).\n')
+    return path
+
+
+def fingerprint(report_path: pathlib.Path, student_file: pathlib.Path, languages=('English',), model='gemini') -> str:
+    readme_file = student_file.with_name('README.md')
+    return feedback_cache.compute_fingerprint((report_path,), (student_file,), readme_file, languages, model)
+
+
+def test_fingerprint__stable(report_path, student_file):
+    assert fingerprint(report_path, student_file) == fingerprint(report_path, student_file)
+
+
+def test_fingerprint__ignores_python_comments_and_blank_lines(report_path, student_file):
+    before = fingerprint(report_path, student_file)
+    student_file.write_text('# add two numbers\n\ndef add(a, b):  # sum\n\n    return a + b\n')
+
+    assert fingerprint(report_path, student_file) == before
+
+
+def test_fingerprint__code_change(report_path, student_file):
+    before = fingerprint(report_path, student_file)
+    student_file.write_text('def add(a, b):\n    return a - b\n')
+
+    assert fingerprint(report_path, student_file) != before
+
+
+@pytest.mark.parametrize("languages, model", [
+    (('Korean',), 'gemini'),
+    (('English', 'Korean'), 'gemini'),
+    (('English',), 'claude'),
+])
+def test_fingerprint__languages_and_model(report_path, student_file, languages, model):
+    assert fingerprint(report_path, student_file, languages, model) != fingerprint(report_path, student_file)
+
+
+def test_fingerprint__readme_change(report_path, student_file, readme_file):
+    before = fingerprint(report_path, student_file)
+    readme_file.write_text('# Add\n\n\nWrite add(a, b).  \n')
+    assert fingerprint(report_path, student_file) == before
+
+    readme_file.write_text('# Add\n\nWrite add(a, b, c).\n')
+    assert fingerprint(report_path, student_file) != before
+
+
+def test_fingerprint__failure_change(tmp_path, student_file):
+    report = {"tests": [{"nodeid": "t::a", "outcome": "failed",
+                         "call": {"longrepr": "t.py:10: AssertionError: 1 != 2"}}]}
+    report_path = tmp_path / 'report.json'
+    report_path.write_text(json.dumps(report))
+    before = fingerprint(report_path, student_file)
+
+    # moved by a comment edit: same failure at another line
+    report["tests"][0]["call"]["longrepr"] = "t.py:12: AssertionError: 1 != 2"
+    report_path.write_text(json.dumps(report))
+    assert fingerprint(report_path, student_file) == before
+
+    report["tests"][0]["call"]["longrepr"] = "t.py:12: AssertionError: 1 != 3"
+    report_path.write_text(json.dumps(report))
+    assert fingerprint(report_path, student_file) != before
+
+
+def test_normalize_c_source():
+    code = (
+        '/* header */\n'
+        'int main() { // entry\n'
+        '    printf("http://x // y /* z */");\n'
+        '}\n'
+    )
+    result = feedback_cache.normalize_c_source(code)
+
+    assert 'header' not in result
+    assert 'entry' not in result
+    assert '"http://x // y /* z */"' in result
+
+
+def test_load_cached_feedback__roundtrip(tmp_path):
+    feedback_cache.save_feedback(tmp_path, 'abc', 'Nice work', 'gemini')
+
+    entry = feedback_cache.load_cached_feedback(tmp_path, 'abc')
+    assert entry['feedback'] == 'Nice work'
+    assert entry['model'] == 'gemini'
+    assert feedback_cache.load_cached_feedback(tmp_path, 'other') is None
+
+
+def test_load_cached_feedback__missing_or_corrupt(tmp_path):
+    assert feedback_cache.load_cached_feedback(tmp_path, 'abc') is None
+    (tmp_path / feedback_cache.CACHE_FILENAME).write_text('{not json')
+    assert feedback_cache.load_cached_feedback(tmp_path, 'abc') is None
+
+
+@pytest.fixture
+def tutor_env(monkeypatch, tmp_path, report_path, student_file) -> pathlib.Path:
+    summary = tmp_path / 'summary.md'
+    monkeypatch.setenv('INPUT_REPORT-FILES', str(report_path))
+    monkeypatch.setenv('INPUT_STUDENT-FILES', str(student_file))
+    monkeypatch.setenv('INPUT_README-PATH', str(test_folder / 'sample_readme.md'))
+    monkeypatch.setenv('INPUT_EXPLANATION-IN', 'English')
+    monkeypatch.setenv('INPUT_GEMINI-API-KEY', 'test-key')
+    monkeypatch.setenv('INPUT_CACHE-DIR', str(tmp_path / 'cache'))
+    monkeypatch.setenv('INPUT_OUTPUT-DIR', str(tmp_path / 'output'))
+    monkeypatch.setenv('GITHUB_STEP_SUMMARY', str(summary))
+    return summary
+
+
+@unittest.mock.patch('llm_client.LLMAPIClient.call_api', return_value='Check the sign.')
+def test_main__reuses_feedback(mock_call_api, tutor_env, student_file):
+    entrypoint.main()
+    assert mock_call_api.call_count == 1
+
+    # comment-only commit
+    student_file.write_text('def add(a, b):\n    # fixed?\n    return a + b\n')
+    tutor_env.write_text('')
+    entrypoint.main()
+
+    assert mock_call_api.call_count == 1
+    summary = tutor_env.read_text(encoding='utf-8')
+    assert 'Reused feedback' in summary
+    assert 'Check the sign.' in summary
+    usage = json.loads((tutor_env.parent / 'output' / 'token_usage.json').read_text())
+    assert usage['reused'] is True
+
+
+@unittest.mock.patch('llm_client.LLMAPIClient.call_api', return_value='Check the sign.')
+def test_main__calls_again_after_code_change(mock_call_api, tutor_env, student_file):
+    entrypoint.main()
+    student_file.write_text('def add(a, b):\n    return b + a\n')
+    entrypoint.main()
+
+    assert mock_call_api.call_count == 2
+    assert 'Reused feedback' not in tutor_env.read_text(encoding='utf-8')
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_feedback_cache.py
@@ -0,0 +1,71 @@
+# begin tests/test_import_time.py
+"""Cold-start budget for the tutor entry points.
+
+Runs ``python -X importtime`` in a fresh interpreter and parses its report.
+Short runs (all tests passed, cached feedback) spend most of their wall time
+importing, so heavy dependencies such as ``requests`` must stay deferred to
+the first API call.
+
+Set IMPORT_TIME_BUDGET_US to tighten or relax the budget on slow runners.
+"""
+import os
+import pathlib
+import re
+import subprocess
+import sys
+from typing import Dict, Tuple
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+
+
+IMPORT_TIME_BUDGET_US = int(os.getenv('IMPORT_TIME_BUDGET_US', '60000'))
+DEFERRED_MODULES = ('requests', 'urllib3')
+
+_IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s(\s*)(\S+)\s*$')
+
+
+def import_times(module: str) -> Dict[str, Tuple[int, int]]:
+    """Return {module name: (self us, cumulative us)} for a cold ``import module``."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=project_folder,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            times[name] = (int(self_us), int(cumulative_us))
+    return times
+
+
+@pytest.mark.parametrize("module", ("entrypoint", "prompt_pipeline.entrypoint"))
+def test_heavy_imports_deferred(module: str):
+    times = import_times(module)
+
+    assert module in times, f"{module} missing from importtime report"
+    imported = [name for name in DEFERRED_MODULES if name in times]
+    assert not imported, f"Importing {module} should not import {imported}"
+
+
+def test_entrypoint_import_budget():
+    # best of three, to ignore a cold disk cache or a busy runner
+    cumulative_us = min(import_times('entrypoint')['entrypoint'][1] for _ in range(3))
+
+    assert cumulative_us <= IMPORT_TIME_BUDGET_US, (
+        f"Importing entrypoint took {cumulative_us} us, over the {IMPORT_TIME_BUDGET_US} us budget"
+    )
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_import_time.py
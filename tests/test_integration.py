@@ -74,6 +74,7 @@ def test_main_argument_passing__all_exists(mock_get_prompt, caplog, tmp_path) ->
         expected_student_file_paths,
         expected_readme_path,
         test_explain_in,
+        test_model,
     )
 
     assert 'does not exist' not in caplog.text
@@ -0,0 +1,189 @@
+# begin tests/test_key_pool.py
+import pathlib
+import sys
+from typing import Dict, Optional
+from unittest.mock import Mock, patch
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import key_pool
+import metrics
+from llm_client import LLMAPIClient
+from llm_configs import GeminiConfig
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.REGISTRY.reset()
+    yield
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def event(status_code: Optional[int] = 200, headers: Dict[str, str] = None, raw_response: dict = None) -> dict:
+    return {
+        'provider': 'gemini', 'status_code': status_code, 'headers': headers or {},
+        'raw_response': raw_response, 'error': None,
+    }
+
+
+def test_key_id_is_short_and_stable():
+    assert key_pool.key_id('secret') == key_pool.key_id(' secret ')
+    assert len(key_pool.key_id('secret')) == 8
+    assert 'secret' not in key_pool.key_id('secret')
+
+
+def test_pool_requires_a_key():
+    with pytest.raises(ValueError):
+        key_pool.KeyPool([' ', ''])
+
+
+def test_acquire__round_robin_with_equal_weights():
+    pool = key_pool.KeyPool(['a', 'b', 'c', 'a'])
+
+    assert [pool.acquire() for _ in range(6)] == ['a', 'b', 'c', 'a', 'b', 'c']
+
+
+def test_acquire__weighted_by_remaining_quota():
+    pool = key_pool.KeyPool(['a', 'b'])
+    pool.observe('b', event(headers={'x-ratelimit-limit-requests': '100', 'x-ratelimit-remaining-requests': '25'}))
+
+    picks = [pool.acquire() for _ in range(10)]
+
+    assert picks.count('a') == 8
+    assert picks.count('b') == 2
+    assert pool.usage()[key_pool.key_id('b')]['weight'] == 0.25
+
+
+def test_observe__429_penalty_box():
+    clock = Clock()
+    pool = key_pool.KeyPool(['a', 'b'], penalty_sec=10, max_penalty_sec=15, clock=clock)
+
+    pool.observe('a', event(429))
+    assert pool.available() == 1
+    assert [pool.acquire() for _ in range(3)] == ['b', 'b', 'b']
+
+    clock.now += 10
+    assert pool.available() == 2
+
+    # Consecutive 429s double the penalty up to the cap
+    pool.observe('a', event(429))
+    clock.now += 14.9
+    assert pool.available() == 1
+    clock.now += 0.2
+    assert pool.available() == 2
+
+
+def test_observe__retry_after_sets_penalty():
+    clock = Clock()
+    pool = key_pool.KeyPool(['a', 'b'], clock=clock)
+
+    pool.observe('a', event(429, headers={'retry-after': '3'}))
+
+    assert pool.usage()[key_pool.key_id('a')]['penalty_sec'] == 3.0
+
+
+def test_observe__exhausted_quota_rests_until_reset():
+    clock = Clock()
+    pool = key_pool.KeyPool(['a', 'b'], clock=clock)
+
+    pool.observe('a', event(200, headers={
+        'x-ratelimit-limit-requests': '10', 'x-ratelimit-remaining-requests': '0', 'x-ratelimit-reset-requests': '20s',
+    }))
+
+    assert pool.available() == 1
+    clock.now += 20
+    assert pool.available() == 2
+
+
+def test_acquire__all_penalized_returns_soonest():
+    clock = Clock()
+    pool = key_pool.KeyPool(['a', 'b'], clock=clock)
+    pool.observe('a', event(429, headers={'retry-after': '30'}))
+    pool.observe('b', event(429, headers={'retry-after': '5'}))
+
+    assert pool.available() == 0
+    assert pool.acquire() == 'b'
+
+
+def test_observe__per_key_usage():
+    pool = key_pool.KeyPool(['a', 'b'])
+    usage_response = {'usageMetadata': {'promptTokenCount': 10, 'candidatesTokenCount': 4}}
+
+    pool.observe('a', event(200, raw_response=usage_response))
+    pool.observe('a', event(429))
+    pool.observe('b', event(500))
+    pool.observe('unknown', event(200))
+
+    usage = pool.usage()
+    assert usage[key_pool.key_id('a')] == {
+        'requests': 2, 'rate_limited': 1, 'errors': 0, 'input_tokens': 10, 'output_tokens': 4,
+        'weight': 1.0, 'penalty_sec': key_pool.DEFAULT_PENALTY_SEC,
+    }
+    assert usage[key_pool.key_id('b')]['errors'] == 1
+    assert key_pool.key_requests.get(provider='gemini', key=key_pool.key_id('a'), status=429) == 1
+
+
+def ok_response() -> Mock:
+    response = Mock(status_code=200, headers={})
+    response.json.return_value = {'candidates': [{'content': {'parts': [{'text': 'ok'}]}}]}
+    return response
+
+
+def test_client_rotates_keys_per_call():
+    session = Mock()
+    session.post.return_value = ok_response()
+    config = GeminiConfig(api_key='key_a')
+    client = LLMAPIClient(config, session=session, key_pool=key_pool.KeyPool(['key_a', 'key_b']))
+    events = []
+    client.observers.append(events.append)
+
+    for _ in range(4):
+        assert client.call_api('q') == 'ok'
+
+    urls = [call.args[0] for call in session.post.call_args_list]
+    assert [url.rsplit('key=', 1)[1] for url in urls] == ['key_a', 'key_b', 'key_a', 'key_b']
+    assert [e['key_id'] for e in events[:2]] == [key_pool.key_id('key_a'), key_pool.key_id('key_b')]
+
+
+@patch('llm_client.time.sleep')
+def test_client_429_switches_key_without_backoff(mock_sleep: Mock):
+    session = Mock()
+    session.post.side_effect = [Mock(status_code=429, headers={}), ok_response()]
+    pool = key_pool.KeyPool(['key_a', 'key_b'])
+    client = LLMAPIClient(GeminiConfig(api_key='key_a'), session=session, key_pool=pool)
+
+    assert client.call_api('q') == 'ok'
+
+    urls = [call.args[0] for call in session.post.call_args_list]
+    assert [url.rsplit('key=', 1)[1] for url in urls] == ['key_a', 'key_b']
+    mock_sleep.assert_not_called()
+    assert pool.usage()[key_pool.key_id('key_a')]['rate_limited'] == 1
+
+
+@patch('llm_client.time.sleep')
+def test_client_429_backs_off_when_every_key_is_benched(mock_sleep: Mock):
+    session = Mock()
+    session.post.side_effect = [Mock(status_code=429, headers={}), ok_response()]
+    client = LLMAPIClient(GeminiConfig(api_key='key_a'), session=session, key_pool=key_pool.KeyPool(['key_a']))
+
+    assert client.call_api('q') == 'ok'
+    mock_sleep.assert_called_once()
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_key_pool.py
@@ -1,7 +1,11 @@
 # begin tests/test_llm_client.py
+import gzip
+import http.server
+import json
 import logging
 import pathlib
 import sys
+import threading
 from unittest.mock import Mock, patch
 
 import pytest
@@ -14,8 +18,10 @@ project_folder = test_folder.parent.resolve()
 sys.path.insert(0, str(project_folder))
 
 
-from llm_client import LLMAPIClient
-from llm_configs import LLMConfig
+import llm_client
+import metrics
+from llm_client import LLMAPIClient, iter_sse_events, response_body_sizes
+from llm_configs import GeminiConfig, GrokConfig, LLMConfig
 
 
 # Fixtures
@@ -244,6 +250,291 @@ def test_call_api_empty_question(mock_post: Mock, client: LLMAPIClient):
         timeout=client.timeout_sec
     )
 
+@patch("llm_client.requests.post")
+def test_call_api_uses_session(mock_post: Mock, mock_config: LLMConfig, sample_question: str):
+    """Test that a client with a session reuses it instead of module-level requests.post."""
+    session = Mock()
+    mock_response = Mock(status_code=200)
+    mock_response.json.return_value = {"answer": "4"}
+    session.post.return_value = mock_response
+    client = LLMAPIClient(mock_config, retry_delay_sec=0.1, max_retry_attempt=2, timeout_sec=1, session=session)
+
+    assert client.call_api(sample_question) == "4"
+    session.post.assert_called_once()
+    mock_post.assert_not_called()
+
+
+@patch("llm_client.requests.post")
+def test_call_api_notifies_observers(mock_post: Mock, client: LLMAPIClient, sample_question: str):
+    """Test that observers see each attempt with status, latency, headers and raw response."""
+    mock_response_429 = Mock(status_code=429, headers={"Retry-After": "1"})
+    mock_response_200 = Mock(status_code=200, headers={})
+    mock_response_200.json.return_value = {"answer": "4"}
+    mock_post.side_effect = [mock_response_429, mock_response_200]
+    events = []
+    client.observers.append(events.append)
+
+    assert client.call_api(sample_question) == "4"
+
+    assert [e["status_code"] for e in events] == [429, 200]
+    assert [e["attempt"] for e in events] == [0, 1]
+    assert events[0]["headers"] == {"retry-after": "1"}
+    assert events[1]["raw_response"] == {"answer": "4"}
+    assert all(e["latency_sec"] >= 0 for e in events)
+
+
+@patch("llm_client.requests.post")
+def test_call_api_observer_failure_is_contained(mock_post: Mock, client: LLMAPIClient, sample_question: str):
+    """Test that a failing observer does not affect the call."""
+    mock_response = Mock(status_code=200)
+    mock_response.json.return_value = {"answer": "4"}
+    mock_post.return_value = mock_response
+    client.observers.append(Mock(side_effect=RuntimeError("observer bug")))
+
+    assert client.call_api(sample_question) == "4"
+    client.logger.exception.assert_called_once()
+
+
+
+def test_iter_sse_events():
+    """Test decoding of data lines, multi-line payloads, comments and the [DONE] sentinel."""
+    lines = [
+        b': keep-alive',
+        b'event: message',
+        b'data: {"a": 1}',
+        b'',
+        'data: {"b":',
+        'data: 2}\r',
+        '',
+        'data: not json',
+        '',
+        'data: [DONE]',
+        'data: {"c": 3}',
+    ]
+    assert list(iter_sse_events(lines)) == [{"a": 1}, {"b": 2}]
+
+
+@pytest.fixture
+def stream_config(mock_config: LLMConfig) -> LLMConfig:
+    mock_config.get_stream_url.return_value = "http://mock.api/v1/stream"
+    mock_config.format_stream_request_data.side_effect = lambda q: {"question": q}
+    mock_config.merge_stream_usage.side_effect = lambda usage, e: e if e.get("usage") else usage
+    mock_config.parse_stream_event.side_effect = lambda e: e.get("text", "")
+    return mock_config
+
+
+def test_stream_api_yields_text(stream_config: LLMConfig, sample_question: str):
+    """Test that stream_api posts with stream=True and yields text deltas."""
+    response = Mock(status_code=200)
+    response.iter_lines.return_value = [b'data: {"text": "2 + "}', b'', b'data: {"text": "2"}', b'',
+                                        b'data: {"usage": {"total_tokens": 9}}', b'']
+    session = Mock()
+    session.post.return_value = response
+    client = LLMAPIClient(stream_config, session=session)
+    events = []
+    client.observers.append(events.append)
+
+    assert list(client.stream_api(sample_question)) == ["2 + ", "2"]
+
+    _, kwargs = session.post.call_args
+    assert kwargs["stream"] is True
+    assert kwargs["json"] == {"question": sample_question}
+    response.close.assert_called_once()
+    assert client.last_raw_response == {"usage": {"total_tokens": 9}}
+    assert events[0]["status_code"] == 200
+
+
+def test_stream_api_early_close_closes_connection(stream_config: LLMConfig, sample_question: str):
+    """Test that closing the generator early closes the HTTP response."""
+    response = Mock(status_code=200)
+    response.iter_lines.return_value = iter([b'data: {"text": "a"}', b'', b'data: {"text": "b"}', b''])
+    session = Mock()
+    session.post.return_value = response
+    client = LLMAPIClient(stream_config, session=session)
+
+    chunks = client.stream_api(sample_question)
+    assert next(chunks) == "a"
+    chunks.close()
+
+    response.close.assert_called_once()
+
+
+@pytest.mark.parametrize("status_code", [429, 500])
+def test_stream_api_error_yields_nothing(stream_config: LLMConfig, sample_question: str, status_code: int):
+    """Test that a failed streaming request yields nothing so callers can fall back."""
+    session = Mock()
+    session.post.return_value = Mock(status_code=status_code, text="error")
+    client = LLMAPIClient(stream_config, session=session)
+
+    assert list(client.stream_api(sample_question)) == []
+    session.post.assert_called_once()
+
+
+def ok_gemini_response() -> Mock:
+    response = Mock(status_code=200, headers={})
+    response.json.return_value = {"candidates": [{"content": {"parts": [{"text": "ok"}]}}]}
+    return response
+
+
+def test_gzip_request_compresses_large_bodies():
+    """Test that a large body goes gzip-encoded with its header and sizes in the event."""
+    session = Mock()
+    session.post.return_value = ok_gemini_response()
+    client = LLMAPIClient(GeminiConfig(api_key="test_key"), session=session, gzip_request=True)
+    events = []
+    client.observers.append(events.append)
+    question = "assert add(1, 2) == 3\n" * 500
+
+    assert client.call_api(question) == "ok"
+
+    _, kwargs = session.post.call_args
+    assert "json" not in kwargs
+    assert kwargs["headers"]["Content-Encoding"] == "gzip"
+    assert kwargs["headers"]["Content-Type"] == "application/json"
+    raw = gzip.decompress(kwargs["data"])
+    assert json.loads(raw) == GeminiConfig(api_key="test_key").format_request_data(question)
+    assert events[0]["request_bytes"] == (len(raw), len(kwargs["data"]))
+    assert len(kwargs["data"]) < len(raw) / 10
+
+
+@pytest.mark.parametrize("config, gzip_request, question", [
+    (GeminiConfig(api_key="test_key"), False, "x" * 5000),         # off
+    (GeminiConfig(api_key="test_key"), True, "short"),             # below GZIP_MIN_BYTES
+    (GrokConfig(api_key="test_key"), True, "x" * 5000),            # provider not known to accept it
+])
+def test_gzip_request_keeps_json_otherwise(config: LLMConfig, gzip_request: bool, question: str):
+    session = Mock()
+    session.post.return_value = Mock(status_code=500, text="error", headers={})
+    client = LLMAPIClient(config, session=session, gzip_request=gzip_request)
+
+    client.call_api(question)
+
+    _, kwargs = session.post.call_args
+    assert kwargs["json"] == config.format_request_data(question)
+    assert "Content-Encoding" not in kwargs["headers"]
+
+
+def test_response_body_sizes():
+    compressed = Mock(headers={"Content-Encoding": "gzip", "Content-Length": "40"}, content=b"x" * 100)
+    assert response_body_sizes(compressed) == (100, 40)
+    assert response_body_sizes(compressed, streamed=True) is None
+    assert response_body_sizes(Mock(headers={}, content=b"x")) is None
+    assert response_body_sizes(Mock(headers={"Content-Encoding": "gzip"}, content=b"x")) is None
+    assert response_body_sizes(None) is None
+
+
+class GzipEchoHandler(http.server.BaseHTTPRequestHandler):
+    """Decodes a gzip request and answers with a gzip-encoded Gemini response repeating its size."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        text = f"received {len(json.loads(body)['contents'][0]['parts'][0]['text'])} chars"
+        reply = {"candidates": [{"content": {"parts": [{"text": text}]}}], "modelVersion": "test " * 500}
+        reply = gzip.compress(json.dumps(reply).encode())
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_gzip_round_trip_over_http():
+    """Test a compressed request and a compressed response against a real HTTP server."""
+    metrics.REGISTRY.reset()
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), GzipEchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        config = GeminiConfig(api_key="test_key", api_url=f"http://127.0.0.1:{server.server_port}/")
+        client = LLMAPIClient(config, gzip_request=True, session=llm_client.requests.Session())
+        events = []
+        client.observers.append(events.append)
+
+        assert client.call_api("y" * 20000) == "received 20000 chars"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    decoded, wire = events[0]["response_bytes"]
+    assert decoded > wire
+    labels = {"provider": "gemini", "model": config.model}
+    assert metrics.llm_body_bytes.get(**labels, direction="request", stage="wire") < 1000
+    assert metrics.llm_body_bytes.get(**labels, direction="request", stage="decoded") > 20000
+
+
+class ConnectionLogHandler(http.server.BaseHTTPRequestHandler):
+    """Answers HEAD and POST on keep-alive connections, logging each request's client port."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self.server.log.append(('HEAD', self.path, self.client_address[1]))
+        self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.server.log.append(('POST', self.path.split('?')[0], self.client_address[1]))
+        reply = json.dumps({"candidates": [{"content": {"parts": [{"text": "warm"}]}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_warmup_connection_is_reused_by_first_call():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ConnectionLogHandler)
+    server.log = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        config = GeminiConfig(api_key="secret", api_url=f"http://127.0.0.1:{server.server_port}/v1/m:generateContent?key=secret")
+        client = LLMAPIClient(config)
+
+        thread = client.warmup()
+        assert thread is not None and thread.daemon
+        assert client.warmup() is None  # once per client
+        assert client.call_api("question") == "warm"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    (head, head_path, head_port), (post, post_path, post_port) = server.log
+    assert (head, head_path, post, post_path) == ('HEAD', '/', 'POST', '/v1/m:generateContent')
+    assert head_port == post_port  # one connection: the handshake was paid during warmup
+    assert client.session is not None
+
+
+def test_warmup_failure_is_harmless():
+    session = Mock()
+    session.head.side_effect = llm_client.requests.ConnectionError("unreachable")
+    session.post.return_value = ok_gemini_response()
+    client = LLMAPIClient(GeminiConfig(api_key="test_key"), session=session)
+
+    client.warmup().join()
+
+    assert client.call_api("question") == "ok"
+    url = session.head.call_args[0][0]
+    assert url == "https://generativelanguage.googleapis.com/" and "test_key" not in url
+
+
+def test_warmup_skips_sessions_without_pooling():
+    client = LLMAPIClient(GeminiConfig(api_key="test_key"), session=Mock(spec=['post']))
+
+    assert client.warmup() is None
+
+
 if __name__ == "__main__":
     pytest.main(["--verbose", __file__])
 # end tests/test_llm_client.py
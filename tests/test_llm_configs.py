@@ -11,7 +11,8 @@ test_folder = pathlib.Path(__file__).parent.resolve()
 project_folder = test_folder.parent.resolve()
 sys.path.insert(0, str(project_folder))
 
-from llm_configs import LLMConfig, GeminiConfig, GrokConfig, NvidiaNIMConfig
+from llm_configs import LLMConfig, ClaudeConfig, GeminiConfig, GrokConfig, NvidiaNIMConfig, PerplexityConfig
+from llm_utils import extract_token_usage
 
 
 # Type hint
@@ -126,6 +127,101 @@ def test__model_in_data__format_request_data(model_in_data_config: Tuple[LLMConf
     assert data["model"] == expected_model
     assert data["messages"][0]["content"] == sample_question
 
+
+def test_gemini_stream_url(sample_api_key: str):
+    """Test that Gemini streams from streamGenerateContent as server-sent events."""
+    config = GeminiConfig(api_key=sample_api_key)
+    assert config.get_stream_url() == (
+        "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash"
+        f":streamGenerateContent?alt=sse&key={sample_api_key}"
+    )
+
+
+def test_gemini_format_stream_request_data_keeps_generation_config(sample_api_key: str, sample_question: str):
+    """Test that an overridden generationConfig carries over to the streamed request."""
+    config = GeminiConfig(api_key=sample_api_key)
+    original = config.format_request_data
+    config.format_request_data = lambda q: {**original(q), 'generationConfig': {'temperature': 0}}
+
+    data = config.format_stream_request_data(sample_question)
+
+    assert data['generationConfig'] == {'temperature': 0}
+    assert 'stream' not in data
+
+
+@pytest.mark.parametrize("config_class, asks_for_usage", [
+    (GrokConfig, True),
+    (NvidiaNIMConfig, True),
+    (ClaudeConfig, False),
+    (PerplexityConfig, False),
+])
+def test_format_stream_request_data(config_class: Type[LLMConfig], asks_for_usage: bool, sample_api_key: str,
+                                    sample_question: str):
+    """Test that streaming is enabled and OpenAI-like APIs are asked for usage in the stream."""
+    data = config_class(api_key=sample_api_key).format_stream_request_data(sample_question)
+
+    assert data['stream'] is True
+    assert ('stream_options' in data) == asks_for_usage
+    if asks_for_usage:
+        assert data['stream_options'] == {'include_usage': True}
+
+
+@pytest.mark.parametrize("config_class, events, expected", [
+    (GrokConfig, [{"choices": [{"delta": {"content": "a"}}], "usage": None},
+                  {"choices": [], "usage": {"prompt_tokens": 10, "completion_tokens": 4}}], (10, 4)),
+    (GeminiConfig, [{"usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 1}},
+                    {"usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 4}}], (10, 4)),
+    (ClaudeConfig, [{"type": "message_start", "message": {"usage": {"input_tokens": 10, "output_tokens": 1}}},
+                    {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "a"}},
+                    {"type": "message_delta", "delta": {}, "usage": {"output_tokens": 4}},
+                    {"type": "message_stop"}], (10, 4)),
+    (GrokConfig, [{"choices": [{"delta": {"content": "a"}}]}], (None, None)),
+])
+def test_merge_stream_usage(config_class: Type[LLMConfig], events: list, expected: Tuple, sample_api_key: str):
+    """Test that the usage of a stream adds up the events that report it."""
+    config = config_class(api_key=sample_api_key)
+    usage = None
+    for event in events:
+        usage = config.merge_stream_usage(usage, event)
+
+    tokens = extract_token_usage(usage)
+    assert (tokens['input_tokens'], tokens['output_tokens']) == expected
+
+
+@pytest.mark.parametrize("config_class, event, expected", [
+    (GrokConfig, {"choices": [{"delta": {"content": "def"}}]}, "def"),
+    (NvidiaNIMConfig, {"choices": [{"delta": {}}], "usage": {"total_tokens": 3}}, ""),
+    (GeminiConfig, {"candidates": [{"content": {"parts": [{"text": "de"}, {"text": "f"}]}}]}, "def"),
+    (ClaudeConfig, {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "def"}}, "def"),
+    (ClaudeConfig, {"type": "message_start", "message": {}}, ""),
+])
+def test_parse_stream_event(config_class: Type[LLMConfig], event: Dict, expected: str, sample_api_key: str):
+    """Test that text deltas are extracted from each provider's stream events."""
+    assert config_class(api_key=sample_api_key).parse_stream_event(event) == expected
+
+
+@pytest.mark.parametrize("config_class", [GeminiConfig, GrokConfig, NvidiaNIMConfig, ClaudeConfig, PerplexityConfig])
+def test_with_api_key(config_class: Type[LLMConfig], sample_api_key: str):
+    """Test that the copy authenticates with the new key only and leaves the original alone."""
+    config = config_class(api_key=sample_api_key)
+
+    clone = config.with_api_key("other_key")
+
+    sent = clone.api_url + repr(clone.get_headers())
+    assert clone.api_key == "other_key"
+    assert "other_key" in sent and sample_api_key not in sent
+    assert sample_api_key in config.api_url + repr(config.get_headers())
+    assert clone.model == config.model
+
+
+def test_with_api_key_keeps_instance_overrides(sample_api_key: str, sample_question: str):
+    """Test that a patched format_request_data survives the copy."""
+    config = GeminiConfig(api_key=sample_api_key)
+    config.format_request_data = lambda question: {"patched": question}
+
+    assert config.with_api_key("other_key").format_request_data(sample_question) == {"patched": sample_question}
+
+
 if __name__ == "__main__":
     pytest.main(["--verbose", __file__])
 
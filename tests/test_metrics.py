@@ -0,0 +1,203 @@
+# begin tests/test_metrics.py
+import pathlib
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import entrypoint  # noqa: E402
+import metrics  # noqa: E402
+import prompt  # noqa: E402
+from llm_client import LLMAPIClient  # noqa: E402
+from llm_configs import GeminiConfig  # noqa: E402
+
+
+GEMINI_RESPONSE = {
+    "candidates": [{"content": {"parts": [{"text": "Looks good."}]}}],
+    "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 5, "totalTokenCount": 15},
+}
+LABELS = {'provider': 'gemini', 'model': 'gemini-2.5-flash'}
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    metrics.REGISTRY.reset()
+    yield
+    metrics.REGISTRY.reset()
+
+
+def response(status_code: int, body=None) -> Mock:
+    result = Mock(status_code=status_code, headers={}, text='error')
+    result.json.return_value = body
+    return result
+
+
+def test_counter_render_and_escaping():
+    registry = metrics.Registry()
+    counter = registry.counter('jobs_total', 'Jobs', ('name',))
+    counter.inc(name='a"b\\c')
+    counter.inc(2, name='plain')
+
+    assert registry.render() == (
+        '# HELP jobs_total Jobs\n'
+        '# TYPE jobs_total counter\n'
+        'jobs_total{name="a\\"b\\\\c"} 1\n'
+        'jobs_total{name="plain"} 2\n'
+    )
+
+
+def test_counter_rejects_bad_use():
+    counter = metrics.Registry().counter('jobs_total', 'Jobs', ('name',))
+
+    with pytest.raises(ValueError):
+        counter.inc(other='x')
+    with pytest.raises(ValueError):
+        counter.inc(-1, name='x')
+
+
+def test_gauge_goes_up_and_down():
+    registry = metrics.Registry()
+    gauge = registry.gauge('queue_depth', 'Queue depth')
+    gauge.inc(3)
+    gauge.dec()
+    assert gauge.get() == 2
+    gauge.set(0)
+
+    assert registry.render() == '# HELP queue_depth Queue depth\n# TYPE queue_depth gauge\nqueue_depth 0\n'
+    with pytest.raises(ValueError):
+        registry.counter('queue_depth', 'Queue depth')
+
+
+def test_histogram_render():
+    registry = metrics.Registry()
+    histogram = registry.histogram('latency_seconds', 'Latency', buckets=(0.5, 1.0))
+    for value in (0.2, 0.5, 0.7, 3.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert lines[2:] == [
+        'latency_seconds_bucket{le="0.5"} 2',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        'latency_seconds_sum 4.4',
+        'latency_seconds_count 4',
+    ]
+
+
+def test_registry_returns_existing_metric():
+    registry = metrics.Registry()
+    counter = registry.counter('x_total', 'X')
+
+    assert registry.counter('x_total', 'X') is counter
+    with pytest.raises(ValueError):
+        registry.histogram('x_total', 'X')
+
+
+def test_observe_attempt():
+    metrics.observe_attempt({**LABELS, 'status_code': 429, 'latency_sec': 0.3, 'raw_response': None, 'error': None})
+    metrics.observe_attempt({**LABELS, 'status_code': None, 'latency_sec': 60, 'raw_response': None, 'error': 'timeout'})
+    metrics.observe_attempt({**LABELS, 'status_code': 200, 'latency_sec': 1.2, 'raw_response': GEMINI_RESPONSE, 'error': None})
+
+    assert metrics.llm_requests.get(**LABELS, status='429') == 1
+    assert metrics.llm_requests.get(**LABELS, status='timeout') == 1
+    assert metrics.llm_requests.get(**LABELS, status='200') == 1
+    assert metrics.llm_rate_limited.get(**LABELS) == 1
+    assert metrics.llm_latency.count(**LABELS) == 3
+    assert metrics.llm_tokens.get(**LABELS, direction='input') == 10
+    assert metrics.llm_tokens.get(**LABELS, direction='output') == 5
+
+
+def test_observe_attempt_counts_body_bytes():
+    metrics.observe_attempt({**LABELS, 'status_code': 200, 'latency_sec': 0.1, 'raw_response': None, 'error': None,
+                             'request_bytes': (5000, 800), 'response_bytes': (1200, 400)})
+    metrics.observe_attempt({**LABELS, 'status_code': 200, 'latency_sec': 0.1, 'raw_response': None, 'error': None})
+
+    assert metrics.llm_body_bytes.get(**LABELS, direction='request', stage='decoded') == 5000
+    assert metrics.llm_body_bytes.get(**LABELS, direction='request', stage='wire') == 800
+    assert metrics.llm_body_bytes.get(**LABELS, direction='response', stage='decoded') == 1200
+    assert metrics.llm_body_bytes.get(**LABELS, direction='response', stage='wire') == 400
+
+
+@patch('llm_client.time.sleep')
+def test_call_api_records_metrics(mock_sleep: Mock):
+    session = Mock()
+    session.post.side_effect = [response(429), response(200, GEMINI_RESPONSE)]
+    client = LLMAPIClient(GeminiConfig(api_key='key'), retry_delay_sec=0.1, session=session)
+
+    assert client.call_api('question') == 'Looks good.'
+
+    assert metrics.llm_retries.get(**LABELS) == 1
+    assert metrics.llm_rate_limited.get(**LABELS) == 1
+    assert metrics.llm_calls.get(**LABELS, outcome='success') == 1
+    assert metrics.llm_tokens.get(**LABELS, direction='output') == 5
+
+
+def test_call_api_failure_counted():
+    session = Mock()
+    session.post.return_value = response(500)
+    client = LLMAPIClient(GeminiConfig(api_key='key'), session=session)
+
+    assert client.call_api('question') is None
+    assert metrics.llm_calls.get(**LABELS, outcome='failure') == 1
+
+
+def test_get_prompt_records_prompt_size():
+    prompt.engineering(
+        (test_folder / 'sample_report.json',), (test_folder / 'sample_code.py',),
+        test_folder / 'sample_readme.md', 'English',
+    )
+
+    assert metrics.prompt_chars.count(provider='unknown', model='unknown') == 1
+    assert metrics.prompt_build_seconds.count(provider='unknown', model='unknown') == 1
+    assert metrics.prompt_failed_tests.get() > 0
+
+    prompt.engineering_multilingual(
+        (test_folder / 'sample_report.json',), (test_folder / 'sample_code.py',),
+        test_folder / 'sample_readme.md', ('English', 'Korean'), model='grok-code-fast',
+    )
+
+    assert metrics.prompt_chars.count(provider='grok', model='grok-code-fast') == 1
+    assert metrics.prompt_build_seconds.count(provider='grok', model='grok-code-fast') == 1
+    assert metrics.prompt_labels('no-such-model') == {'provider': 'unknown', 'model': 'no-such-model'}
+
+
+def test_recording_writes_file(tmp_path: pathlib.Path):
+    with metrics.recording('tutor', str(tmp_path)):
+        pass
+    with pytest.raises(SystemExit):
+        with metrics.recording('tutor', str(tmp_path)):
+            sys.exit(1)
+
+    assert metrics.runs.get(entrypoint='tutor', outcome='success') == 1
+    assert metrics.runs.get(entrypoint='tutor', outcome='failure') == 1
+    text = (tmp_path / metrics.METRICS_FILENAME).read_text()
+    assert 'tutor_runs_total{entrypoint="tutor",outcome="failure"} 1' in text
+
+
+def test_entrypoint_main_writes_metrics(monkeypatch, tmp_path: pathlib.Path):
+    monkeypatch.setenv('INPUT_OUTPUT-DIR', str(tmp_path))
+    monkeypatch.setenv('INPUT_REPORT-FILES', str(test_folder / 'sample_report.json'))
+    monkeypatch.setenv('INPUT_STUDENT-FILES', str(test_folder / 'sample_code.py'))
+    monkeypatch.setenv('INPUT_README-PATH', str(test_folder / 'sample_readme.md'))
+    monkeypatch.setenv('INPUT_EXPLANATION-IN', 'English')
+    monkeypatch.setenv('INPUT_GEMINI-API-KEY', 'test-key')
+    monkeypatch.delenv('GITHUB_STEP_SUMMARY', raising=False)
+
+    entrypoint.main(b_ask=False)
+
+    text = (tmp_path / metrics.METRICS_FILENAME).read_text()
+    assert 'tutor_runs_total{entrypoint="tutor",outcome="success"} 1' in text
+    assert 'tutor_prompt_chars_count{provider="gemini",model="gemini"} 1' in text
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_metrics.py
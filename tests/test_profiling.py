@@ -0,0 +1,121 @@
+# begin tests/test_profiling.py
+import pathlib
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import entrypoint  # noqa: E402
+import profiling  # noqa: E402
+
+
+def busy(duration_sec: float = 0.05) -> int:
+    total = 0
+    deadline = time.perf_counter() + duration_sec
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('', None), ('false', None), ('cpu', 'cpu'), ('MEM', 'mem'), (' both ', 'both'), ('gpu', None),
+])
+def test_mode_from_env(monkeypatch, value, expected):
+    monkeypatch.setenv('INPUT_PROFILE', value)
+    assert profiling.mode_from_env() == expected
+
+
+def test_disabled_writes_nothing(tmp_path):
+    with profiling.profiling(str(tmp_path), None):
+        busy(0.001)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cpu_profile_files(tmp_path):
+    with profiling.profiling(str(tmp_path), 'cpu', top_n=5):
+        busy()
+
+    stats = pstats.Stats(str(tmp_path / profiling.PROF_FILENAME))
+    assert any(func[2] == 'busy' for func in stats.stats)
+    assert 'busy' in (tmp_path / profiling.CPU_REPORT_FILENAME).read_text()
+    assert not (tmp_path / profiling.MEM_REPORT_FILENAME).exists()
+
+    collapsed = (tmp_path / profiling.COLLAPSED_FILENAME).read_text().splitlines()
+    assert collapsed
+    stack, count = collapsed[0].rsplit(' ', 1)
+    assert int(count) > 0
+    assert any('busy (test_profiling.py' in line for line in collapsed)
+
+
+def test_sampler_sees_worker_threads():
+    sampler = profiling.StackSampler(interval_sec=0.001)
+    worker = threading.Thread(target=busy, name='worker')
+    sampler.start()
+    worker.start()
+    worker.join()
+    sampler.stop()
+
+    assert any(stack.startswith('worker;') for stack in sampler.counts)
+
+
+def test_mem_profile_report(tmp_path):
+    with profiling.profiling(str(tmp_path), 'mem', top_n=5):
+        blob = [bytes(1000) for _ in range(1000)]
+
+    report = (tmp_path / profiling.MEM_REPORT_FILENAME).read_text()
+    assert report.startswith('Peak traced memory:')
+    assert 'test_profiling.py' in report
+    assert len(blob) == 1000
+    assert not tracemalloc.is_tracing()
+    assert not (tmp_path / profiling.PROF_FILENAME).exists()
+
+
+def test_mem_profile_keeps_enclosing_tracemalloc(tmp_path):
+    tracemalloc.start()
+    try:
+        with profiling.profiling(str(tmp_path), 'mem'):
+            busy(0.001)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_no_output_dir_discards(caplog):
+    with profiling.profiling('', 'both'):
+        busy(0.001)
+
+    assert 'profile discarded' in caplog.text
+
+
+def test_entrypoint_main_profile_both(monkeypatch, tmp_path: pathlib.Path):
+    monkeypatch.setenv('INPUT_PROFILE', 'both')
+    monkeypatch.setenv('INPUT_OUTPUT-DIR', str(tmp_path))
+    monkeypatch.setenv('INPUT_REPORT-FILES', str(test_folder / 'sample_report.json'))
+    monkeypatch.setenv('INPUT_STUDENT-FILES', str(test_folder / 'sample_code.py'))
+    monkeypatch.setenv('INPUT_README-PATH', str(test_folder / 'sample_readme.md'))
+    monkeypatch.setenv('INPUT_EXPLANATION-IN', 'English')
+    monkeypatch.setenv('INPUT_GEMINI-API-KEY', 'test-key')
+    monkeypatch.delenv('GITHUB_STEP_SUMMARY', raising=False)
+
+    entrypoint.main(b_ask=False)
+
+    for filename in (profiling.PROF_FILENAME, profiling.CPU_REPORT_FILENAME,
+                     profiling.COLLAPSED_FILENAME, profiling.MEM_REPORT_FILENAME):
+        assert (tmp_path / filename).exists()
+    assert 'engineering' in (tmp_path / profiling.CPU_REPORT_FILENAME).read_text()
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_profiling.py
@@ -581,6 +581,92 @@ def test_get_prompt__with_failures__has_directive(
     assert "3-5 sentences" not in prompt_text
 
 
+
+@pytest.mark.parametrize("explanation_in, expected", [
+    ("Korean", ("Korean",)),
+    ("Korean,English", ("Korean", "English")),
+    (" Korean , English ,", ("Korean", "English")),
+    ("English,English", ("English",)),
+    ("Bahasa Indonesia,Thai", ("Bahasa Indonesia", "Thai")),
+])
+def test_get_language_list(explanation_in: str, expected: Tuple[str]):
+    assert prompt.get_language_list(explanation_in) == expected
+
+
+def test_get_language_list__empty():
+    with pytest.raises(ValueError, match="No explanation language"):
+        prompt.get_language_list(" , ")
+
+
+def test_get_multilingual_prompt__has_each_directive(
+    sample_report_path: pathlib.Path,
+    sample_student_code_path: pathlib.Path,
+    sample_readme_path: pathlib.Path,
+):
+    languages = ("Korean", "English")
+    n_failed, prompt_text = prompt.get_multilingual_prompt(
+        report_paths=(sample_report_path,),
+        student_files=(sample_student_code_path,),
+        readme_file=sample_readme_path,
+        languages=languages,
+    )
+
+    assert n_failed > 0
+    for language in languages:
+        assert prompt.get_section_marker(language) in prompt_text
+        assert prompt.load_locale(language)['directive'] in prompt_text
+    # code and README are included once, not per language
+    assert prompt_text.count("##### Start mutable code block") == 1
+    assert prompt_text.index("=== Korean ===") < prompt_text.index("=== English ===")
+
+
+def test_get_multilingual_prompt__all_passing(
+    all_passing_report: pathlib.Path,
+    sample_student_code_path: pathlib.Path,
+    sample_readme_path: pathlib.Path,
+):
+    n_failed, prompt_text = prompt.get_multilingual_prompt(
+        report_paths=(all_passing_report,),
+        student_files=(sample_student_code_path,),
+        readme_file=sample_readme_path,
+        languages=("Korean", "English"),
+    )
+
+    assert n_failed == 0
+    assert "All tests passed. In Korean" in prompt_text
+    assert "All tests passed. In English" in prompt_text
+
+
+def test_split_feedback_by_language():
+    feedback = (
+        "=== Korean ===\n"
+        "한국어 피드백\n\n"
+        "=== English ===\n"
+        "English feedback\n"
+    )
+    result = prompt.split_feedback_by_language(feedback, ("Korean", "English"))
+
+    assert result == {"Korean": "한국어 피드백", "English": "English feedback"}
+
+
+def test_split_feedback_by_language__case_and_preamble():
+    feedback = (
+        "Sure, here it is.\n"
+        "==== english ====\n"
+        "English feedback\n"
+    )
+    result = prompt.split_feedback_by_language(feedback, ("Korean", "English"))
+
+    assert result == {"English": "English feedback"}
+
+
+def test_split_feedback_by_language__no_marker(caplog):
+    result = prompt.split_feedback_by_language("plain feedback", ("Korean", "English"))
+
+    assert result == {"Korean": "plain feedback"}
+    assert "No language section markers" in caplog.text
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
 
@@ -2,6 +2,9 @@
 """Tests for prompt_pipeline code-generation config overrides."""
 import pathlib
 import sys
+import threading
+import time
+import unittest.mock
 
 import pytest
 
@@ -184,6 +187,318 @@ class TestPatchDoesNotMutateOtherInstances:
         assert 'max_tokens' not in unpatched.format_request_data(SAMPLE_QUESTION)
 
 
+
+class TestPatchTemperature:
+    """Candidate samples pass their own temperature."""
+
+    def test_gemini(self):
+        c = GeminiConfig(api_key=SAMPLE_API_KEY)
+        patch_config_for_codegen(c, temperature=0.7)
+        assert c.format_request_data(SAMPLE_QUESTION)['generationConfig']['temperature'] == 0.7
+
+    def test_claude(self):
+        c = ClaudeConfig(api_key=SAMPLE_API_KEY)
+        patch_config_for_codegen(c, temperature=0.7)
+        assert c.format_request_data(SAMPLE_QUESTION)['temperature'] == 0.7
+
+
+# --- candidate race tests ---
+
+
+VALID_RESPONSE = "```python\ndef add(a, b):\n    return a + b\n```"
+INVALID_RESPONSE = "```python\ndef add(a, b):\n    return a + b\n\nprint(add(1, 2))\n```"
+
+
+class TestGetCandidatesFromEnv:
+
+    @pytest.fixture(autouse=True)
+    def env(self, monkeypatch):
+        for name in ('INPUT_API-KEY', 'INPUT_CLAUDE_API_KEY', 'INPUT_GROK-API-KEY',
+                     'INPUT_NVIDIA-API-KEY', 'INPUT_PERPLEXITY-API-KEY'):
+            monkeypatch.delenv(name, raising=False)
+        monkeypatch.setenv('INPUT_GEMINI-API-KEY', 'gemini-key')
+        monkeypatch.setenv('INPUT_CLAUDE_API_KEY', 'claude-key')
+        monkeypatch.delenv('INPUT_CANDIDATE-MODELS', raising=False)
+
+    def test_default_single(self, monkeypatch):
+        monkeypatch.delenv('INPUT_CANDIDATES', raising=False)
+        assert pp_entrypoint.get_candidates_from_env('gemini-2.5-flash', 'gemini-key') == [
+            pp_entrypoint.Candidate('gemini-2.5-flash', 'gemini-key', CODEGEN_TEMPERATURE),
+        ]
+
+    def test_round_robin_over_models(self, monkeypatch):
+        monkeypatch.setenv('INPUT_CANDIDATES', '3')
+        monkeypatch.setenv('INPUT_CANDIDATE-MODELS', 'gemini-2.5-flash,claude-sonnet-4-20250514,grok-code-fast')
+
+        candidates = pp_entrypoint.get_candidates_from_env('gemini-2.5-flash', 'gemini-key')
+
+        # grok has no key and is skipped; the third candidate resamples gemini
+        assert [(c.model, c.api_key) for c in candidates] == [
+            ('gemini-2.5-flash', 'gemini-key'),
+            ('claude-sonnet-4-20250514', 'claude-key'),
+            ('gemini-2.5-flash', 'gemini-key'),
+        ]
+        assert [c.temperature for c in candidates] == [
+            CODEGEN_TEMPERATURE, CODEGEN_TEMPERATURE, pp_entrypoint.CANDIDATE_SAMPLE_TEMPERATURE,
+        ]
+
+
+def fake_create_client(responses, release=None, created=None):
+    """create_client replacement answering by model; 'slow' blocks until *release* is set."""
+    def create(model, api_key, **kwargs):
+        client = unittest.mock.Mock()
+        client.config = unittest.mock.Mock()
+        if created is not None:
+            created.append(client)
+
+        def call_api(question):
+            if model == 'slow':
+                release.wait(5)
+            return responses[model]
+
+        client.call_api.side_effect = call_api
+        return client
+    return create
+
+
+class TestGenerateFirstValid:
+
+    @pytest.fixture(autouse=True)
+    def env(self, monkeypatch):
+        monkeypatch.setenv('INPUT_REQUIRED-FUNCTIONS', 'add')
+        monkeypatch.delenv('INPUT_FORBIDDEN-IMPORTS', raising=False)
+        monkeypatch.delenv('INPUT_SMOKE-IMPORT', raising=False)
+
+    def test_first_valid_wins_without_waiting(self):
+        release = threading.Event()
+        responses = {'slow': VALID_RESPONSE, 'bad': INVALID_RESPONSE, 'good': VALID_RESPONSE}
+        candidates = [pp_entrypoint.Candidate(m, 'key', 0) for m in ('slow', 'bad', 'good')]
+
+        clients = []
+
+        start = time.perf_counter()
+        with unittest.mock.patch.object(pp_entrypoint, 'create_client', fake_create_client(responses, release, clients)):
+            code, winner, problems = pp_entrypoint.generate_first_valid(SAMPLE_QUESTION, candidates)
+        release.set()
+
+        assert time.perf_counter() - start < 2
+        assert winner.model == 'good'
+        assert code.startswith('def add(a, b):')
+        assert problems == []
+        # Every candidate's session is closed, including the one still waiting
+        assert all(client.session.closed for client in clients)
+
+    def test_falls_back_to_first_code(self):
+        responses = {'bad': INVALID_RESPONSE, 'none': None}
+        candidates = [pp_entrypoint.Candidate(m, 'key', 0) for m in ('none', 'bad')]
+
+        with unittest.mock.patch.object(pp_entrypoint, 'create_client', fake_create_client(responses)):
+            code, winner, problems = pp_entrypoint.generate_first_valid(SAMPLE_QUESTION, candidates)
+
+        assert winner.model == 'bad'
+        assert 'print(add(1, 2))' in code
+        assert problems
+
+    def test_response_without_code_block_fails(self):
+        responses = {'prose': 'Sure! The function adds a and b.', 'bad': INVALID_RESPONSE}
+        candidates = [pp_entrypoint.Candidate(m, 'key', 0) for m in ('prose', 'bad')]
+
+        with unittest.mock.patch.object(pp_entrypoint, 'create_client', fake_create_client(responses)):
+            code, winner, problems = pp_entrypoint.generate_first_valid(SAMPLE_QUESTION, candidates)
+
+        assert winner.model == 'bad'
+        with unittest.mock.patch.object(pp_entrypoint, 'create_client', fake_create_client(responses)):
+            assert pp_entrypoint.generate_first_valid(SAMPLE_QUESTION, candidates[:1]) == (None, None, [])
+
+    def test_no_code(self):
+        candidates = [pp_entrypoint.Candidate('none', 'key', 0)]
+
+        with unittest.mock.patch.object(pp_entrypoint, 'create_client', fake_create_client({'none': None})):
+            assert pp_entrypoint.generate_first_valid(SAMPLE_QUESTION, candidates) == (None, None, [])
+
+    def test_validated_winner_is_not_checked_again(self):
+        responses = {'bad': INVALID_RESPONSE, 'good': VALID_RESPONSE}
+        candidates = [pp_entrypoint.Candidate(m, 'key', 0) for m in ('good', 'bad')]
+        check = unittest.mock.Mock(wraps=pp_entrypoint.check_code_from_env)
+
+        with unittest.mock.patch.object(pp_entrypoint, 'create_client', fake_create_client(responses)), \
+                unittest.mock.patch.object(pp_entrypoint, 'check_code_from_env', check):
+            code, problems, model = pp_entrypoint.generate_code(SAMPLE_QUESTION, 'good', 'key', candidates, None)
+
+        assert (problems, model) == ([], 'good')
+        # One check per response that arrived before the winner, none after
+        assert 1 <= check.call_count <= 2
+        assert check.call_args_list.count(unittest.mock.call(code)) == 1
+
+
+class TestCancellableSession:
+
+    def test_close_drops_open_responses_and_later_posts(self):
+        import requests
+
+        inner = unittest.mock.Mock()
+        session = pp_entrypoint.CancellableSession(inner)
+        response = session.post('https://example.com', stream=True)
+
+        session.close()
+
+        response.close.assert_called_once_with()
+        with pytest.raises(requests.ConnectionError):
+            session.post('https://example.com')
+        inner.close.assert_not_called()  # a shared session (e.g. a cassette) stays open
+
+    def test_response_arriving_after_close_is_discarded(self):
+        import requests
+
+        session = pp_entrypoint.CancellableSession(unittest.mock.Mock())
+        late = unittest.mock.Mock()
+
+        def post(url, **kwargs):
+            session.close()
+            return late
+
+        session._session.post.side_effect = post
+        with pytest.raises(requests.ConnectionError):
+            session.post('https://example.com')
+        late.close.assert_called_once_with()
+
+
+
+# --- streaming tests ---
+
+
+class TestStreamingCodeExtractor:
+
+    def test_stops_at_closing_fence_split_across_chunks(self):
+        extractor = pp_entrypoint.StreamingCodeExtractor()
+        chunks = ["``", "`pyth", "on\ndef add(a, b):\n", "    return a + b\n`", "``\n\nThis function", " adds."]
+
+        done = [extractor.feed(c) for c in chunks]
+
+        assert done == [False, False, False, False, True, True]
+        assert pp_entrypoint.extract_python_code(extractor.get_response()) == "def add(a, b):\n    return a + b"
+
+    def test_closes_fence_of_unfinished_text(self):
+        extractor = pp_entrypoint.StreamingCodeExtractor()
+        extractor.feed("```python\ndef add(a, b):\n    return a + b")
+
+        assert not extractor.closed
+        assert pp_entrypoint.extract_python_code(extractor.get_response()) == "def add(a, b):\n    return a + b"
+
+    def test_no_fence(self):
+        extractor = pp_entrypoint.StreamingCodeExtractor()
+        extractor.feed("def add(a, b):\n    return a + b")
+
+        assert extractor.get_response() == "def add(a, b):\n    return a + b"
+
+
+class TestStreamResponse:
+
+    @staticmethod
+    def make_client(chunks):
+        consumed = []
+
+        def stream_api(question):
+            for chunk in chunks:
+                consumed.append(chunk)
+                yield chunk
+
+        client = unittest.mock.Mock()
+        client.stream_api.side_effect = stream_api
+        return client, consumed
+
+    def test_cancels_after_closing_fence(self):
+        client, consumed = self.make_client(
+            ["```python\n", "def f():\n    pass\n", "```", "\nExplanation", " that costs tokens"],
+        )
+
+        response = pp_entrypoint.stream_response(client, SAMPLE_QUESTION)
+
+        assert response == "```python\ndef f():\n    pass\n```"
+        assert len(consumed) == 3
+        client.stream_api.assert_called_once_with(SAMPLE_QUESTION)
+
+    def test_untagged_fence_after_prose(self):
+        # "\n```\n" opens this block; a provider-side stop on it would end before the code
+        client, consumed = self.make_client(
+            ["Here is the code:\n", "```\n", "def f():\n    pass\n", "```\n", "Hope this helps"],
+        )
+
+        response = pp_entrypoint.stream_response(client, SAMPLE_QUESTION)
+
+        assert pp_entrypoint.extract_python_code(response) == "def f():\n    pass"
+        assert len(consumed) == 4
+
+    def test_closes_fence_of_truncated_stream(self):
+        client, _ = self.make_client(["```python\ndef f():\n    pass"])
+
+        response = pp_entrypoint.stream_response(client, SAMPLE_QUESTION)
+
+        assert pp_entrypoint.extract_python_code(response) == "def f():\n    pass"
+
+    def test_call_codegen_falls_back_without_stream_text(self):
+        client, _ = self.make_client([])
+        client.call_api.return_value = "```python\nx = 1\n```"
+
+        assert pp_entrypoint.call_codegen(client, SAMPLE_QUESTION, stream=True) == "```python\nx = 1\n```"
+        client.call_api.assert_called_once_with(SAMPLE_QUESTION)
+
+
+
+# --- check and repair tests ---
+
+
+class TestCheckAndRepair:
+
+    @pytest.fixture(autouse=True)
+    def env(self, monkeypatch):
+        monkeypatch.setenv('INPUT_REQUIRED-FUNCTIONS', 'add')
+        monkeypatch.delenv('INPUT_FORBIDDEN-IMPORTS', raising=False)
+        monkeypatch.delenv('INPUT_SMOKE-IMPORT', raising=False)
+
+    def test_valid_code_makes_no_call(self):
+        client = unittest.mock.Mock()
+
+        code, problems = pp_entrypoint.check_and_repair(client, "def add(a, b):\n    return a + b", 2)
+
+        assert problems == []
+        client.call_api.assert_not_called()
+
+    def test_repair_sends_only_problems_and_code(self):
+        client = unittest.mock.Mock()
+        client.call_api.return_value = VALID_RESPONSE
+        broken = "import os\n\ndef add(a, b):\n    return a + b"
+
+        code, problems = pp_entrypoint.check_and_repair(client, broken, 2)
+
+        assert (code, problems) == ("def add(a, b):\n    return a + b", [])
+        client.call_api.assert_called_once()
+        question = client.call_api.call_args.args[0]
+        assert 'forbidden imports: os' in question
+        assert broken in question
+        assert 'Student requirements' not in question
+
+    def test_bounded_attempts_keep_best_version(self):
+        client = unittest.mock.Mock()
+        # worse: still prints, and lost the required function
+        client.call_api.return_value = "```python\nprint(1)\n```"
+
+        code, problems = pp_entrypoint.check_and_repair(
+            client, "def add(a, b):\n    return a + b\n\nprint(add(1, 2))", 3)
+
+        assert client.call_api.call_count == 3
+        assert 'def add' in code
+        assert problems == ['module-level code at line 4: Expr']
+
+    def test_zero_attempts(self):
+        client = unittest.mock.Mock()
+
+        _, problems = pp_entrypoint.check_and_repair(client, "print(1)", 0)
+
+        assert problems
+        client.call_api.assert_not_called()
+
+
 if __name__ == "__main__":
     pytest.main(["--verbose", __file__])
 
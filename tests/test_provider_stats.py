@@ -0,0 +1,233 @@
+# begin tests/test_provider_stats.py
+import json
+import pathlib
+import random
+import sys
+from typing import Optional
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import llm_utils  # noqa: E402
+import provider_stats  # noqa: E402
+from provider_stats import LatencySketch, ProviderStats  # noqa: E402
+
+
+MODELS = {'gemini': 'gemini-2.5-flash', 'claude': 'claude-sonnet-4-20250514', 'grok': 'grok-code-fast'}
+
+
+def event(provider: str, status_code: Optional[int] = 200, latency_sec: float = 1.0,
+          tokens: Optional[tuple] = None) -> dict:
+    raw = None
+    if tokens:
+        raw = {'usage': {'input_tokens': tokens[0], 'output_tokens': tokens[1]}}
+    return {'provider': provider, 'model': MODELS[provider], 'status_code': status_code,
+            'latency_sec': latency_sec, 'raw_response': raw, 'error': None}
+
+
+def feed(stats: ProviderStats, provider: str, n: int, **kwargs) -> None:
+    for _ in range(n):
+        stats.observe(event(provider, **kwargs))
+
+
+def test_sketch_quantiles_within_accuracy():
+    rng = random.Random(0)
+    samples = sorted(rng.lognormvariate(0, 1) for _ in range(400))
+    sketch = LatencySketch()
+    for value in samples:
+        sketch.add(value)
+
+    for q in (0.5, 0.9, 0.99):
+        exact = samples[int(q * len(samples)) - 1]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.06)
+    assert LatencySketch().quantile(0.5) is None
+
+
+def test_sketch_fades_old_samples():
+    sketch = LatencySketch()
+    for _ in range(provider_stats.MAX_SKETCH_COUNT):
+        sketch.add(10.0)
+    for _ in range(provider_stats.MAX_SKETCH_COUNT):
+        sketch.add(1.0)
+
+    assert sketch.total() <= provider_stats.MAX_SKETCH_COUNT
+    assert sketch.quantile(0.5) == pytest.approx(1.0, rel=0.06)
+
+
+def test_observe_tracks_ewma_success_and_cost():
+    stats = ProviderStats()
+    feed(stats, 'claude', 5, latency_sec=2.0, tokens=(1_000_000, 100_000))
+    stats.observe(event('claude', status_code=429, latency_sec=0.1))
+
+    record = stats.providers['claude']
+    assert record.attempts == 6
+    assert record.latency_sec == pytest.approx(2.0)  # failures do not count as latency
+    assert record.success == pytest.approx(0.8)
+    assert record.cost_usd == pytest.approx(4.5)
+    assert record.expected('latency') == pytest.approx(2.5)
+
+
+def test_choose_by_latency_with_success_floor():
+    stats = ProviderStats()
+    feed(stats, 'gemini', 5, latency_sec=3.0)
+    feed(stats, 'grok', 5, latency_sec=1.0)
+    feed(stats, 'claude', 5, latency_sec=0.5)
+    feed(stats, 'claude', 3, status_code=500)  # fast but failing
+
+    assert stats.choose(['gemini', 'grok', 'claude']) == 'grok'
+    assert stats.choose(['gemini', 'claude']) == 'gemini'
+    assert stats.choose(['gemini', 'claude'], success_floor=0.0) == 'claude'
+    assert stats.choose(['perplexity']) is None
+    with pytest.raises(ValueError):
+        stats.choose(['gemini'], objective='speed')
+
+
+def test_choose_by_cost_and_min_samples():
+    stats = ProviderStats()
+    feed(stats, 'claude', 5, latency_sec=0.5, tokens=(1000, 1000))
+    feed(stats, 'gemini', 5, latency_sec=2.0, tokens=(1000, 1000))
+    feed(stats, 'grok', 2, latency_sec=0.1, tokens=(1000, 1000))
+
+    assert stats.choose(['claude', 'gemini', 'grok']) == 'claude'
+    assert stats.choose(['claude', 'gemini', 'grok'], objective='cost') == 'gemini'
+    assert stats.choose(['claude', 'gemini', 'grok'], objective='cost', min_samples=2) == 'grok'
+
+
+def test_history_persists(tmp_path: pathlib.Path):
+    path = tmp_path / 'provider_stats.json'
+    feed(ProviderStats(path), 'grok', 4, latency_sec=0.8)
+
+    document = json.loads(path.read_text())
+    assert document['providers']['grok']['attempts'] == 4
+    assert document['providers']['grok']['p50_sec'] == pytest.approx(0.8, rel=0.06)
+    assert ProviderStats(path).choose(['grok']) == 'grok'
+
+    path.write_text('not json')
+    assert ProviderStats(path).providers == {}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_explore_picks_provider_without_history():
+    stats = ProviderStats()
+    feed(stats, 'gemini', 5, latency_sec=1.0)
+
+    assert stats.choose(['gemini', 'grok']) == 'gemini'
+    assert stats.choose(['gemini', 'grok'], explore=1.0) == 'grok'
+    # No history anywhere: still nothing to go by unless exploring
+    assert stats.choose(['claude', 'grok']) is None
+    assert stats.choose(['claude', 'grok'], explore=1.0, rng=random.Random(0)) in ('claude', 'grok')
+
+
+def test_explore_share():
+    stats = ProviderStats()
+    feed(stats, 'gemini', 5, latency_sec=1.0)
+    rng = random.Random(1)
+
+    picks = [stats.choose(['gemini', 'grok'], explore=0.2, rng=rng) for _ in range(1000)]
+
+    assert 150 < picks.count('grok') < 250
+
+
+def test_stale_history_is_explored():
+    clock = Clock()
+    stats = ProviderStats(clock=clock)
+    feed(stats, 'grok', 5, latency_sec=2.0)
+    clock.now += provider_stats.DEFAULT_STALE_SEC + 1
+    feed(stats, 'gemini', 5, latency_sec=1.0)
+
+    assert stats.choose(['gemini', 'grok']) == 'gemini'
+    assert stats.choose(['gemini', 'grok'], explore=1.0) == 'grok'
+    clock.now += provider_stats.DEFAULT_STALE_SEC
+    # Both are stale now; the explored one is drawn from both
+    assert stats.choose(['gemini', 'grok'], explore=1.0, rng=random.Random(3)) in ('gemini', 'grok')
+
+
+def test_failing_provider_recovers_toward_floor():
+    clock = Clock()
+    stats = ProviderStats(clock=clock)
+    feed(stats, 'gemini', 5, latency_sec=3.0)
+    feed(stats, 'grok', 5, latency_sec=1.0)
+    feed(stats, 'grok', 5, status_code=503)
+    record = stats.providers['grok']
+    assert record.success_at(clock.now, 0.9) == pytest.approx(record.success)
+    assert stats.choose(['gemini', 'grok']) == 'gemini'
+    assert stats.choose(['gemini', 'grok'], explore=1.0) == 'grok'  # failing providers keep getting samples
+
+    clock.now += 10 * provider_stats.SUCCESS_HALF_LIFE_SEC
+    assert record.success_at(clock.now, 0.9) == pytest.approx(0.9, abs=0.001)
+    # Decayed history plus one good explored call requalifies the provider
+    record.success = record.success_at(clock.now, 0.9)
+    stats.observe(event('grok', latency_sec=1.0))
+    assert stats.choose(['gemini', 'grok']) == 'grok'
+
+
+def test_all_below_floor_picks_least_bad():
+    stats = ProviderStats()
+    feed(stats, 'gemini', 5, status_code=500)
+    feed(stats, 'grok', 5, latency_sec=1.0)
+    feed(stats, 'grok', 3, status_code=429)
+
+    assert stats.choose(['gemini', 'grok']) == 'grok'
+
+
+@pytest.fixture
+def two_keys(monkeypatch, tmp_path: pathlib.Path) -> pathlib.Path:
+    monkeypatch.setattr(provider_stats, '_stats', {})
+    monkeypatch.delenv('INPUT_API-KEY', raising=False)
+    monkeypatch.setenv('INPUT_MODEL', '')
+    for var in ('INPUT_CLAUDE_API_KEY', 'INPUT_NVIDIA-API-KEY', 'INPUT_PERPLEXITY-API-KEY'):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv('INPUT_GEMINI-API-KEY', 'gemini-key')
+    monkeypatch.setenv('INPUT_GROK-API-KEY', 'grok-key')
+    path = tmp_path / 'provider_stats.json'
+    monkeypatch.setenv('INPUT_PROVIDER-STATS', str(path))
+    monkeypatch.setenv('INPUT_PROVIDER-EXPLORE', '0')
+    return path
+
+
+def test_get_model_key_follows_history(two_keys: pathlib.Path, monkeypatch):
+    # No history yet: the usual Gemini fallback
+    assert llm_utils.get_model_key_from_env() == ('gemini-2.5-flash', 'gemini-key')
+
+    stats = provider_stats.stats_from_env()
+    feed(stats, 'gemini', 5, latency_sec=4.0)
+    feed(stats, 'grok', 5, latency_sec=1.0)
+    assert llm_utils.get_model_key_from_env() == ('grok-code-fast', 'grok-key')
+
+    # A pinned model is never overridden
+    monkeypatch.setenv('INPUT_MODEL', 'gemini-2.5-flash')
+    assert llm_utils.get_model_key_from_env() == ('gemini-2.5-flash', 'gemini-key')
+
+
+def test_get_model_key_explores_unpicked_provider(two_keys: pathlib.Path, monkeypatch):
+    feed(provider_stats.stats_from_env(), 'gemini', 5, latency_sec=1.0)
+    monkeypatch.setenv('INPUT_PROVIDER-EXPLORE', '1')
+
+    # Grok was never called, so it has no history; exploration gives it a run
+    assert llm_utils.get_model_key_from_env() == ('grok-code-fast', 'grok-key')
+
+
+def test_create_client_records_history(two_keys: pathlib.Path):
+    client = llm_utils.create_client('grok-code-fast', 'grok-key')
+
+    for observer in client.observers:
+        observer(event('grok', latency_sec=0.7))
+
+    assert json.loads(two_keys.read_text())['providers']['grok']['attempts'] == 1
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+# end tests/test_provider_stats.py
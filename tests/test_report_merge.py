@@ -0,0 +1,106 @@
+# begin tests/test_report_merge.py
+import json
+import pathlib
+import sys
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import prompt
+import report_merge
+
+
+def make_test(nodeid: str, outcome: str, longrepr: str = '', stderr: str = '') -> dict:
+    call = {'outcome': outcome}
+    if longrepr:
+        call['longrepr'] = longrepr
+    if stderr:
+        call['stderr'] = stderr
+    return {
+        'nodeid': nodeid,
+        'outcome': outcome,
+        'setup': {'outcome': 'passed'},
+        'call': call,
+        'teardown': {'outcome': 'passed'},
+    }
+
+
+def write_report(path: pathlib.Path, *tests: dict) -> pathlib.Path:
+    path.write_text(json.dumps({'tests': list(tests)}))
+    return path
+
+
+def test_merge_reports__dedupes_by_nodeid():
+    shard_a = {'tests': [make_test('t::a', 'failed', 'short'), make_test('t::b', 'passed')]}
+    shard_b = {'tests': [make_test('t::a', 'failed', 'a much longer traceback'), make_test('t::c', 'failed', 'c')]}
+
+    merged = report_merge.merge_reports([shard_a, shard_b])
+
+    assert [t['nodeid'] for t in merged['tests']] == ['t::a', 't::b', 't::c']
+    assert merged['tests'][0]['call']['longrepr'] == 'a much longer traceback'
+    assert merged['summary'] == {'failed': 2, 'passed': 1, 'total': 3}
+
+
+@pytest.mark.parametrize("first, second, expected", [
+    ('passed', 'failed', 'failed'),
+    ('failed', 'passed', 'failed'),
+    ('skipped', 'passed', 'passed'),
+    ('failed', 'error', 'error'),
+    ('xfailed', 'passed', 'xfailed'),
+])
+def test_merge_reports__worst_outcome_wins(first, second, expected):
+    merged = report_merge.merge_reports([
+        {'tests': [make_test('t::a', first, f'{first} detail')]},
+        {'tests': [make_test('t::a', second, f'{second} detail')]},
+    ])
+
+    assert merged['tests'][0]['outcome'] == expected
+    assert merged['tests'][0]['call']['outcome'] == expected
+
+
+def test_merge_reports__keeps_failing_phase_over_longer_passing_one():
+    flaky = make_test('t::a', 'error')
+    flaky['teardown'] = {'outcome': 'failed', 'longrepr': 'fixture cleanup failed'}
+    clean = make_test('t::a', 'passed')
+    clean['teardown'] = {'outcome': 'passed', 'stderr': 'x' * 100}
+
+    merged = report_merge.merge_reports([{'tests': [clean]}, {'tests': [flaky]}])
+
+    assert merged['tests'][0]['teardown']['longrepr'] == 'fixture cleanup failed'
+
+
+def test_merge_reports__does_not_modify_inputs():
+    test = make_test('t::a', 'passed')
+    report_merge.merge_reports([{'tests': [test]}, {'tests': [make_test('t::a', 'failed', 'x')]}])
+
+    assert test['outcome'] == 'passed'
+
+
+def test_load_reports__preserves_order(tmp_path):
+    paths = [write_report(tmp_path / f'report_{i}.json', make_test(f't::{i}', 'passed')) for i in range(5)]
+
+    reports = report_merge.load_reports(paths, max_workers=3)
+
+    assert [r['tests'][0]['nodeid'] for r in reports] == [f't::{i}' for i in range(5)]
+
+
+def test_collect_longrepr_from_multiple_reports__explains_shared_failure_once(tmp_path):
+    paths = (
+        write_report(tmp_path / 'gw0.json', make_test('t::a', 'failed', 'AssertionError: 1 != 2')),
+        write_report(tmp_path / 'gw1.json', make_test('t::a', 'failed', 'AssertionError: 1 != 2')),
+    )
+
+    questions = prompt.collect_longrepr_from_multiple_reports(paths, 'English')
+
+    assert sum('1 != 2' in q for q in questions) == 1
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_report_merge.py
@@ -0,0 +1,380 @@
+# begin tests/test_service.py
+import json
+import pathlib
+import sys
+import threading
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Tuple
+from unittest.mock import Mock, patch
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import admission
+import prompt
+import service
+
+
+GEMINI_RESPONSE = {
+    "candidates": [{"content": {"parts": [{"text": "Looks good."}]}}],
+    "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 5, "totalTokenCount": 15},
+}
+
+
+@pytest.fixture
+def tutor() -> service.TutorService:
+    return service.TutorService('gemini-2.5-flash', 'test_key', session=Mock())
+
+
+@pytest.fixture
+def payload() -> Dict[str, Any]:
+    return {
+        'report_files': [str(test_folder / 'sample_report.json')],
+        'student_files': str(test_folder / 'sample_code.py'),
+        'readme_path': str(test_folder / 'sample_readme.md'),
+        'explanation_in': 'English',
+    }
+
+
+def ok_response(body: Dict) -> Mock:
+    response = Mock(status_code=200)
+    response.json.return_value = body
+    return response
+
+
+def test_init_preloads_locales(tutor: service.TutorService):
+    assert prompt.load_locale.cache_info().currsize >= len(list((project_folder / 'locale').glob('*.json')))
+    assert {'English', 'Korean'} <= tutor.locales
+
+
+def test_feedback(tutor: service.TutorService, payload: Dict[str, Any]):
+    tutor.client.session.post.return_value = ok_response(GEMINI_RESPONSE)
+
+    result = tutor.feedback(payload)
+
+    assert result['feedback'] == 'Looks good.'
+    assert result['n_failed'] > 0
+    assert result['usage']['total_tokens'] == 15
+    assert result['usage']['model'] == 'gemini-2.5-flash'
+    # the resident client keeps no per-request state
+    assert tutor.client.last_raw_response is None
+
+
+def test_feedback__multilingual(tutor: service.TutorService, payload: Dict[str, Any]):
+    body = json.loads(json.dumps(GEMINI_RESPONSE))
+    body['candidates'][0]['content']['parts'][0]['text'] = "=== Korean ===\n좋아요\n=== English ===\nGood"
+    tutor.client.session.post.return_value = ok_response(body)
+
+    result = tutor.feedback(dict(payload, explanation_in='Korean,English'))
+
+    assert result['sections'] == {'Korean': '좋아요', 'English': 'Good'}
+
+
+def test_feedback__rereads_changed_files(tutor: service.TutorService, payload: Dict[str, Any], tmp_path: pathlib.Path):
+    tutor.client.session.post.return_value = ok_response(GEMINI_RESPONSE)
+    code = tmp_path / 'code.py'
+    payload['student_files'] = [str(code)]
+
+    code.write_text('first_version = 1')
+    tutor.feedback(payload)
+    code.write_text('second_version = 2')
+    tutor.feedback(payload)
+
+    question = tutor.client.session.post.call_args.kwargs['json']['contents'][0]['parts'][0]['text']
+    assert 'second_version' in question
+
+
+def test_feedback__missing_field(tutor: service.TutorService, payload: Dict[str, Any]):
+    del payload['readme_path']
+    with pytest.raises(ValueError, match="Missing field: readme_path"):
+        tutor.feedback(payload)
+
+
+def test_feedback__llm_failure(tutor: service.TutorService, payload: Dict[str, Any]):
+    tutor.client.session.post.return_value = Mock(status_code=500, text='Server error')
+    with pytest.raises(RuntimeError, match="Failed to get feedback"):
+        tutor.feedback(payload)
+
+
+def test_feedback__identical_requests_share_one_call(tutor: service.TutorService, payload: Dict[str, Any]):
+    release = threading.Event()
+
+    def slow_post(*args, **kwargs):
+        release.wait(5)
+        return ok_response(GEMINI_RESPONSE)
+
+    tutor.client.session.post.side_effect = slow_post
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(tutor.feedback(payload))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while tutor.flights.shared < 2:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert tutor.client.session.post.call_count == 1
+    assert [r['feedback'] for r in results] == ['Looks good.'] * 3
+    assert sorted(r['shared'] for r in results) == [False, True, True]
+    assert all(r['usage']['total_tokens'] == 15 for r in results)
+
+
+def test_feedback__degraded_serves_cached(tutor: service.TutorService, payload: Dict[str, Any]):
+    tutor.client.session.post.return_value = ok_response(GEMINI_RESPONSE)
+    first = tutor.feedback(payload)
+    assert first['degraded'] is None
+
+    result = tutor._feedback(
+        service.get_path_tuple(payload['report_files'][0]), service.get_path_tuple(payload['student_files']),
+        pathlib.Path(payload['readme_path']), ('English',), degraded=True,
+    )
+
+    assert tutor.client.session.post.call_count == 1
+    assert result['degraded'] == 'cached'
+    assert result['feedback'].endswith('Looks good.')
+    assert 'Reused feedback' in result['feedback']
+    assert result['n_failed'] == first['n_failed']
+
+
+def test_feedback__degraded_asks_for_short_answer(tutor: service.TutorService, payload: Dict[str, Any]):
+    tutor.client.session.post.return_value = ok_response(GEMINI_RESPONSE)
+
+    result = tutor._feedback(
+        service.get_path_tuple(payload['report_files'][0]), service.get_path_tuple(payload['student_files']),
+        pathlib.Path(payload['readme_path']), ('English',), degraded=True,
+    )
+
+    assert result['degraded'] == 'shortened'
+    sent = json.dumps(tutor.client.session.post.call_args.kwargs['json'])
+    assert 'Keep this answer brief' in sent
+    # Shortened answers are not remembered for later cached serving
+    assert not tutor._recent
+
+
+def test_adapt_concurrency(tutor: service.TutorService):
+    with pytest.raises(ValueError):
+        tutor.adapt_concurrency()
+
+    tutor.admission = admission.AdmissionController(max_concurrent=4)
+    limiter = tutor.adapt_concurrency()
+    tutor.client._notify(0, 0.1, response=Mock(status_code=429, headers={}))
+
+    assert limiter.current() == 2
+    assert tutor.admission.max_concurrent == 2
+
+
+def test_feedback__invalid_deadline(tutor: service.TutorService, payload: Dict[str, Any]):
+    with pytest.raises(ValueError, match='deadline_sec'):
+        tutor.feedback(dict(payload, deadline_sec=0))
+
+
+@pytest.mark.parametrize('field, value, match', [
+    ('deadline_sec', [1], 'deadline_sec'),
+    ('report_files', 5, 'Paths'),
+    ('student_files', [1, 2], 'Paths'),
+    ('readme_path', None, 'readme_path'),
+    ('explanation_in', ['English'], 'explanation_in'),
+    ('explanation_in', '../../etc/x', 'Unsupported explanation language'),
+])
+def test_feedback__invalid_field(tutor: service.TutorService, payload: Dict[str, Any], field: str, value: Any, match: str):
+    with pytest.raises(ValueError, match=match):
+        tutor.feedback(dict(payload, **{field: value}))
+    tutor.client.session.post.assert_not_called()
+
+
+def test_feedback__deadline_less_admission_wait(tutor: service.TutorService, payload: Dict[str, Any]):
+    tutor.client.session.post.return_value = ok_response(GEMINI_RESPONSE)
+    tutor.admission = Mock()
+    tutor.admission.admit.return_value.__enter__ = Mock(return_value=admission.Ticket('r', False, 1.5))
+    tutor.admission.admit.return_value.__exit__ = Mock(return_value=None)
+    tutor.flights.do = Mock(wraps=tutor.flights.do)
+
+    tutor.feedback(dict(payload, deadline_sec=2.0))
+
+    tutor.admission.admit.assert_called_once_with(service.DEFAULT_REPO, 2.0)
+    assert 0 < tutor.flights.do.call_args.kwargs['timeout'] <= 0.5
+
+    with pytest.raises(TimeoutError):
+        tutor.feedback(dict(payload, deadline_sec=1.0))
+    assert tutor.client.session.post.call_count == 1
+
+
+@pytest.fixture
+def server(tutor: service.TutorService):
+    server = service.make_server(tutor, '127.0.0.1', 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method: str, path: str, body: Dict = None) -> Tuple[int, Dict]:
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(f'http://127.0.0.1:{server.server_port}{path}', data=data, method=method)
+    try:
+        with urllib.request.urlopen(req) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_http_healthz(server):
+    status, body = request(server, 'GET', '/healthz')
+    assert status == 200
+    assert body == {'status': 'ok', 'model': 'gemini-2.5-flash'}
+
+
+def test_http_feedback(server, payload: Dict[str, Any]):
+    server.service.client.session.post.return_value = ok_response(GEMINI_RESPONSE)
+
+    status, body = request(server, 'POST', '/feedback', payload)
+
+    assert status == 200
+    assert body['feedback'] == 'Looks good.'
+
+
+def test_http_feedback__bad_request(server):
+    status, body = request(server, 'POST', '/feedback', {'student_files': []})
+    assert status == 400
+    assert 'report_files' in body['error']
+
+
+def test_http_feedback__bad_field_type(server, payload: Dict[str, Any]):
+    status, body = request(server, 'POST', '/feedback', dict(payload, deadline_sec=[1]))
+    assert status == 400
+    assert 'deadline_sec' in body['error']
+
+
+def test_http_feedback__unexpected_error(server, payload: Dict[str, Any]):
+    with patch.object(service.TutorService, 'feedback', side_effect=OSError('Permission denied')):
+        status, body = request(server, 'POST', '/feedback', payload)
+
+    assert status == 500
+    assert body == {'error': 'Internal server error'}
+
+
+def test_http_feedback__upstream_failure(server, payload: Dict[str, Any]):
+    server.service.client.session.post.return_value = Mock(status_code=500, text='Server error')
+
+    status, body = request(server, 'POST', '/feedback', payload)
+
+    assert status == 502
+
+
+def test_http_metrics(server, payload: Dict[str, Any]):
+    server.service.client.session.post.return_value = ok_response(GEMINI_RESPONSE)
+    request(server, 'POST', '/feedback', payload)
+
+    url = f'http://127.0.0.1:{server.server_port}/metrics'
+    with urllib.request.urlopen(url) as response:
+        content_type = response.headers['Content-Type']
+        text = response.read().decode()
+
+    assert content_type.startswith('text/plain; version=0.0.4')
+    assert '# TYPE tutor_llm_request_duration_seconds histogram' in text
+    assert 'tutor_llm_calls_total{provider="gemini",model="gemini-2.5-flash",outcome="success"}' in text
+    assert 'tutor_service_requests_total{path="/feedback",status="200"}' in text
+
+
+def test_http_feedback__overloaded(server, payload: Dict[str, Any]):
+    server.service.admission = admission.AdmissionController(max_concurrent=1, max_queue=0)
+    release = threading.Event()
+
+    def slow_post(*args, **kwargs):
+        release.wait(5)
+        return ok_response(GEMINI_RESPONSE)
+
+    server.service.client.session.post.side_effect = slow_post
+    first = threading.Thread(target=request, args=(server, 'POST', '/feedback', dict(payload, repo='a/1')))
+    first.start()
+    while server.service.admission.running < 1:
+        threading.Event().wait(0.001)
+
+    req = urllib.request.Request(
+        f'http://127.0.0.1:{server.server_port}/feedback',
+        data=json.dumps(dict(payload, repo='a/2')).encode(), method='POST',
+    )
+    with pytest.raises(urllib.error.HTTPError) as exc_info:
+        urllib.request.urlopen(req)
+    release.set()
+    first.join()
+
+    assert exc_info.value.code == 503
+    assert int(exc_info.value.headers['Retry-After']) >= 1
+    assert json.loads(exc_info.value.read())['reason'] == 'queue_full'
+
+
+def test_http_feedback__deadline_exceeded(server, payload: Dict[str, Any]):
+    release = threading.Event()
+    calls = []
+
+    def slow_post(*args, **kwargs):
+        calls.append(1)
+        release.wait(5)
+        return Mock(status_code=500, text='Server error')
+
+    server.service.client.session.post.side_effect = slow_post
+
+    status, body = request(server, 'POST', '/feedback', dict(payload, deadline_sec=0.2))
+    release.set()
+
+    assert status == 504
+    assert 'No result' in body['error']
+    # The abandoned flight stops retrying once its only waiter has left
+    while server.service.flights.in_flight():
+        threading.Event().wait(0.001)
+    assert len(calls) == 1
+
+
+def test_feedback__timed_out_calls_keep_their_slots(tutor: service.TutorService, payload: Dict[str, Any],
+                                                    monkeypatch):
+    tutor.admission = admission.AdmissionController(max_concurrent=2, max_queue=0, service_sec=0.01)
+    keys = iter(range(100))
+    monkeypatch.setattr(service, 'request_key', lambda config, question: str(next(keys)))
+    release = threading.Event()
+    in_flight, peak, timeouts = [0], [0], []
+    lock = threading.Lock()
+
+    def slow_post(*args, **kwargs):
+        # A provider that trickles bytes slower than the request timeout can cut off
+        timeouts.append(kwargs['timeout'])
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        release.wait(5)
+        with lock:
+            in_flight[0] -= 1
+        return ok_response(GEMINI_RESPONSE)
+
+    tutor.client.session.post.side_effect = slow_post
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            tutor.feedback(dict(payload, deadline_sec=0.1))
+    with pytest.raises(admission.Overloaded):
+        tutor.feedback(dict(payload, deadline_sec=0.1))
+
+    assert peak[0] == 2
+    assert all(timeout <= 0.1 for timeout in timeouts)
+    release.set()
+    while tutor.admission.running:
+        threading.Event().wait(0.001)
+    tutor.feedback(payload)  # slots are back once the calls end
+
+
+def test_http_unknown_path(server):
+    status, _ = request(server, 'GET', '/nope')
+    assert status == 404
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_service.py
@@ -0,0 +1,179 @@
+# begin tests/test_singleflight.py
+import pathlib
+import sys
+import threading
+import time
+from typing import List
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import singleflight  # noqa: E402
+from llm_configs import ClaudeConfig, GeminiConfig  # noqa: E402
+
+
+def wait_until(condition, timeout_sec: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout_sec
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not met in time'
+        time.sleep(0.001)
+
+
+def run_in_threads(n: int, target) -> List[threading.Thread]:
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def test_request_key():
+    config = GeminiConfig(api_key='key')
+
+    assert singleflight.request_key(config, 'q') == singleflight.request_key(GeminiConfig(api_key='key'), 'q')
+    assert singleflight.request_key(config, 'q') != singleflight.request_key(config, 'other')
+    assert singleflight.request_key(config, 'q') != singleflight.request_key(ClaudeConfig(api_key='key'), 'q')
+
+
+def test_concurrent_identical_calls_share_one():
+    flights = singleflight.SingleFlight()
+    release = threading.Event()
+    n_calls = []
+    results = []
+
+    def fn(flight):
+        n_calls.append(1)
+        release.wait()
+        return 'answer'
+
+    threads = run_in_threads(5, lambda: results.append(flights.do('k', fn)))
+    wait_until(lambda: flights.shared == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(n_calls) == 1
+    assert flights.calls == 1
+    assert sorted(results) == [('answer', False)] + [('answer', True)] * 4
+    assert flights.in_flight() == 0
+
+
+def test_sequential_calls_are_not_shared():
+    flights = singleflight.SingleFlight()
+
+    assert flights.do('k', lambda flight: 1) == (1, False)
+    assert flights.do('k', lambda flight: 2) == (2, False)
+    assert flights.calls == 2
+
+
+def test_different_keys_run_separately():
+    flights = singleflight.SingleFlight()
+
+    assert flights.do('a', lambda flight: 'a')[0] == 'a'
+    assert flights.do('b', lambda flight: 'b')[0] == 'b'
+    assert flights.shared == 0
+
+
+def test_error_reaches_every_waiter():
+    flights = singleflight.SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def fn(flight):
+        release.wait()
+        raise RuntimeError('upstream failed')
+
+    def call():
+        try:
+            flights.do('k', fn)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = run_in_threads(3, call)
+    wait_until(lambda: flights.shared == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == ['upstream failed'] * 3
+
+
+def test_cancel_when_all_waiters_leave():
+    flights = singleflight.SingleFlight()
+    release = threading.Event()
+    cancelled = threading.Event()
+
+    def fn(flight):
+        flight.on_cancel(cancelled.set)
+        release.wait()
+        return 'late'
+
+    with pytest.raises(TimeoutError):
+        flights.do('k', fn, timeout=0.05)
+
+    assert cancelled.wait(1)
+    assert flights.in_flight() == 0
+    # The next identical request does not join the abandoned call
+    assert flights.do('k', lambda flight: 'fresh') == ('fresh', False)
+    release.set()
+
+
+def test_not_cancelled_while_a_waiter_remains():
+    flights = singleflight.SingleFlight()
+    release = threading.Event()
+    started = threading.Event()
+    cancelled = threading.Event()
+    results = []
+
+    def fn(flight):
+        flight.on_cancel(cancelled.set)
+        started.set()
+        release.wait()
+        return 'answer'
+
+    patient, = run_in_threads(1, lambda: results.append(flights.do('k', fn)))
+    started.wait(1)
+    with pytest.raises(TimeoutError):
+        flights.do('k', fn, timeout=0.05)
+    release.set()
+    patient.join()
+
+    assert results == [('answer', False)]
+    assert not cancelled.is_set()
+
+
+def test_timeout_carries_the_running_flight():
+    flights = singleflight.SingleFlight()
+    release = threading.Event()
+    finished = threading.Event()
+
+    with pytest.raises(singleflight.FlightTimeout) as exc_info:
+        flights.do('k', lambda flight: release.wait(), timeout=0.05)
+    exc_info.value.flight.on_done(finished.set)
+
+    assert not finished.is_set()
+    release.set()
+    assert finished.wait(1)
+    calls = []
+    exc_info.value.flight.on_done(lambda: calls.append(1))  # already done: runs at once
+    assert calls == [1]
+
+
+def test_on_cancel_after_cancel_runs_immediately():
+    flight = singleflight.Flight('k')
+    flight.cancel()
+    called = []
+
+    flight.on_cancel(lambda: called.append(1))
+
+    assert called == [1]
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_singleflight.py
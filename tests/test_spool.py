@@ -0,0 +1,212 @@
+# begin tests/test_spool.py
+import json
+import os
+import pathlib
+import sys
+import time
+from typing import Any, Dict
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import spool  # noqa: E402
+
+
+class FakeTutor:
+    """Stands in for service.TutorService; picklable by reference for spawned workers."""
+
+    def feedback(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if payload.get('bad'):
+            raise ValueError('Missing field: report_files')
+        if payload.get('flaky'):
+            raise RuntimeError('Failed to get feedback from LLM')
+        return {'feedback': f"ok {payload['n']}", 'n_failed': 1, 'usage': {'total_tokens': 10}}
+
+
+def fake_tutor_factory() -> FakeTutor:
+    return FakeTutor()
+
+
+@pytest.fixture
+def queue_dir(tmp_path: pathlib.Path) -> spool.Spool:
+    return spool.Spool(tmp_path, lease_sec=60, max_attempts=2)
+
+
+def expire(path: pathlib.Path, age_sec: float = 3600) -> None:
+    old = time.time() - age_sec
+    os.utime(path, (old, old))
+
+
+def read(path: pathlib.Path) -> Dict[str, Any]:
+    return json.loads(path.read_text())
+
+
+def test_submit_claim_complete(queue_dir: spool.Spool):
+    job_id = queue_dir.submit({'n': 1})
+
+    claim = queue_dir.claim()
+
+    assert claim.job_id == job_id
+    assert claim.job['payload'] == {'n': 1}
+    assert queue_dir.counts() == {'incoming': 0, 'claimed': 1, 'done': 0, 'failed': 0}
+    assert queue_dir.claim() is None
+
+    assert queue_dir.complete(claim, {'result': {'feedback': 'ok'}})
+    done = read(queue_dir.done / f'{job_id}.json')
+    assert done['result'] == {'feedback': 'ok'}
+    assert done['payload'] == {'n': 1}
+    assert queue_dir.counts() == {'incoming': 0, 'claimed': 0, 'done': 1, 'failed': 0}
+    assert queue_dir.is_idle()
+
+
+def test_claim_is_fifo(queue_dir: spool.Spool):
+    ids = [queue_dir.submit({'n': i}) for i in range(3)]
+
+    assert [queue_dir.claim().job_id for _ in ids] == ids
+
+
+def test_claim_accepts_bare_payload(queue_dir: spool.Spool):
+    (queue_dir.incoming / 'student-1.json').write_text(json.dumps({'n': 7}))
+
+    claim = queue_dir.claim()
+
+    assert claim.job_id == 'student-1'
+    assert claim.job['payload'] == {'n': 7}
+    assert claim.job['attempts'] == 0
+
+
+def test_claim_starts_a_fresh_lease(queue_dir: spool.Spool):
+    queue_dir.submit({'n': 1})
+    expire(next(queue_dir.incoming.glob('*.json')))
+
+    queue_dir.claim()
+
+    assert queue_dir.reap() == 0
+
+
+def test_unreadable_job_fails(queue_dir: spool.Spool):
+    (queue_dir.incoming / 'broken.json').write_text('{not json')
+
+    assert queue_dir.claim() is None
+    assert 'unreadable job' in read(queue_dir.failed / 'broken.json')['error']
+
+
+def test_fail_retries_then_gives_up(queue_dir: spool.Spool):
+    job_id = queue_dir.submit({'n': 1})
+
+    assert queue_dir.fail(queue_dir.claim(), 'boom') == 'retry'
+    retried = read(queue_dir.incoming / f'{job_id}.json')
+    assert retried['attempts'] == 1
+    assert retried['last_error'] == 'boom'
+
+    assert queue_dir.fail(queue_dir.claim(), 'boom again') == 'failed'
+    assert read(queue_dir.failed / f'{job_id}.json')['attempts'] == 2
+    assert queue_dir.is_idle()
+
+
+def test_fail_without_retry(queue_dir: spool.Spool):
+    job_id = queue_dir.submit({'n': 1})
+
+    assert queue_dir.fail(queue_dir.claim(), 'bad input', retry=False) == 'failed'
+    assert (queue_dir.failed / f'{job_id}.json').exists()
+
+
+def test_reap_requeues_expired_claim(queue_dir: spool.Spool):
+    job_id = queue_dir.submit({'n': 1})
+    claim = queue_dir.claim()
+    expire(claim.path)
+
+    assert queue_dir.reap() == 1
+
+    assert read(queue_dir.incoming / f'{job_id}.json')['last_error'] == 'lease expired'
+    # The original worker finds out it lost the job
+    assert not queue_dir.heartbeat(claim)
+    assert not queue_dir.complete(claim, {'result': {}})
+    assert queue_dir.fail(claim, 'late') is None
+    assert not (queue_dir.done / f'{job_id}.json').exists()
+
+
+def test_reap_keeps_fresh_claims(queue_dir: spool.Spool):
+    queue_dir.submit({'n': 1})
+    claim = queue_dir.claim()
+
+    assert queue_dir.reap() == 0
+    assert queue_dir.heartbeat(claim)
+
+
+def test_reap_expired_claim_of_finished_job(queue_dir: spool.Spool):
+    job_id = queue_dir.submit({'n': 1})
+    claim = queue_dir.claim()
+    (queue_dir.done / f'{job_id}.json').write_text('{}')
+    expire(claim.path)
+
+    assert queue_dir.reap() == 0
+    assert queue_dir.counts()['incoming'] == 0
+    assert queue_dir.counts()['claimed'] == 0
+
+
+def test_reap_gives_up_after_max_attempts(queue_dir: spool.Spool):
+    job_id = queue_dir.submit({'n': 1})
+    for _ in range(2):
+        expire(queue_dir.claim().path)
+        queue_dir.reap()
+
+    assert read(queue_dir.failed / f'{job_id}.json')['attempts'] == 2
+
+
+@pytest.mark.parametrize('payload, status, directory', [
+    ({'n': 1}, 'done', 'done'),
+    ({'bad': True}, 'failed', 'failed'),
+    ({'flaky': True}, 'retry', 'incoming'),
+])
+def test_process_claim(queue_dir: spool.Spool, payload, status, directory):
+    job_id = queue_dir.submit(payload)
+
+    record = spool.process_claim(queue_dir, FakeTutor(), queue_dir.claim(), worker_id=0)
+
+    assert record['status'] == status
+    assert record['process_sec'] >= 0
+    assert (getattr(queue_dir, directory) / f'{job_id}.json').exists()
+
+
+def test_metrics_snapshot():
+    metrics = spool.SpoolMetrics(n_workers=2)
+    for i in range(4):
+        metrics.add({'id': str(i), 'worker': i % 2, 'status': 'done', 'wait_sec': 0.1 * i,
+                     'process_sec': 1.0 + i, 'total_tokens': 10})
+    metrics.add({'id': 'x', 'worker': 0, 'status': 'failed', 'wait_sec': 0.0, 'process_sec': 0.1})
+
+    snapshot = metrics.snapshot()
+
+    assert snapshot['done'] == 4
+    assert snapshot['failed'] == 1
+    assert snapshot['per_worker'] == {'0': 2, '1': 2}
+    assert snapshot['process_sec']['max'] == 4.0
+    assert snapshot['total_tokens'] == 40
+    assert snapshot['jobs_per_min'] > 0
+
+
+def test_run_pool_drains_spool(tmp_path: pathlib.Path):
+    queue_dir = spool.Spool(tmp_path, lease_sec=30, max_attempts=2)
+    ids = [queue_dir.submit({'n': i}) for i in range(6)]
+    queue_dir.submit({'bad': True})
+
+    snapshot = spool.run_pool(tmp_path, n_workers=2, lease_sec=30, max_attempts=2, drain=True,
+                              tutor_factory=fake_tutor_factory)
+
+    assert snapshot['done'] == 6
+    assert snapshot['failed'] == 1
+    assert snapshot['spool'] == {'incoming': 0, 'claimed': 0, 'done': 6, 'failed': 1}
+    assert read(tmp_path / spool.METRICS_FILENAME)['done'] == 6
+    assert {read(queue_dir.done / f'{i}.json')['result']['feedback'] for i in ids} == {f'ok {i}' for i in range(6)}
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_spool.py
@@ -0,0 +1,92 @@
+# begin tests/test_tracing.py
+import json
+import pathlib
+import sys
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import entrypoint
+import tracing
+
+
+def test_span_disabled_is_shared_noop():
+    first = tracing.span('a', x=1)
+    second = tracing.span('b')
+
+    assert first is second
+    with first as s:
+        s.set_attribute('ignored', True)
+    assert not tracing.get_tracer().enabled
+
+
+def test_recording_disabled_writes_nothing(tmp_path: pathlib.Path):
+    with tracing.recording('root', str(tmp_path), enabled=False):
+        with tracing.span('child'):
+            pass
+
+    assert not any(tmp_path.iterdir())
+
+
+def test_recording_exports_nested_spans(tmp_path: pathlib.Path):
+    with tracing.recording('root', str(tmp_path), enabled=True):
+        with tracing.span('child', size=3) as s:
+            s.set_attribute('status_code', 200)
+
+    chrome = json.loads((tmp_path / tracing.CHROME_TRACE_FILENAME).read_text())
+    events = {e['name']: e for e in chrome['traceEvents']}
+    assert set(events) == {'root', 'child'}
+    assert events['child']['ph'] == 'X'
+    assert events['child']['args'] == {'size': 3, 'status_code': 200}
+    assert events['root']['dur'] >= events['child']['dur']
+
+    otlp = json.loads((tmp_path / tracing.OTLP_TRACE_FILENAME).read_text())
+    spans = {s['name']: s for s in otlp['resourceSpans'][0]['scopeSpans'][0]['spans']}
+    assert spans['child']['parentSpanId'] == spans['root']['spanId']
+    assert 'parentSpanId' not in spans['root']
+    assert len(spans['root']['traceId']) == 32
+    assert int(spans['root']['startTimeUnixNano']) <= int(spans['child']['startTimeUnixNano'])
+    assert {'key': 'size', 'value': {'intValue': '3'}} in spans['child']['attributes']
+    assert not tracing.get_tracer().enabled
+
+
+def test_recording_marks_errors(tmp_path: pathlib.Path):
+    with pytest.raises(ValueError):
+        with tracing.recording('root', str(tmp_path), enabled=True):
+            raise ValueError('boom')
+
+    otlp = json.loads((tmp_path / tracing.OTLP_TRACE_FILENAME).read_text())
+    root = otlp['resourceSpans'][0]['scopeSpans'][0]['spans'][0]
+    assert root['status'] == {'code': 2, 'message': 'ValueError: boom'}
+
+
+def test_entrypoint_main_phases(monkeypatch, tmp_path: pathlib.Path):
+    monkeypatch.setenv('INPUT_TRACE', 'true')
+    monkeypatch.setenv('INPUT_OUTPUT-DIR', str(tmp_path))
+    monkeypatch.setenv('INPUT_REPORT-FILES', str(test_folder / 'sample_report.json'))
+    monkeypatch.setenv('INPUT_STUDENT-FILES', str(test_folder / 'sample_code.py'))
+    monkeypatch.setenv('INPUT_README-PATH', str(test_folder / 'sample_readme.md'))
+    monkeypatch.setenv('INPUT_EXPLANATION-IN', 'English')
+    monkeypatch.setenv('INPUT_GEMINI-API-KEY', 'test-key')
+    monkeypatch.delenv('GITHUB_STEP_SUMMARY', raising=False)
+
+    entrypoint.main(b_ask=False)
+
+    chrome = json.loads((tmp_path / tracing.CHROME_TRACE_FILENAME).read_text())
+    names = {e['name'] for e in chrome['traceEvents']}
+    assert {
+        'entrypoint.main', 'parse_inputs', 'create_client', 'prompt.engineering',
+        'collect_longrepr_from_multiple_reports', 'get_instruction_block',
+        'get_student_code_block', 'write_artifacts',
+    } <= names
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_tracing.py
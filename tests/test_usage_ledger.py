@@ -0,0 +1,150 @@
+# begin tests/test_usage_ledger.py
+import json
+import pathlib
+import sys
+from typing import Any, Dict
+from unittest.mock import Mock
+
+import pytest
+
+
+test_folder = pathlib.Path(__file__).parent.resolve()
+project_folder = test_folder.parent.resolve()
+sys.path.insert(0, str(project_folder))
+
+
+import usage_ledger
+from llm_client import LLMAPIClient
+from llm_configs import GeminiConfig
+
+
+def event(status_code: int = 200, model: str = 'gemini-2.5-flash', tokens=(1000, 2000)) -> Dict[str, Any]:
+    raw = None
+    if status_code == 200:
+        raw = {"usageMetadata": {"promptTokenCount": tokens[0], "candidatesTokenCount": tokens[1],
+                                 "totalTokenCount": sum(tokens)}}
+    return {'model': model, 'provider': 'gemini', 'attempt': 0, 'status_code': status_code,
+            'latency_sec': 0.5, 'headers': {}, 'raw_response': raw, 'error': None}
+
+
+@pytest.fixture
+def ledger(tmp_path: pathlib.Path) -> usage_ledger.UsageLedger:
+    return usage_ledger.UsageLedger(tmp_path / 'usage_ledger.jsonl', repo='class/student1', compact_every=100)
+
+
+@pytest.mark.parametrize("model, expected", [
+    ('gemini-2.5-flash', (1000 * 0.30 + 2000 * 2.50) / 1e6),
+    ('claude-sonnet-4-20250514', (1000 * 3.0 + 2000 * 15.0) / 1e6),
+    ('sonar-pro', (1000 * 3.0 + 2000 * 15.0) / 1e6),
+    ('sonar', (1000 * 1.0 + 2000 * 1.0) / 1e6),
+])
+def test_estimate_cost(model: str, expected: float):
+    assert usage_ledger.estimate_cost(model, 1000, 2000) == pytest.approx(expected)
+
+
+def test_estimate_cost__unknown():
+    assert usage_ledger.estimate_cost('mystery', 1, 1) is None
+    assert usage_ledger.estimate_cost('gemini', None, 1) is None
+
+
+def test_observe_appends_record(ledger: usage_ledger.UsageLedger):
+    ledger.observe(event())
+
+    records = [json.loads(line) for line in ledger.path.read_text().splitlines()]
+    assert len(records) == 1
+    assert records[0]['repo'] == 'class/student1'
+    assert records[0]['input_tokens'] == 1000
+    assert records[0]['output_tokens'] == 2000
+    assert records[0]['latency_sec'] == 0.5
+    assert records[0]['cost_usd'] == pytest.approx(0.0053)
+
+
+def test_totals_by_model_and_repo(ledger: usage_ledger.UsageLedger):
+    ledger.observe(event(429))
+    ledger.observe(event(200))
+    ledger.observe(event(500))
+
+    totals = ledger.totals()
+    gemini = totals['by_model']['gemini-2.5-flash']
+    assert gemini['calls'] == 3
+    assert gemini['rate_limited'] == 1
+    assert gemini['errors'] == 1
+    assert gemini['total_tokens'] == 3000
+    assert totals['by_repo']['class/student1']['calls'] == 3
+
+
+def test_compaction_keeps_totals(tmp_path: pathlib.Path):
+    ledger = usage_ledger.UsageLedger(tmp_path / 'ledger.jsonl', compact_every=2)
+
+    for _ in range(5):
+        ledger.observe(event())
+
+    # two compactions of two records each; one record pending
+    assert len(ledger.path.read_text().splitlines()) == 1
+    compacted = json.loads(ledger.totals_path.read_text())
+    assert compacted['by_model']['gemini-2.5-flash']['calls'] == 4
+    assert ledger.totals()['by_model']['gemini-2.5-flash']['calls'] == 5
+
+    ledger.compact()
+    assert ledger.path.read_text() == ''
+    assert json.loads(ledger.totals_path.read_text())['by_model']['gemini-2.5-flash']['input_tokens'] == 5000
+
+
+def test_append_counts_without_rereading(tmp_path: pathlib.Path, monkeypatch):
+    ledger = usage_ledger.UsageLedger(tmp_path / 'ledger.jsonl', compact_every=100)
+    ledger.observe(event())
+    # counting the lines of the ledger is the O(n) part
+    reads = []
+    monkeypatch.setattr(usage_ledger, 'sum', lambda lines: reads.append(1) or sum(1 for _ in lines), raising=False)
+
+    for _ in range(10):
+        ledger.observe(event())
+
+    assert reads == []
+    assert len(ledger.path.read_text().splitlines()) == 11
+
+
+def test_shared_ledger_counts_other_writers(tmp_path: pathlib.Path):
+    first = usage_ledger.UsageLedger(tmp_path / 'ledger.jsonl', compact_every=4)
+    second = usage_ledger.UsageLedger(tmp_path / 'ledger.jsonl', compact_every=4)
+
+    for ledger in (first, second, first, second):
+        ledger.observe(event())
+
+    assert first.path.read_text() == ''
+    assert json.loads(first.totals_path.read_text())['by_model']['gemini-2.5-flash']['calls'] == 4
+
+
+def test_ledger_from_env(monkeypatch, tmp_path: pathlib.Path):
+    monkeypatch.delenv('INPUT_USAGE-LEDGER', raising=False)
+    assert usage_ledger.ledger_from_env('') is None
+
+    ledger = usage_ledger.ledger_from_env(str(tmp_path))
+    assert ledger.path == tmp_path / usage_ledger.LEDGER_FILENAME
+
+    monkeypatch.setenv('INPUT_USAGE-LEDGER', str(tmp_path / 'shared.jsonl'))
+    assert usage_ledger.ledger_from_env(str(tmp_path)).path == tmp_path / 'shared.jsonl'
+
+
+def test_client_records_every_attempt(ledger: usage_ledger.UsageLedger, monkeypatch):
+    monkeypatch.setattr('llm_client.time.sleep', lambda _: None)
+    ok = Mock(status_code=200, headers={'X-Test': '1'})
+    ok.json.return_value = {"candidates": [{"content": {"parts": [{"text": "hi"}]}}],
+                            "usageMetadata": {"promptTokenCount": 3, "candidatesTokenCount": 4, "totalTokenCount": 7}}
+    session = Mock()
+    session.post.side_effect = [Mock(status_code=429, headers={}), ok]
+    client = LLMAPIClient(GeminiConfig(api_key='k'), retry_delay_sec=0.1, session=session)
+    client.observers.append(ledger.observe)
+
+    assert client.call_api('question') == 'hi'
+
+    totals = ledger.totals()['by_model']['gemini-2.5-flash']
+    assert totals['calls'] == 2
+    assert totals['rate_limited'] == 1
+    assert totals['total_tokens'] == 7
+
+
+if __name__ == "__main__":
+    pytest.main(["--verbose", __file__])
+
+# end tests/test_usage_ledger.py
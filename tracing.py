@@ -0,0 +1,225 @@
+# begin tracing.py
+"""Lightweight phase tracing for the tutor and the prompt pipeline.
+
+Spans are recorded only while tracing is enabled (INPUT_TRACE=true); otherwise
+``span()`` returns a shared no-op context manager, so instrumented code pays a
+single attribute check. Recorded spans are exported to the output directory as
+Chrome trace JSON (chrome://tracing, Perfetto) and as OTLP/JSON.
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import pathlib
+import secrets
+import threading
+import time
+
+from typing import Any, Dict, Iterator, List, Optional
+
+
+CHROME_TRACE_FILENAME = 'trace.chrome.json'
+OTLP_TRACE_FILENAME = 'trace.otlp.json'
+SERVICE_NAME = 'ai-coding-tutor'
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """A timed phase; use as a context manager obtained from ``span()``."""
+
+    __slots__ = ('tracer', 'name', 'span_id', 'parent_id', 'thread_id',
+                 'start_ns', 'end_ns', 'attributes', 'error', '_token')
+
+    def __init__(self, tracer: 'Tracer', name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = None
+        self.thread_id = threading.get_ident()
+        self.start_ns = 0
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def __enter__(self) -> 'Span':
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent is not None else None
+        self._token = _current_span.set(self)
+        self.start_ns = self.tracer.now_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.end_ns = self.tracer.now_ns()
+        if exc_type is not None and not issubclass(exc_type, SystemExit):
+            self.error = f"{exc_type.__name__}: {exc_value}"
+        _current_span.reset(self._token)
+        self.tracer.record(self)
+
+
+class _NullSpan:
+    """Stand-in returned by ``span()`` while tracing is disabled."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Collects finished spans of one trace.
+
+    Attributes:
+        enabled (bool): Whether ``span()`` records anything
+        trace_id (str): 32 hex digit trace identifier shared by all spans
+        spans (List[Span]): Finished spans in completion order
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self) -> None:
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        # Anchor monotonic timings to the wall clock once per trace
+        self._epoch_ns = time.time_ns()
+        self._perf_ns = time.perf_counter_ns()
+
+    def now_ns(self) -> int:
+        return self._epoch_ns + time.perf_counter_ns() - self._perf_ns
+
+    def record(self, finished: Span) -> None:
+        with self._lock:
+            self.spans.append(finished)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        events = []
+        for s in self.spans:
+            args = dict(s.attributes)
+            if s.error:
+                args['error'] = s.error
+            events.append({
+                'name': s.name,
+                'ph': 'X',
+                'ts': s.start_ns / 1000,
+                'dur': (s.end_ns - s.start_ns) / 1000,
+                'pid': pid,
+                'tid': s.thread_id,
+                'args': args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def to_otlp(self) -> Dict[str, Any]:
+        otlp_spans = []
+        for s in self.spans:
+            otlp_span = {
+                'traceId': self.trace_id,
+                'spanId': s.span_id,
+                'name': s.name,
+                'kind': 1,  # SPAN_KIND_INTERNAL
+                'startTimeUnixNano': str(s.start_ns),
+                'endTimeUnixNano': str(s.end_ns),
+                'attributes': [otlp_attribute(k, v) for k, v in s.attributes.items()],
+                'status': {'code': 2, 'message': s.error} if s.error else {'code': 1},
+            }
+            if s.parent_id:
+                otlp_span['parentSpanId'] = s.parent_id
+            otlp_spans.append(otlp_span)
+
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [otlp_attribute('service.name', SERVICE_NAME)]},
+                'scopeSpans': [{
+                    'scope': {'name': __name__},
+                    'spans': otlp_spans,
+                }],
+            }]
+        }
+
+    def export(self, output_dir: pathlib.Path) -> None:
+        """Write Chrome trace and OTLP JSON files to *output_dir*."""
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for filename, content in (
+            (CHROME_TRACE_FILENAME, self.to_chrome_trace()),
+            (OTLP_TRACE_FILENAME, self.to_otlp()),
+        ):
+            path = output_dir / filename
+            try:
+                path.write_text(json.dumps(content), encoding='utf-8')
+                logging.info(f"Trace written to {path} ({len(self.spans)} spans)")
+            except OSError as e:
+                logging.warning(f"Could not write trace: {e}")
+
+
+def otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def span(name: str, **attributes) -> Any:
+    """Return a context manager timing *name*; a no-op unless tracing is enabled."""
+    if not _tracer.enabled:
+        return _NULL_SPAN
+    return Span(_tracer, name, attributes)
+
+
+def is_enabled_from_env() -> bool:
+    return 'true' == os.getenv('INPUT_TRACE', 'false').lower()
+
+
+@contextlib.contextmanager
+def recording(name: str, output_dir: Optional[str], enabled: bool) -> Iterator[None]:
+    """Trace the enclosed block as root span *name* and export it to *output_dir*.
+
+    Does nothing unless *enabled*; spans are exported only if *output_dir* is set.
+    """
+    if not enabled:
+        yield
+        return
+
+    _tracer.reset()
+    _tracer.enabled = True
+    try:
+        with span(name):
+            yield
+    finally:
+        _tracer.enabled = False
+        if output_dir:
+            _tracer.export(pathlib.Path(output_dir))
+        else:
+            logging.warning("Tracing enabled but no output directory set; spans discarded")
+
+# end tracing.py
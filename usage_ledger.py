@@ -0,0 +1,210 @@
+# begin usage_ledger.py
+"""Append-only ledger of LLM API usage with periodic compaction into totals.
+
+Every HTTP attempt reported by ``LLMAPIClient`` (successes, 429s, errors)
+becomes one JSON line: tokens as normalized by ``extract_token_usage``,
+latency, and an estimated cost from ``PRICE_PER_MILLION_TOKENS``. Every
+``compact_every`` records, the lines are folded into per-model, per-repo and
+per-key (``key_pool.key_id``, never the key itself) totals in ``<ledger stem>_totals.json`` and the ledger is truncated, so a
+classroom-wide ledger stays small while totals keep growing.
+
+Point several runs at the same file (a shared volume, or a cache restored
+between runs) to aggregate a course. Writers on one host are serialized with
+an advisory file lock.
+"""
+
+import json
+import logging
+import os
+import pathlib
+import time
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+from llm_utils import extract_token_usage, get_startwith
+
+
+LEDGER_FILENAME = 'usage_ledger.jsonl'
+
+# USD per million (input, output) tokens from the providers' list prices as of
+# 2025-09. Costs are estimates only: prices change, and discounts, caching and
+# free tiers are ignored. Longer prefixes come first.
+PRICE_PER_MILLION_TOKENS: Dict[str, Tuple[float, float]] = {
+    'claude-sonnet-4': (3.00, 15.00),
+    'claude': (3.00, 15.00),
+    'gemini-2.5-flash': (0.30, 2.50),
+    'gemini': (0.30, 2.50),
+    'grok-code-fast': (0.20, 1.50),
+    'grok': (0.20, 1.50),
+    'google/gemma-2-9b-it': (0.00, 0.00),
+    'nvidia_nim': (0.00, 0.00),
+    'sonar-pro': (3.00, 15.00),
+    'sonar': (1.00, 1.00),
+    'perplexity': (1.00, 1.00),
+}
+
+_TOTAL_FIELDS = ('input_tokens', 'output_tokens', 'total_tokens', 'latency_sec', 'cost_usd')
+
+
+def estimate_cost(model: str, input_tokens: Optional[int], output_tokens: Optional[int]) -> Optional[float]:
+    """Estimated USD cost of one call, or None if the model or token counts are unknown."""
+    price = get_startwith(model, PRICE_PER_MILLION_TOKENS)
+    if price is None or input_tokens is None or output_tokens is None:
+        return None
+    return (input_tokens * price[0] + output_tokens * price[1]) / 1_000_000
+
+
+def empty_totals() -> Dict[str, Any]:
+    return {'by_model': {}, 'by_repo': {}, 'by_key': {}, 'updated': None}
+
+
+def add_to_totals(totals: Dict[str, Any], record: Dict[str, Any]) -> None:
+    groups = [('by_model', record.get('model')), ('by_repo', record.get('repo'))]
+    if record.get('key_id'):
+        groups.append(('by_key', record['key_id']))
+    for group, key in groups:
+        # Totals written before per-key accounting have no by_key
+        bucket = totals.setdefault(group, {}).setdefault(str(key), {
+            'calls': 0, 'errors': 0, 'rate_limited': 0,
+            **{field: 0 for field in _TOTAL_FIELDS},
+        })
+        bucket['calls'] += 1
+        if record.get('status_code') == 429:
+            bucket['rate_limited'] += 1
+        elif record.get('status_code') != 200:
+            bucket['errors'] += 1
+        for field in _TOTAL_FIELDS:
+            bucket[field] += record.get(field) or 0
+
+
+class UsageLedger:
+    """JSONL usage ledger; register ``observe`` on ``LLMAPIClient.observers``.
+
+    Attributes:
+        path (pathlib.Path): The append-only JSONL file
+        totals_path (pathlib.Path): Compacted totals next to it
+        repo (str): Repository recorded with each call
+        compact_every (int): Records appended before compaction
+    """
+
+    def __init__(self, path: pathlib.Path, repo: str = 'unknown/repository', compact_every: int = 1000):
+        if compact_every <= 0:
+            raise ValueError("compact_every must be a positive integer")
+        self.path = pathlib.Path(path)
+        self.totals_path = self.path.with_name(f'{self.path.stem}_totals.json')
+        self.repo = repo
+        self.compact_every = compact_every
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+        # Records in the ledger and its size after our last write; None until counted
+        self._n_records: Optional[int] = None
+        self._size: Optional[int] = None
+
+    def observe(self, event: Dict[str, Any]) -> None:
+        """Record one attempt event from ``LLMAPIClient._notify``."""
+        usage = extract_token_usage(event.get('raw_response'))
+        record = {
+            'ts': time.time(),
+            'repo': self.repo,
+            'model': event.get('model'),
+            'provider': str(event.get('provider')),
+            'key_id': event.get('key_id'),
+            'attempt': event.get('attempt'),
+            'status_code': event.get('status_code'),
+            'error': event.get('error'),
+            'latency_sec': round(event.get('latency_sec') or 0.0, 6),
+            **usage,
+            'cost_usd': estimate_cost(str(event.get('model')), usage['input_tokens'], usage['output_tokens']),
+        }
+        self.append(record)
+
+    def append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        try:
+            with open(self.path, 'a+', encoding='utf-8') as f:
+                self._lock(f)
+                if self._n_records is None or os.fstat(f.fileno()).st_size != self._size:
+                    # First append, or another writer changed the ledger since ours
+                    f.seek(0)
+                    self._n_records = sum(1 for _ in f)
+                f.write(line)
+                f.flush()
+                self._n_records += 1
+                self._size = os.fstat(f.fileno()).st_size
+                if self._n_records >= self.compact_every:
+                    self._compact_locked(f)
+        except OSError as e:
+            logging.warning(f"Could not write usage ledger {self.path}: {e}")
+
+    def compact(self) -> Dict[str, Any]:
+        """Fold all pending records into the totals file and truncate the ledger."""
+        with open(self.path, 'a+', encoding='utf-8') as f:
+            self._lock(f)
+            return self._compact_locked(f)
+
+    def totals(self) -> Dict[str, Any]:
+        """Compacted totals plus records not compacted yet, without writing anything."""
+        totals = self._read_totals()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for record in self._parse(f):
+                add_to_totals(totals, record)
+        return totals
+
+    def _compact_locked(self, f) -> Dict[str, Any]:
+        f.seek(0)
+        totals = self._read_totals()
+        n_records = 0
+        for record in self._parse(f):
+            add_to_totals(totals, record)
+            n_records += 1
+        totals['updated'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+        tmp_path = self.totals_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(totals, indent=2, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_path, self.totals_path)
+        f.truncate(0)
+        self._n_records, self._size = 0, 0
+        logging.info(f"Compacted {n_records} usage records into {self.totals_path}")
+        return totals
+
+    def _read_totals(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.totals_path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return empty_totals()
+
+    def _parse(self, lines: Iterable[str]) -> Iterable[Dict[str, Any]]:
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logging.warning(f"Skipping malformed usage record in {self.path}")
+
+    @staticmethod
+    def _lock(f) -> None:
+        # Released when the file is closed
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+
+def ledger_from_env(output_dir: str = '') -> Optional[UsageLedger]:
+    """Ledger at INPUT_USAGE-LEDGER, else usage_ledger.jsonl in *output_dir*, else None."""
+    path = os.getenv('INPUT_USAGE-LEDGER', '')
+    if not path and output_dir:
+        path = str(pathlib.Path(output_dir) / LEDGER_FILENAME)
+    if not path:
+        return None
+    return UsageLedger(
+        pathlib.Path(path),
+        repo=os.getenv('GITHUB_REPOSITORY', 'unknown/repository'),
+        compact_every=int(os.getenv('INPUT_USAGE-LEDGER-COMPACT-EVERY', '1000')),
+    )
+
+# end usage_ledger.py